@@ -90,8 +90,22 @@ function DocumentDetail() {
     useEffect(() => {
         const fetchDoc = async () => {
             try {
-                const response = await getDocumentById(id);
-                setDoc(response.data);
+                const response = await getDocumentById(id, {
+                    fields: 'id,title,extraction_status,extraction_error',
+                    expand: 'summary,quiz,flashcards',
+                });
+                const { summary: storedSummary, quiz: storedQuiz, flashcards: storedFlashcards, ...document } = response.data;
+                setDoc(document);
+                // Artifacts generated earlier show up without a request per tab
+                if (storedSummary?.status === 'ready') {
+                    setSummary(storedSummary.summary);
+                }
+                if (storedQuiz) {
+                    setQuiz(storedQuiz);
+                }
+                if (storedFlashcards) {
+                    setFlashcards(storedFlashcards);
+                }
             } catch (error) {
                 console.error("Failed to fetch document details:", error);
             }
@@ -227,7 +241,7 @@ function DocumentDetail() {
                 setRetryMessage('✅ Text extraction successful! AI features are now available.');
                 setRetryMessageType('success');
                 
-                // Refresh document data to get the updated extracted_text
+                // Refresh document data to get the updated extracted_text and extraction_status
                 const docResponse = await getDocumentById(id);
                 setDoc(docResponse.data);
                 
@@ -606,7 +620,7 @@ function DocumentDetail() {
             </div>
             
             {/* Text Extraction Retry Section */}
-            {doc && doc.extracted_text && doc.extracted_text.startsWith("Text extraction failed:") && (
+            {doc && doc.extraction_status === 'failed' && (
                 <div style={{
                     background: 'var(--warning-bg, #fef3c7)',
                     border: '1px solid var(--warning-border, #f59e0b)',
@@ -43,8 +43,7 @@ function DocumentUpload({ onUploadSuccess }) {
             setSelectedDocumentTypeId(null);
             
             // Check if upload succeeded but with text extraction issues
-            if (response.data && response.data.extracted_text && 
-                response.data.extracted_text.startsWith("Text extraction failed:")) {
+            if (response.data && response.data.extraction_status === 'failed') {
                 setMessage('⚠️ Document uploaded successfully, but text extraction failed. You can still view the file, but AI features may not work until the issue is resolved.');
                 setMessageType('warning');
             } else {
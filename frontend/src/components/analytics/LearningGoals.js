@@ -28,10 +28,7 @@ function LearningGoals({ documents = [] }) {
         const uniqueTypes = new Set(documents.map(doc => doc.document_type?.name).filter(Boolean)).size;
         
         // Estimate AI usage (documents with extracted text)
-        const aiUsedDocs = documents.filter(doc => 
-            doc.extracted_text && 
-            !doc.extracted_text.startsWith("Text extraction failed:")
-        ).length;
+        const aiUsedDocs = documents.filter(doc => doc.extraction_status === 'ready').length;
 
         setGoals([
             { id: 1, name: 'Upload 10 documents', target: 10, current: Math.min(totalDocs, 10), icon: '📚' },
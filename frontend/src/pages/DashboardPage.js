@@ -12,6 +12,9 @@ import './DashboardPage.css';
 import { getDocuments, deleteDocument, getUserProfile } from '../services/api';
 import { useNavigate } from 'react-router-dom';
 
+// Everything the list, charts and goals read from a document row
+const DASHBOARD_FIELDS = 'id,title,document_type,extraction_status,uploaded_at';
+
 function DashboardPage() {
     const [activeSection, setActiveSection] = useState('overview');
     const [documents, setDocuments] = useState([]);
@@ -77,7 +80,7 @@ function DashboardPage() {
                 console.log('Clearing current documents state...');
                 setDocuments([]);
                 
-                const response = await getDocuments(documentTypeId, abortControllerRef.current.signal);
+                const response = await getDocuments(documentTypeId, abortControllerRef.current.signal, DASHBOARD_FIELDS);
                 console.log('Raw server response:', response);
                 console.log(`Server returned ${response.data.length} documents`);
                 console.log('Full document list from server:', response.data);
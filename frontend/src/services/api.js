@@ -18,6 +18,9 @@ apiClient.interceptors.request.use(config => {
     return Promise.reject(error);
 });
 
+// AI requests go to the async endpoints when the backend is served over ASGI
+const AI_PREFIX = process.env.REACT_APP_ASYNC_AI === 'true' ? '/async' : '';
+
 // Response interceptor to handle auth errors
 apiClient.interceptors.response.use(
     response => {
@@ -78,14 +81,18 @@ export const deleteDocumentType = (id) => {
 };
 
 // Documents API with type filtering
-export const getDocuments = (documentTypeId = null, signal = null) => {
-    const params = {
-        _t: Date.now() // Add timestamp to prevent caching
-    };
+// Rows carry text_length and extraction_status instead of the full text (see getDocumentById).
+// The response is revalidated with an ETag, so the browser cache answers unchanged lists.
+// fields (e.g. 'id,title,document_type') limits each row to the fields a page renders.
+export const getDocuments = (documentTypeId = null, signal = null, fields = null) => {
+    const params = {};
     
     if (documentTypeId) {
         params.document_type = documentTypeId;
     }
+    if (fields) {
+        params.fields = fields;
+    }
     
     const config = { params };
     if (signal) {
@@ -95,8 +102,17 @@ export const getDocuments = (documentTypeId = null, signal = null) => {
     return apiClient.get('/documents/', config);
 };
 
-export const getDocumentById = (id) => {
-    return apiClient.get(`/documents/${id}/`);
+// fields limits the response to those fields; expand ('summary,quiz,flashcards') adds the
+// artifacts already generated for the document, so one request loads the whole detail page
+export const getDocumentById = (id, { fields = null, expand = null } = {}) => {
+    const params = {};
+    if (fields) {
+        params.fields = fields;
+    }
+    if (expand) {
+        params.expand = expand;
+    }
+    return apiClient.get(`/documents/${id}/`, { params });
 }
 
 export const uploadDocument = (formData) => {
@@ -105,26 +121,69 @@ export const uploadDocument = (formData) => {
     });
 };
 
+// Uploads many files in one request; onResult is called with each NDJSON line
+// ({ index, status, document } per file, then { done, total, ready, empty, failed })
+// as soon as that file's text extraction finishes
+export const uploadDocumentsBatch = (files, documentTypeId, onResult) => {
+    const formData = new FormData();
+    files.forEach(file => formData.append('files', file));
+    if (documentTypeId) {
+        formData.append('document_type_id', documentTypeId);
+    }
+    let parsed = 0;
+    const readLines = (text) => {
+        const lines = text.split('\n');
+        for (let i = parsed; i < lines.length - 1; i++) {
+            if (lines[i].trim()) {
+                onResult(JSON.parse(lines[i]));
+            }
+        }
+        parsed = Math.max(parsed, lines.length - 1);
+    };
+    return apiClient.post('/documents/upload/batch/', formData, {
+        headers: { 'Content-Type': 'multipart/form-data' },
+        responseType: 'text',
+        onDownloadProgress: (event) => readLines(event.event?.target?.responseText || ''),
+    }).then(response => {
+        readLines(response.data);
+        return response;
+    });
+};
+
 export const deleteDocument = (id) => {
     return apiClient.delete(`/documents/${id}/`);
 };
 
 export const getSummary = (docId) => {
-    return apiClient.post(`/documents/${docId}/summarize/`);
+    return apiClient.post(`${AI_PREFIX}/documents/${docId}/summarize/`);
 };
 
 export const generateQuiz = (docId) => {
-    return apiClient.post(`/documents/${docId}/generate-quiz/`);
+    return apiClient.post(`${AI_PREFIX}/documents/${docId}/generate-quiz/`);
+};
+
+// Read an already generated quiz / flashcard set (404 if none yet); revalidated with ETags
+export const getQuiz = (docId) => {
+    return apiClient.get(`/documents/${docId}/generate-quiz/`);
+};
+
+export const getFlashcards = (docId) => {
+    return apiClient.get(`/documents/${docId}/generate-flashcards/`);
 };
 
 // --- ADD THIS NEW FUNCTION ---
 export const generateFlashcards = (docId) => {
-    return apiClient.post(`/documents/${docId}/generate-flashcards/`);
+    return apiClient.post(`${AI_PREFIX}/documents/${docId}/generate-flashcards/`);
+};
+
+// Create or fetch artifacts ('summary', 'quiz', 'flashcards') for many documents at once
+export const generateArtifactsBatch = (documentIds, artifacts) => {
+    return apiClient.post('/documents/artifacts/', { document_ids: documentIds, artifacts });
 };
 // --------------------------
 
 export const askQuestion = (docId, question) => {
-    return apiClient.post(`/documents/${docId}/qna/`, { question });
+    return apiClient.post(`${AI_PREFIX}/documents/${docId}/qna/`, { question });
 };
 
 export const retryTextExtraction = (docId) => {
@@ -132,11 +191,12 @@ export const retryTextExtraction = (docId) => {
 };
 
 // Smart Search
-export const smartSearch = (query) => {
-    return apiClient.post('/documents/search/', { query });
+// mode: 'local' (no AI call), 'hybrid' (local recall + AI rerank) or 'model'
+export const smartSearch = (query, mode = 'hybrid') => {
+    return apiClient.post(`${AI_PREFIX}/documents/search/`, { query, mode });
 };
 
 // Search Suggestions for autocomplete
 export const getSearchSuggestions = (query) => {
-    return apiClient.post('/documents/search/suggestions/', { query });
+    return apiClient.post(`${AI_PREFIX}/documents/search/suggestions/`, { query });
 };
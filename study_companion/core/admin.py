@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UploadedDocument, Quiz, FlashcardSet, Flashcard, DocumentType
+from .models import UploadedDocument, DocumentContent, Quiz, FlashcardSet, Flashcard, DocumentType, Summary, PendingDeletion
 
 @admin.register(DocumentType)
 class DocumentTypeAdmin(admin.ModelAdmin):
@@ -10,10 +10,33 @@ class DocumentTypeAdmin(admin.ModelAdmin):
 
 @admin.register(UploadedDocument)
 class UploadedDocumentAdmin(admin.ModelAdmin):
-    list_display = ['title', 'user', 'document_type', 'uploaded_at']
-    list_filter = ['document_type', 'uploaded_at', 'user']
+    list_display = ['title', 'user', 'document_type', 'extraction_status', 'uploaded_at']
+    list_filter = ['document_type', 'extraction_status', 'uploaded_at', 'user']
     search_fields = ['title', 'user__username']
     ordering = ['-uploaded_at']
+    readonly_fields = ['content', 'text_preview', 'text_length', 'page_count', 'extraction_status', 'extraction_error']
+
+@admin.register(DocumentContent)
+class DocumentContentAdmin(admin.ModelAdmin):
+    list_display = ['content_hash', 'codec', 'length', 'compressed_size', 'created_at']
+    list_filter = ['codec']
+    search_fields = ['content_hash']
+    ordering = ['-created_at']
+    exclude = ['data']
+    readonly_fields = ['content_hash', 'codec', 'length', 'compressed_size']
+
+@admin.register(Summary)
+class SummaryAdmin(admin.ModelAdmin):
+    list_display = ['content_hash', 'model', 'prompt_version', 'created_at']
+    list_filter = ['model', 'prompt_version']
+    search_fields = ['content_hash']
+    ordering = ['-created_at']
+
+@admin.register(PendingDeletion)
+class PendingDeletionAdmin(admin.ModelAdmin):
+    list_display = ['document_id', 'user_id', 'file_name', 'attempts', 'next_attempt_at', 'created_at']
+    search_fields = ['file_name', 'last_error']
+    ordering = ['next_attempt_at']
 
 admin.site.register(Quiz)
 admin.site.register(FlashcardSet)
@@ -11,3 +11,7 @@ class CoreConfig(AppConfig):
         This ensures that signal handlers are properly connected.
         """
         import core.models  # This will import the signals
+        import core.search_index  # Keeps the search index in sync with deletes
+        import core.vocabulary  # Keeps autocomplete phrases in sync with deletes
+        import core.document_types  # Invalidates the DocumentType registry on changes
+        import core.deletions  # Removes files and index entries of deleted documents after commit
@@ -0,0 +1,222 @@
+"""
+Generation of per-document AI artifacts, shared by the API views and the
+post-extraction warm-up. Each generator returns the existing artifact when
+there is one and holds a lease lock while generating, so a view and a
+warm-up job never pay for the same artifact twice.
+
+Artifacts are written in a single transaction after the model call returns,
+so a crash never leaves a partial artifact behind. agenerate_quiz and
+agenerate_flashcards are the async versions used by the async views; they await
+the model and the lock, and only run the final write on a thread.
+"""
+
+import logging
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.utils import timezone
+
+from .locks import LeaseLock
+from .models import Quiz, FlashcardSet, Flashcard, Summary
+from .services import (
+    get_gemini_quiz, get_gemini_flashcards, aget_gemini_quiz, aget_gemini_flashcards, is_fallback_summary,
+    is_fallback_artifact, SUMMARY_MODEL, SUMMARY_PROMPT_VERSION,
+)
+from .summaries import store_document_summary
+from .tiered_cache import CacheBusy
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactBusy(Exception):
+    """Another worker is generating this artifact right now"""
+
+
+class ArtifactUnavailable(Exception):
+    """The model could not produce the artifact (only a fallback, which is never stored)"""
+
+
+def _model_output(name, data):
+    """data, unless it is a fallback: storing one would stop the real artifact from ever being generated"""
+    if is_fallback_artifact(data):
+        raise ArtifactUnavailable(f"the model gave only a fallback {name}")
+    return data
+
+
+def generate_summary(document):
+    """
+    Return (summary, created); stored summaries of identical text are reused.
+    Raises tiered_cache.CacheBusy while another worker is generating it and
+    ArtifactUnavailable when the model only gave a fallback summary.
+    """
+    summary, created = store_document_summary(document)
+    if is_fallback_summary(summary):
+        raise ArtifactUnavailable("the model gave only a fallback summary")
+    return summary, created
+
+
+def generate_quiz(document):
+    """
+    Return (quiz, created): the document's existing quiz or a newly generated one.
+    Raises ArtifactUnavailable, storing nothing, when the model only gave a fallback quiz.
+    """
+    existing_quiz = Quiz.objects.filter(document=document).first()
+    if existing_quiz:
+        return existing_quiz, False
+
+    # Lease lock shared by all workers, renewed while the generation runs
+    lock = LeaseLock(f"quiz_lock_{document.pk}")
+    if not lock.acquire():
+        raise ArtifactBusy('quiz')
+    try:
+        # Another worker may have finished between the existence check and acquiring the lock
+        existing_quiz = Quiz.objects.filter(document=document).first()
+        if existing_quiz:
+            return existing_quiz, False
+        quiz_data = _model_output('quiz', get_gemini_quiz(document.extracted_text))
+        # A quiz is a single row, so its INSERT is already atomic
+        return Quiz.objects.create(document=document, title=f"Quiz for {document.title}", questions=quiz_data), True
+    finally:
+        lock.release()
+
+
+def generate_flashcards(document):
+    """Return (flashcard_set, created) like generate_quiz, with the same ArtifactUnavailable on fallbacks"""
+    existing_flashcard_set = FlashcardSet.objects.complete().filter(document=document).first()
+    if existing_flashcard_set:
+        return existing_flashcard_set, False
+
+    lock = LeaseLock(f"flashcards_lock_{document.pk}")
+    if not lock.acquire():
+        raise ArtifactBusy('flashcards')
+    try:
+        existing_flashcard_set = FlashcardSet.objects.complete().filter(document=document).first()
+        if existing_flashcard_set:
+            return existing_flashcard_set, False
+        # The model call stays outside the transaction so the database is never locked while waiting for it
+        flashcard_data = _model_output('flashcards', get_gemini_flashcards(document.extracted_text))
+        return store_flashcards(document, flashcard_data['flashcards']), True
+    finally:
+        lock.release()
+
+
+async def agenerate_quiz(document):
+    """generate_quiz for async views; the document must be loaded with its content row (with_content())"""
+    existing_quiz = await Quiz.objects.filter(document=document).afirst()
+    if existing_quiz:
+        return existing_quiz, False
+
+    lock = LeaseLock(f"quiz_lock_{document.pk}")
+    if not await lock.aacquire():
+        raise ArtifactBusy('quiz')
+    try:
+        existing_quiz = await Quiz.objects.filter(document=document).afirst()
+        if existing_quiz:
+            return existing_quiz, False
+        quiz_data = _model_output('quiz', await aget_gemini_quiz(document.extracted_text))
+        return await Quiz.objects.acreate(document=document, title=f"Quiz for {document.title}", questions=quiz_data), True
+    finally:
+        await lock.arelease()
+
+
+async def agenerate_flashcards(document):
+    """generate_flashcards for async views; the document must be loaded with its content row (with_content())"""
+    existing_flashcard_set = await FlashcardSet.objects.complete().filter(document=document).afirst()
+    if existing_flashcard_set:
+        return existing_flashcard_set, False
+
+    lock = LeaseLock(f"flashcards_lock_{document.pk}")
+    if not await lock.aacquire():
+        raise ArtifactBusy('flashcards')
+    try:
+        existing_flashcard_set = await FlashcardSet.objects.complete().filter(document=document).afirst()
+        if existing_flashcard_set:
+            return existing_flashcard_set, False
+        flashcard_data = _model_output('flashcards', await aget_gemini_flashcards(document.extracted_text))
+        # The async ORM has no transactions, so the write runs on a thread
+        return await sync_to_async(store_flashcards)(document, flashcard_data['flashcards']), True
+    finally:
+        await lock.arelease()
+
+
+def store_flashcards(document, cards):
+    """Write a complete flashcard set in one transaction: the set, all cards in one INSERT, then the marker"""
+    with transaction.atomic():
+        # Sets left incomplete by interrupted writes are never served, so drop them
+        FlashcardSet.objects.filter(document=document, completed_at__isnull=True).delete()
+        flashcard_set = FlashcardSet.objects.create(document=document, title=f"Flashcards for {document.title}")
+        Flashcard.objects.bulk_create([
+            Flashcard(flashcard_set=flashcard_set, front=card['front'], back=card['back']) for card in cards
+        ])
+        flashcard_set.completed_at = timezone.now()
+        flashcard_set.save(update_fields=['completed_at'])
+    return flashcard_set
+
+
+ARTIFACT_GENERATORS = {
+    'summary': generate_summary,
+    'quiz': generate_quiz,
+    'flashcards': generate_flashcards,
+}
+
+
+def existing_artifacts(documents, names):
+    """
+    Artifacts that already exist for many documents, with one query per kind:
+    {document_id: {name: artifact}}. Summaries are looked up by content hash,
+    so documents should be loaded with their content row (text deferred).
+    """
+    found = {document.pk: {} for document in documents}
+    if 'quiz' in names:
+        for quiz in Quiz.objects.filter(document__in=documents).order_by('-id'):
+            found[quiz.document_id]['quiz'] = quiz  # Ascending ids win, like .first() in generate_quiz
+    if 'flashcards' in names:
+        flashcard_sets = FlashcardSet.objects.complete().filter(document__in=documents).prefetch_related('flashcards')
+        for flashcard_set in flashcard_sets.order_by('-id'):
+            found[flashcard_set.document_id]['flashcards'] = flashcard_set
+    if 'summary' in names:
+        # Identical text is stored once, so several documents (e.g. re-uploads) can share a hash
+        by_hash = {}
+        for document in documents:
+            if document.content_id:
+                by_hash.setdefault(document.content.content_hash, []).append(document.pk)
+        stored = Summary.objects.filter(
+            content_hash__in=by_hash, prompt_version=SUMMARY_PROMPT_VERSION, model=SUMMARY_MODEL
+        ).values_list('content_hash', 'text')
+        for content_hash, text in stored:
+            for document_id in by_hash[content_hash]:
+                found[document_id]['summary'] = text
+    return found
+
+
+def generate_artifacts(documents, names, allow_generation=None, on_created=None):
+    """
+    Every requested artifact of every document: existing ones loaded in bulk,
+    missing ones generated one at a time. allow_generation(document, name) may
+    return False to skip a generation (e.g. when the user is out of quota);
+    on_created(document, name) is called for each artifact actually created, so
+    quota is only charged for those. Returns {document_id: {name: (status, artifact)}}
+    where status is 'existing', 'created', 'busy', 'skipped' or 'failed'.
+    """
+    found = existing_artifacts(documents, names)
+    results = {}
+    for document in documents:
+        results[document.pk] = outcome = {}
+        for name in names:
+            if name in found[document.pk]:
+                outcome[name] = ('existing', found[document.pk][name])
+                continue
+            if allow_generation is not None and not allow_generation(document, name):
+                outcome[name] = ('skipped', None)
+                continue
+            try:
+                artifact, created = ARTIFACT_GENERATORS[name](document)
+                outcome[name] = ('created' if created else 'existing', artifact)
+                if created and on_created is not None:
+                    on_created(document, name)
+            except (ArtifactBusy, CacheBusy):
+                outcome[name] = ('busy', None)
+            except Exception as e:
+                logger.error(f"Generating {name} for document {document.pk} failed: {e}")
+                outcome[name] = ('failed', None)
+    return results
@@ -0,0 +1,234 @@
+"""
+Async versions of the AI endpoints, for ASGI deployments (see study_companion/asgi.py).
+
+The sync views spend nearly all of their time blocked in the model call, so a
+WSGI deployment needs a worker thread per in-flight AI request. These views
+await the model on the client's asyncio API and read the database with the
+async ORM, so one ASGI worker can hold hundreds of requests that are waiting
+for the model.
+
+Each view subclasses its sync counterpart and shares its validation, stages
+and error responses; only the request flow is rewritten with awaits. Work that
+has no async form (DRF authentication, local search recall, transactions) runs
+on a thread with sync_to_async and is short compared to the model call.
+"""
+
+import inspect
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from rest_framework import status, views
+from rest_framework.response import Response
+
+from . import search_index
+from .artifacts import agenerate_quiz, agenerate_flashcards, ArtifactBusy
+from .locks import LeaseLock
+from .models import UploadedDocument, QuestionAnswer
+from .serializers import QuizSerializer, FlashcardSetSerializer
+from .services import aget_gemini_answer, asmart_search_documents, arerank_search_candidates, agenerate_search_suggestions
+from .summaries import aget_document_summary
+from .tiered_cache import CacheBusy
+from .views import (
+    SummarizeDocumentView, GenerateQuizView, GenerateFlashcardsView, QnAView, SmartSearchView, SearchSuggestionsView,
+    _text_unavailable, _merge_suggestions, _elapsed_ms,
+)
+
+
+class AsyncAPIView(views.APIView):
+    """
+    APIView with coroutine handlers. Authentication, permissions and throttling
+    run through DRF as usual, on a thread; the handler runs on the event loop.
+    """
+    http_method_names = ['post', 'options']
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+async def _get_document(request, pk):
+    # The content row comes along, so reading extracted_text never queries from the event loop
+    return await UploadedDocument.objects.with_content().aget(pk=pk, user=request.user)
+
+
+class AsyncSummarizeDocumentView(AsyncAPIView, SummarizeDocumentView):
+    async def post(self, request, pk):
+        try:
+            doc = await _get_document(request, pk)
+            error = _text_unavailable(doc, "generate summary")
+            if error:
+                return error
+            try:
+                summary = await aget_document_summary(doc)
+            except CacheBusy:
+                return self.busy_response()
+            return Response({"summary": summary})
+        except UploadedDocument.DoesNotExist:
+            return Response({"error": "Document not found."}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return self.failure_response(pk, e)
+
+
+class AsyncGenerateQuizView(AsyncAPIView, GenerateQuizView):
+    async def post(self, request, pk):
+        try:
+            doc = await _get_document(request, pk)
+            error = _text_unavailable(doc, "generate quiz")
+            if error:
+                return error
+            try:
+                quiz, created = await agenerate_quiz(doc)
+            except ArtifactBusy:
+                return self.busy_response()
+            return Response(QuizSerializer(quiz).data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+        except UploadedDocument.DoesNotExist:
+            return Response({"error": "Document not found."}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return self.failure_response(pk, e)
+
+
+class AsyncGenerateFlashcardsView(AsyncAPIView, GenerateFlashcardsView):
+    async def post(self, request, pk):
+        try:
+            doc = await _get_document(request, pk)
+            error = _text_unavailable(doc, "generate flashcards")
+            if error:
+                return error
+            try:
+                flashcard_set, created = await agenerate_flashcards(doc)
+            except ArtifactBusy:
+                return self.busy_response()
+            # Serializing the set reads its cards
+            data = await sync_to_async(lambda: FlashcardSetSerializer(flashcard_set).data)()
+            return Response(data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+        except UploadedDocument.DoesNotExist:
+            return Response({"error": "Document not found."}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return self.failure_response(pk, e)
+
+
+class AsyncQnAView(AsyncAPIView, QnAView):
+    async def post(self, request, pk):
+        question = request.data.get('question')
+        error = self.validate_question(question)
+        if error:
+            return error
+
+        try:
+            doc = await _get_document(request, pk)
+            error = _text_unavailable(doc, "answer questions")
+            if error:
+                return error
+
+            question_hash = self.question_hash(question)
+            cached_qa = await QuestionAnswer.objects.filter(document=doc, question_hash=question_hash).afirst()
+            if cached_qa:
+                return Response({"question": question, "answer": cached_qa.answer})
+
+            lock = LeaseLock(f"qa_lock_{pk}_{question_hash[:16]}")
+            if not await lock.aacquire():
+                return self.busy_response()
+            try:
+                cached_qa = await QuestionAnswer.objects.filter(document=doc, question_hash=question_hash).afirst()
+                if cached_qa:
+                    return Response({"question": question, "answer": cached_qa.answer})
+                answer = await aget_gemini_answer(doc.extracted_text, question)
+                await QuestionAnswer.objects.acreate(
+                    document=doc, question_hash=question_hash, question=question, answer=answer
+                )
+                return Response({"question": question, "answer": answer})
+            finally:
+                await lock.arelease()
+
+        except UploadedDocument.DoesNotExist:
+            return Response({"error": "Document not found."}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return self.failure_response(pk, e)
+
+
+class AsyncSmartSearchView(AsyncAPIView, SmartSearchView):
+    async def post(self, request):
+        started = time.perf_counter()
+        search_query, mode, error = self.validate(request)
+        if error:
+            return error
+
+        try:
+            # Cache lookup, spelling correction and local recall are CPU and database work
+            search = await sync_to_async(self.recall)(request, search_query, mode, started)
+            if isinstance(search, Response):
+                return search
+
+            if mode == 'local':
+                return await sync_to_async(
+                    lambda: self.finish(request, search, search_index.local_search_results(search['candidates']), started)
+                )()
+
+            lock = LeaseLock(f"search_lock_{request.user.id}_{search['query_hash'][:16]}")
+            if not await lock.aacquire():
+                return self.busy_response()
+            try:
+                stage_started = time.perf_counter()
+                if mode == 'hybrid' and search['candidates']:
+                    search_results = await arerank_search_candidates(search['candidates'], search['corrected_query'])
+                    search['timings']['rerank_ms'] = _elapsed_ms(stage_started)
+                else:
+                    documents_data = await sync_to_async(self.model_documents)(request)
+                    search_results = await asmart_search_documents(documents_data, search['corrected_query'])
+                    search['timings']['model_ms'] = _elapsed_ms(stage_started)
+            finally:
+                await lock.arelease()
+
+            return await sync_to_async(self.finish)(request, search, search_results, started)
+
+        except Exception as e:
+            return self.failure_response(request, e)
+
+
+class AsyncSearchSuggestionsView(AsyncAPIView, SearchSuggestionsView):
+    async def post(self, request):
+        partial_query = request.data.get('query', '').strip()
+        enrich = self.wants_enrichment(request)
+
+        if not partial_query or len(partial_query) < 2 or len(partial_query) > 100:
+            return Response({"suggestions": []})
+
+        try:
+            prepared = await sync_to_async(self.local_suggestions)(request, partial_query, enrich)
+            if isinstance(prepared, Response):
+                return prepared
+            suggestions, suggestions_cache_key, documents_data = prepared
+
+            lock = LeaseLock(f"suggestions_lock_{request.user.id}")
+            if not await lock.aacquire():
+                return Response({"suggestions": suggestions})  # Local suggestions only while enrichment runs
+            try:
+                ai_suggestions = await agenerate_search_suggestions(documents_data, partial_query)
+                await cache.aset(suggestions_cache_key, ai_suggestions, timeout=600)
+                return Response({"suggestions": _merge_suggestions(suggestions, ai_suggestions, self.max_suggestions)})
+            finally:
+                await lock.arelease()
+
+        except Exception as e:
+            logging.error(f"Search suggestions failed for user {request.user.id}: {str(e)}")
+            return Response({"suggestions": []})
@@ -0,0 +1,268 @@
+"""
+Shared cache backend stored in a single SQLite file.
+
+Every gunicorn worker on the host opens the same file, so cached summaries,
+rate-limit counters and generation locks are shared between processes instead
+of living in one LocMemCache per worker. `add` and `incr` are single SQL
+statements and therefore atomic across processes, and eviction is driven by
+the total stored size (maintained by triggers) rather than a fixed entry count.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backend.SQLiteCache',
+            'LOCATION': '/path/to/cache.sqlite3',
+            'OPTIONS': {'MAX_SIZE': 64 * 1024 * 1024, 'MAX_ENTRIES': 100000},
+        }
+    }
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    value BLOB,
+    expires REAL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_entries_accessed ON cache_entries (accessed);
+CREATE INDEX IF NOT EXISTS cache_entries_expires ON cache_entries (expires);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_stats (id, entries, bytes) VALUES (0, 0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_entries_insert AFTER INSERT ON cache_entries BEGIN
+    UPDATE cache_stats SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entries_delete AFTER DELETE ON cache_entries BEGIN
+    UPDATE cache_stats SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entries_resize AFTER UPDATE OF size ON cache_entries BEGIN
+    UPDATE cache_stats SET bytes = bytes + NEW.size - OLD.size WHERE id = 0;
+END;
+"""
+
+ROW_OVERHEAD = 64  # approximate per-row bytes on top of key and value
+ACCESS_RESOLUTION = 30  # seconds; reads refresh the LRU stamp at most this often
+SQLITE_INT_MIN, SQLITE_INT_MAX = -(2 ** 63), 2 ** 63 - 1
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        self.busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    # --- Connection ---
+
+    def _connection(self):
+        """One connection per thread, reopened after a fork (gunicorn --preload)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(SCHEMA)
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    # --- Serialization ---
+
+    @staticmethod
+    def _encode(value):
+        # Plain integers are stored as SQL integers so incr() can run in the database
+        if type(value) is int and SQLITE_INT_MIN <= value <= SQLITE_INT_MAX:
+            return value
+        return sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def _decode(stored):
+        if isinstance(stored, int):
+            return stored
+        return pickle.loads(stored)
+
+    @staticmethod
+    def _size(key, encoded):
+        return ROW_OVERHEAD + len(key) + (8 if isinstance(encoded, int) else len(encoded))
+
+    # --- Cache API ---
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Store value only if key is missing or expired; True if it was stored"""
+        key = self.make_and_validate_key(key, version=version)
+        encoded = self._encode(value)
+        now = time.time()
+        cursor = self._connection().execute(
+            """
+            INSERT INTO cache_entries (key, value, expires, size, accessed) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                value = excluded.value, expires = excluded.expires, size = excluded.size, accessed = excluded.accessed
+            WHERE cache_entries.expires IS NOT NULL AND cache_entries.expires <= ?
+            """,
+            (key, encoded, self.get_backend_timeout(timeout), self._size(key, encoded), now, now),
+        )
+        added = cursor.rowcount == 1
+        if added:
+            self._cull_if_needed()
+        return added
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        now = time.time()
+        row = connection.execute(
+            'SELECT value, expires, accessed FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return default
+        stored, expires, accessed = row
+        if expires is not None and expires <= now:
+            connection.execute('DELETE FROM cache_entries WHERE key = ? AND expires <= ?', (key, now))
+            return default
+        if accessed < now - ACCESS_RESOLUTION:
+            connection.execute('UPDATE cache_entries SET accessed = ? WHERE key = ?', (now, key))
+        try:
+            return self._decode(stored)
+        except (pickle.PickleError, EOFError, AttributeError, ImportError):
+            return default
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        encoded = self._encode(value)
+        self._connection().execute(
+            """
+            INSERT INTO cache_entries (key, value, expires, size, accessed) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                value = excluded.value, expires = excluded.expires, size = excluded.size, accessed = excluded.accessed
+            """,
+            (key, encoded, self.get_backend_timeout(timeout), self._size(key, encoded), time.time()),
+        )
+        self._cull_if_needed()
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        cursor = self._connection().execute(
+            'UPDATE cache_entries SET expires = ?, accessed = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now),
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+        return cursor.rowcount == 1
+
+    def compare_and_delete(self, key, expected, version=None):
+        """Delete key only while it still holds expected (e.g. a lock released by its owner)"""
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute(
+            'DELETE FROM cache_entries WHERE key = ? AND value = ? AND (expires IS NULL OR expires > ?)',
+            (key, self._encode(expected), time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def compare_and_touch(self, key, expected, timeout=DEFAULT_TIMEOUT, version=None):
+        """Extend key's expiry only while it still holds expected (e.g. a lease renewed by its owner)"""
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        cursor = self._connection().execute(
+            'UPDATE cache_entries SET expires = ?, accessed = ? '
+            'WHERE key = ? AND value = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, self._encode(expected), now),
+        )
+        return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            'SELECT 1 FROM cache_entries WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def incr(self, key, delta=1, version=None):
+        """Atomically add delta to an integer value; raises ValueError if the key is missing"""
+        cache_key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        now = time.time()
+        rows = connection.execute(
+            """
+            UPDATE cache_entries SET value = value + ?
+            WHERE key = ? AND typeof(value) = 'integer' AND (expires IS NULL OR expires > ?)
+            RETURNING value
+            """,
+            (delta, cache_key, now),
+        ).fetchall()  # fetch everything so the statement finishes and its write commits
+        if rows:
+            return rows[0][0]
+        if self.has_key(key, version=version):
+            # Stored as a pickle (e.g. a bool or huge int) - fall back to a non-atomic update
+            value = self.get(key, version=version) + delta
+            self.set(key, value, version=version)
+            return value
+        raise ValueError("Key '%s' not found" % key)
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache_entries')
+
+    def close(self, **kwargs):
+        # Called after every request; the per-thread connection is deliberately kept open
+        pass
+
+    # --- Eviction ---
+
+    def stats(self):
+        """(entries, bytes) currently stored, including not yet culled expired rows"""
+        return self._connection().execute('SELECT entries, bytes FROM cache_stats WHERE id = 0').fetchone()
+
+    def _cull_if_needed(self):
+        entries, size = self.stats()
+        if entries <= self._max_entries and size <= self.max_size:
+            return
+        self._cull()
+
+    def _cull(self):
+        """
+        Drop expired rows, then least recently used rows until the cache is back
+        under (1 - 1/CULL_FREQUENCY) of both limits.
+        """
+        connection = self._connection()
+        target_fraction = 1 - 1 / self._cull_frequency if self._cull_frequency else 0
+        target_entries = int(self._max_entries * target_fraction)
+        target_size = int(self.max_size * target_fraction)
+
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute('DELETE FROM cache_entries WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+            entries, size = connection.execute('SELECT entries, bytes FROM cache_stats WHERE id = 0').fetchone()
+            while entries > target_entries or size > target_size:
+                # Exactly the surplus rows when over the entry limit; when only over the size limit, 100 at a time
+                batch = entries - target_entries if entries > target_entries else 100
+                cursor = connection.execute(
+                    'DELETE FROM cache_entries WHERE key IN '
+                    '(SELECT key FROM cache_entries ORDER BY accessed LIMIT ?)',
+                    (batch,),
+                )
+                if cursor.rowcount == 0:
+                    break
+                entries, size = connection.execute('SELECT entries, bytes FROM cache_stats WHERE id = 0').fetchone()
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
@@ -0,0 +1,103 @@
+"""
+Per-user ETags for document and artifact reads.
+
+Each ETag is derived from cheap row version stamps (one aggregate or
+values_list query), so a matching If-None-Match is answered with 304 by
+Django's condition() decorator before the view serializes anything.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .fieldsets import requested_expansions
+from .models import UploadedDocument, Quiz, FlashcardSet, Summary
+from .services import SUMMARY_MODEL, SUMMARY_PROMPT_VERSION
+
+# Bump when the serialized shape of these endpoints changes so clients refetch
+ETAG_SCHEMA_VERSION = 1
+
+
+def make_etag(*parts):
+    return hashlib.sha256('|'.join(str(part) for part in (ETAG_SCHEMA_VERSION,) + parts).encode()).hexdigest()[:32]
+
+
+def document_list_etag(request, *args, **kwargs):
+    queryset = UploadedDocument.objects.filter(user=request.user)
+    document_type_id = request.query_params.get('document_type')
+    if document_type_id:
+        queryset = queryset.filter(document_type_id=document_type_id)
+    stamps = queryset.aggregate(
+        count=Count('id'), updated=Max('updated_at'), type_updated=Max('document_type__updated_at')
+    )
+    return make_etag('documents', request.user.id, request.query_params.urlencode(),
+                     stamps['count'], stamps['updated'], stamps['type_updated'],
+                     *_expansion_stamps(request, queryset))
+
+
+def document_etag(request, pk, *args, **kwargs):
+    documents = UploadedDocument.objects.filter(pk=pk, user=request.user)
+    stamps = documents.values_list('updated_at', 'document_type__updated_at').first()
+    if stamps is None:
+        return None  # Let the view answer 404
+    return make_etag('document', request.user.id, pk, request.query_params.urlencode(), *stamps,
+                     *_expansion_stamps(request, documents))
+
+
+def _expansion_stamps(request, documents):
+    """
+    Versions of the artifacts ?expand= adds to the documents: one aggregate per kind.
+    Artifacts are only ever added or deleted, so count + highest id covers every change.
+    """
+    stamps = []
+    for name in requested_expansions(request.query_params):
+        if name == 'quiz':
+            artifacts = Quiz.objects.filter(document__in=documents)
+        elif name == 'flashcards':
+            artifacts = FlashcardSet.objects.complete().filter(document__in=documents)
+        else:
+            artifacts = Summary.objects.filter(
+                content_hash__in=documents.values('content__content_hash'),
+                prompt_version=SUMMARY_PROMPT_VERSION, model=SUMMARY_MODEL,
+            )
+        aggregate = artifacts.aggregate(count=Count('id'), last=Max('id'))
+        stamps += [name, aggregate['count'], aggregate['last']]
+    return stamps
+
+
+def _artifact_etag(queryset, kind):
+    # Quizzes and flashcard sets are never edited after creation, so id + creation time is their version
+    def etag_func(request, pk, *args, **kwargs):
+        stamps = queryset.filter(document_id=pk, document__user=request.user).order_by('id').values_list(
+            'id', 'created_at'
+        ).first()
+        if stamps is None:
+            return None
+        return make_etag(kind, request.user.id, pk, *stamps)
+    return etag_func
+
+
+quiz_etag = _artifact_etag(Quiz.objects.all(), 'quiz')
+flashcards_etag = _artifact_etag(FlashcardSet.objects.complete(), 'flashcards')
+
+
+def private_conditional(etag_func):
+    """
+    Method decorator for DRF views: answer If-None-Match with 304 and mark the
+    response as per-user so browsers revalidate and shared caches never store it.
+    """
+    def decorator(view_method):
+        conditional = condition(etag_func=etag_func)(view_method)
+
+        @wraps(view_method)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Authorization'])
+            return response
+        return wrapper
+    return method_decorator(decorator)
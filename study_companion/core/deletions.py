@@ -0,0 +1,127 @@
+"""
+Deferred cleanup of deleted documents: the uploaded file and the document's
+entries in per-user indexes (search index chunks, vocabulary phrases).
+
+Deleting a document only inserts a PendingDeletion row, in the same
+transaction as the delete, so a rollback keeps the file and a commit never
+leaves it behind. Once the transaction commits, a daemon thread per process
+removes queued documents in batches, grouped by user, so deleting a whole
+account rewrites each index once instead of once per document. Failures are
+retried with exponential backoff; the maintenance runner picks up anything
+left over from a process that stopped.
+"""
+
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import UploadedDocument, PendingDeletion
+from .sqlite import retry_on_locked
+
+logger = logging.getLogger(__name__)
+
+RETRY_POLL_INTERVAL = 60  # seconds between queue checks while failed cleanups wait for a retry
+
+_cleanup_handlers = []
+_wakeup = threading.Event()
+_worker = None
+_worker_guard = threading.Lock()
+
+
+def register_cleanup(handler):
+    """
+    Add handler(user_id, document_ids), called for every batch of deleted documents
+    before their files are removed. It must be idempotent: failed batches are retried.
+    """
+    _cleanup_handlers.append(handler)
+    return handler
+
+
+@receiver(post_delete, sender=UploadedDocument)
+def queue_document_cleanup(sender, instance, **kwargs):
+    PendingDeletion.objects.create(user_id=instance.user_id, document_id=instance.pk, file_name=instance.file.name or '')
+    transaction.on_commit(wake_worker)
+
+
+def wake_worker():
+    global _worker
+    with _worker_guard:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='document-cleanup', daemon=True)
+            _worker.start()
+    _wakeup.set()
+
+
+def _run():
+    while True:
+        _wakeup.clear()  # Before working the queue, so a delete committed meanwhile wakes the next round
+        try:
+            process_pending()
+            waiting = PendingDeletion.objects.exists()
+        except Exception as e:
+            logger.error(f"Document cleanup failed: {e}")
+            waiting = True
+        finally:
+            connections.close_all()
+        # Sleep until the next delete commits, or until failed cleanups are due again
+        _wakeup.wait(RETRY_POLL_INTERVAL if waiting else None)
+
+
+def _retry_delay(attempts):
+    base = getattr(settings, 'DELETION_RETRY_BASE_SECONDS', 30)
+    return timedelta(seconds=min(getattr(settings, 'DELETION_RETRY_MAX_SECONDS', 3600), base * 2 ** (attempts - 1)))
+
+
+def _clean_up(user_id, items):
+    for handler in _cleanup_handlers:
+        handler(user_id, [item.document_id for item in items])
+    for item in items:
+        if item.file_name:
+            default_storage.delete(item.file_name)  # A file that is already gone counts as deleted
+
+
+def process_batch(batch_size=None):
+    """
+    Clean up one batch of due documents. Returns (cleaned, failed); a failed user
+    group is retried later as a whole, after an exponentially growing delay.
+    """
+    batch_size = batch_size or getattr(settings, 'DELETION_BATCH_SIZE', 200)
+    items = list(PendingDeletion.objects.filter(next_attempt_at__lte=timezone.now()).order_by('id')[:batch_size])
+    by_user = {}
+    for item in items:
+        by_user.setdefault(item.user_id, []).append(item)
+
+    cleaned, failed = [], 0
+    for user_id, user_items in by_user.items():
+        try:
+            _clean_up(user_id, user_items)
+            cleaned += [item.pk for item in user_items]
+        except Exception as e:
+            logger.warning(f"Cleanup of {len(user_items)} deleted documents of user {user_id} failed, will retry: {e}")
+            attempts = max(item.attempts for item in user_items) + 1
+            retry_on_locked(PendingDeletion.objects.filter(pk__in=[item.pk for item in user_items]).update)(
+                attempts=F('attempts') + 1, last_error=str(e), next_attempt_at=timezone.now() + _retry_delay(attempts)
+            )
+            failed += len(user_items)
+    if cleaned:
+        retry_on_locked(PendingDeletion.objects.filter(pk__in=cleaned).delete)()
+    return len(cleaned), failed
+
+
+def process_pending(batch_size=None):
+    """Work the queue until no cleanup is due; returns {'cleaned': n, 'failed': n}"""
+    totals = {'cleaned': 0, 'failed': 0}
+    while True:
+        cleaned, failed = process_batch(batch_size)
+        if not cleaned and not failed:
+            return totals
+        totals['cleaned'] += cleaned
+        totals['failed'] += failed
@@ -0,0 +1,93 @@
+"""
+Process-wide registry of DocumentType rows.
+
+The table is tiny and almost never changes, so every worker keeps all rows in
+memory, indexed by id, name and file extension. A version number in the
+shared cache is bumped (after commit) whenever a type is saved or deleted;
+each process compares it on access and reloads only when it moved, so type
+resolution on upload and type listings need no database queries.
+"""
+
+import threading
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import DocumentType
+
+VERSION_KEY = 'document_type_registry_version'
+
+# Map file extensions to document types
+EXTENSION_TO_TYPE = {
+    'pdf': 'PDF Document',
+    'doc': 'Word Document',
+    'docx': 'Word Document',
+    'txt': 'Text Document',
+    'ppt': 'PowerPoint Presentation',
+    'pptx': 'PowerPoint Presentation',
+    'xls': 'Excel Spreadsheet',
+    'xlsx': 'Excel Spreadsheet',
+}
+DEFAULT_TYPE = 'Other Document'
+
+
+class DocumentTypeRegistry:
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._version = None
+        self._types = ()
+        self._by_id = {}
+        self._by_name = {}
+
+    def _current(self):
+        version = cache.get(VERSION_KEY, 0)
+        if version != self._version:
+            with self._guard:
+                if version != self._version:
+                    # Read the version before the rows: a change made during the load bumps it again
+                    types = tuple(DocumentType.objects.order_by('name'))
+                    self._by_id = {doc_type.id: doc_type for doc_type in types}
+                    self._by_name = {doc_type.name: doc_type for doc_type in types}
+                    self._types = types
+                    self._version = version
+        return self
+
+    def all(self):
+        """All types ordered by name (shared instances - do not modify them)"""
+        return list(self._current()._types)
+
+    def get(self, type_id):
+        return self._current()._by_id.get(type_id)
+
+    def get_by_name(self, name):
+        return self._current()._by_name.get(name)
+
+    def for_extension(self, extension):
+        """The type for a file extension, created on first use like before"""
+        type_name = EXTENSION_TO_TYPE.get((extension or '').lower(), DEFAULT_TYPE)
+        doc_type = self.get_by_name(type_name)
+        if doc_type is None:
+            doc_type, _ = DocumentType.objects.get_or_create(
+                name=type_name,
+                defaults={'description': f"Auto-generated type for {(extension or 'unknown').upper()} files"},
+            )
+        return doc_type
+
+    def invalidate(self):
+        """Make every process reload the registry on its next access"""
+        cache.add(VERSION_KEY, 0, timeout=None)
+        cache.incr(VERSION_KEY)
+        with self._guard:
+            self._version = None
+
+
+registry = DocumentTypeRegistry()
+
+
+@receiver(post_save, sender=DocumentType)
+@receiver(post_delete, sender=DocumentType)
+def invalidate_document_type_registry(sender, **kwargs):
+    # After commit, so no process reloads the old rows under the new version
+    transaction.on_commit(registry.invalidate)
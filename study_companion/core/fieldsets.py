@@ -0,0 +1,101 @@
+"""
+Sparse fieldsets and expansions for the document endpoints.
+
+?fields=id,title,document_type keeps only the listed fields in each document
+and the query loads only the columns behind them, so the dashboard list never
+reads file paths or error text and the detail endpoint skips the compressed
+text unless extracted_text is asked for.
+
+?expand=summary,quiz,flashcards adds the document's stored artifacts (nothing
+is generated here), loaded with one query per kind for the whole page, so the
+detail page gets the document and its artifacts in one request.
+"""
+
+from rest_framework.exceptions import ValidationError
+
+from .artifacts import existing_artifacts
+
+EXPANSIONS = ('summary', 'quiz', 'flashcards')
+
+# Columns behind serializer fields that are not plain model fields
+FIELD_COLUMNS = {
+    'extracted_text': ('content',),
+}
+
+
+def _split(value):
+    return [name for name in (part.strip() for part in (value or '').split(',')) if name]
+
+
+def requested_expansions(query_params):
+    """Known ?expand= names in canonical order; used by the ETag functions as well"""
+    requested = set(_split(query_params.get('expand')))
+    return [name for name in EXPANSIONS if name in requested]
+
+
+class SparseFieldsetMixin:
+    """
+    For generic views whose serializer uses SparseFieldsMixin: validates ?fields=
+    and ?expand=, narrows GET querysets with fieldset_queryset() and passes the
+    fieldset and the expanded artifacts to the serializer.
+    """
+
+    def get_fieldset(self):
+        """(fields or None for all, expansions); unknown names are a 400"""
+        if not hasattr(self, '_fieldset'):
+            serializer_class = self.get_serializer_class()
+            readable = [name for name, field in serializer_class().fields.items() if not field.write_only]
+            fields = _split(self.request.query_params.get('fields')) or None
+            errors = {}
+            if fields is not None:
+                unknown = [name for name in fields if name not in readable]
+                if unknown:
+                    errors['fields'] = f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(readable)}."
+            unknown = [name for name in _split(self.request.query_params.get('expand')) if name not in EXPANSIONS]
+            if unknown:
+                errors['expand'] = f"Unknown expansions: {', '.join(unknown)}. Available: {', '.join(EXPANSIONS)}."
+            if errors:
+                raise ValidationError(errors)
+            self._fieldset = (fields, requested_expansions(self.request.query_params))
+        return self._fieldset
+
+    def fieldset_queryset(self, queryset):
+        """Load only the columns the requested fields and expansions read"""
+        if self.request.method != 'GET':
+            return queryset
+        fields, expand = self.get_fieldset()
+        readable = fields if fields is not None else list(self.get_serializer_class()().fields)
+        needs_text = 'extracted_text' in readable
+        if fields is not None:
+            columns = {'id'}
+            for name in fields:
+                columns.update(FIELD_COLUMNS.get(name, (name,)))
+            if 'summary' in expand:
+                columns.update(('extraction_status', 'content', 'content__content_hash'))
+            # The cursor is built from the last row's ordering fields; deferring them costs a query per page
+            columns.update(self._ordering_columns())
+            queryset = queryset.only(*columns)
+        if needs_text:
+            queryset = queryset.select_related('content')
+        elif 'summary' in expand:
+            # Summaries are found by content hash; the compressed text stays in the database
+            queryset = queryset.select_related('content').defer('content__data')
+        return queryset
+
+    def _ordering_columns(self):
+        ordering = getattr(getattr(self, 'pagination_class', None), 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        return [field.lstrip('-') for field in ordering]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'], context['expand'] = self.get_fieldset()
+        return context
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand = self.get_fieldset()
+        if expand and args:
+            documents = list(args[0]) if kwargs.get('many') else [args[0]]
+            kwargs['context'] = {**self.get_serializer_context(), 'artifacts': existing_artifacts(documents, expand)}
+        return super().get_serializer(*args, **kwargs)
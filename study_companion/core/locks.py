@@ -0,0 +1,264 @@
+"""
+Lease-based locks on the shared cache, used to stop duplicate AI generations.
+
+A lock is a cache entry holding a random owner token with a short lease. The
+lease is acquired atomically with cache.add(), renewed by a heartbeat thread
+for as long as the work runs (so a slow Gemini call never lets a second worker
+in), and released only by its owner. Acquisition wait times and contention
+are recorded per lock kind and flushed to the shared cache periodically, so
+lock_stats() reports them across all workers. Async views use
+aacquire()/arelease(), which renew the lease from an asyncio task instead of a
+thread.
+"""
+
+import asyncio
+import logging
+import secrets
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('acquired', 'contended', 'renewed', 'lost', 'wait_ms_total')
+STATS_FLUSH_INTERVAL = 30  # seconds
+KINDS_KEY = 'lock_stats_kinds'
+
+
+class LockTimeout(Exception):
+    """`with LeaseLock(...)` could not take the lock"""
+
+
+def _new_stats():
+    return {**dict.fromkeys(METRICS, 0), 'wait_ms_total': 0.0, 'wait_ms_max': 0.0}
+
+
+_stats = defaultdict(_new_stats)
+_stats_guard = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def _update(kind, changes):
+    """Count changes in this process's counters; True when they are due to be flushed"""
+    with _stats_guard:
+        stats = _stats[kind]
+        for name, value in changes.items():
+            if name == 'wait_ms':
+                stats['wait_ms_total'] += value
+                stats['wait_ms_max'] = max(stats['wait_ms_max'], value)
+            else:
+                stats[name] += value
+        return time.monotonic() - _last_flush >= STATS_FLUSH_INTERVAL
+
+
+def _record(kind, **changes):
+    if _update(kind, changes):
+        flush_lock_stats()
+
+
+async def _arecord(kind, **changes):
+    if _update(kind, changes):
+        await sync_to_async(flush_lock_stats)()
+
+
+def _stats_key(kind, metric):
+    return f"lock_stats_{kind}_{metric}"
+
+
+def flush_lock_stats():
+    """Add this process's counters to the shared totals"""
+    global _stats, _last_flush
+    with _stats_guard:
+        counts, _stats = _stats, defaultdict(_new_stats)
+        _last_flush = time.monotonic()
+    if not counts:
+        return
+    # Re-added on every flush, so a kind lost to a concurrent update comes back with the next one
+    kinds = cache.get(KINDS_KEY, [])
+    if not set(counts) <= set(kinds):
+        cache.set(KINDS_KEY, sorted(set(kinds) | set(counts)), timeout=None)
+    for kind, stats in counts.items():
+        for metric in METRICS:
+            value = round(stats[metric])  # The cache only increments integers; wait times are whole ms
+            if value:
+                key = _stats_key(kind, metric)
+                cache.add(key, 0, timeout=None)
+                cache.incr(key, value)
+        # Not atomic, but a maximum that is briefly too low is harmless
+        key = _stats_key(kind, 'wait_ms_max')
+        if stats['wait_ms_max'] > cache.get(key, 0):
+            cache.set(key, round(stats['wait_ms_max'], 1), timeout=None)
+
+
+def lock_stats():
+    """
+    Per-kind lock counters across all workers, e.g.
+    {'summary': {'acquired': 3, 'contended': 1, 'wait_ms_avg': 12.5, ...}}
+    """
+    flush_lock_stats()
+    metrics = (*METRICS, 'wait_ms_max')
+    totals = {}
+    for kind in cache.get(KINDS_KEY, []):
+        values = cache.get_many([_stats_key(kind, metric) for metric in metrics])
+        stats = {metric: values.get(_stats_key(kind, metric), 0) for metric in metrics}
+        stats['wait_ms_avg'] = stats['wait_ms_total'] / stats['acquired'] if stats['acquired'] else 0.0
+        totals[kind] = stats
+    return totals
+
+
+def reset_lock_stats():
+    global _stats
+    with _stats_guard:
+        _stats = defaultdict(_new_stats)
+    kinds = cache.get(KINDS_KEY, [])
+    cache.delete_many([_stats_key(kind, metric) for kind in kinds for metric in (*METRICS, 'wait_ms_max')] + [KINDS_KEY])
+
+
+def _compare_and_delete(key, token):
+    if hasattr(cache, 'compare_and_delete'):
+        return cache.compare_and_delete(key, token)
+    if cache.get(key) == token:  # Backends without compare-and-delete: small race window
+        return cache.delete(key)
+    return False
+
+
+def _compare_and_touch(key, token, timeout):
+    if hasattr(cache, 'compare_and_touch'):
+        return cache.compare_and_touch(key, token, timeout)
+    return cache.get(key) == token and cache.touch(key, timeout)
+
+
+class LeaseLock:
+    """
+    Usage:
+        lock = LeaseLock(f"summary_lock_{pk}")
+        if not lock.acquire():
+            return Response(..., status=429)
+        try:
+            ...
+        finally:
+            lock.release()
+
+    or, waiting up to `wait` seconds and raising LockTimeout if it stays busy:
+        with LeaseLock(f"summary_lock_{pk}", wait=5):
+            ...
+    """
+
+    def __init__(self, name, lease=None, heartbeat=True, wait=0):
+        self.name = name
+        self.key = f"lease_{name}"
+        self.kind = name.split('_lock', 1)[0]
+        self.lease = lease or getattr(settings, 'GENERATION_LOCK_LEASE_SECONDS', 30)
+        self.heartbeat = heartbeat
+        self.wait = wait
+        self.token = None
+        self.lost = False
+        self._stop = threading.Event()
+        self._heartbeat_thread = None
+        self._heartbeat_task = None
+
+    @property
+    def held(self):
+        return self.token is not None and not self.lost
+
+    def acquire(self, wait=0, poll_interval=0.1):
+        """Try to take the lock, waiting up to `wait` seconds; True if it is now held"""
+        token = secrets.token_hex(16)
+        started = time.perf_counter()
+        deadline = started + wait
+        contended = False
+        while True:
+            if cache.add(self.key, token, timeout=self.lease):
+                break
+            contended = True
+            if time.perf_counter() >= deadline:
+                _record(self.kind, contended=1)
+                logger.info(f"Lock {self.name} is busy (waited {(time.perf_counter() - started) * 1000:.0f} ms)")
+                return False
+            time.sleep(poll_interval)
+
+        wait_ms = (time.perf_counter() - started) * 1000
+        _record(self.kind, acquired=1, contended=int(contended), wait_ms=wait_ms)
+        self.token = token
+        self.lost = False
+        if self.heartbeat:
+            self._stop.clear()
+            self._heartbeat_thread = threading.Thread(target=self._renew_until_released, name=f"lease-{self.name}", daemon=True)
+            self._heartbeat_thread.start()
+        return True
+
+    def renew(self):
+        """Extend the lease; False (and the lock marked lost) if another owner took over"""
+        if not self.token:
+            return False
+        if _compare_and_touch(self.key, self.token, self.lease):
+            _record(self.kind, renewed=1)
+            return True
+        self.lost = True
+        _record(self.kind, lost=1)
+        logger.warning(f"Lease on {self.name} was lost before the work finished")
+        return False
+
+    def _renew_until_released(self):
+        while not self._stop.wait(self.lease / 3):
+            if not self.renew():
+                return
+
+    def release(self):
+        """Release the lock if this instance still owns it"""
+        if not self.token:
+            return False
+        self._stop.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
+            self._heartbeat_thread = None
+        released = _compare_and_delete(self.key, self.token)
+        self.token = None
+        return released
+
+    async def aacquire(self):
+        """Try to take the lock without waiting, from async code; True if it is now held"""
+        token = secrets.token_hex(16)
+        if not await cache.aadd(self.key, token, timeout=self.lease):
+            await _arecord(self.kind, contended=1)
+            logger.info(f"Lock {self.name} is busy")
+            return False
+        await _arecord(self.kind, acquired=1, wait_ms=0.0)
+        self.token = token
+        self.lost = False
+        if self.heartbeat:
+            self._heartbeat_task = asyncio.create_task(self._arenew_until_released())
+        return True
+
+    async def _arenew_until_released(self):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            if not await sync_to_async(self.renew)():
+                return
+
+    async def arelease(self):
+        """release() for locks taken with aacquire()"""
+        if not self.token:
+            return False
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        released = await sync_to_async(_compare_and_delete)(self.key, self.token)
+        self.token = None
+        return released
+
+    def __enter__(self):
+        if not self.acquire(wait=self.wait):
+            raise LockTimeout(f"Lock {self.name} is busy")
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,201 @@
+"""
+Periodic maintenance: purge cache rows and expired signups, reconcile the
+media directory with the database and retry queued document cleanups.
+
+Each task works in bounded memory however large the tables and directories
+grow: rows are deleted a batch of keys at a time, one short write transaction
+per batch (core.sqlite.delete_in_batches), and files are read from the
+directory as a stream and checked against the database a batch at a time.
+
+Run tasks with `manage.py run_maintenance` (e.g. from cron), or set
+MAINTENANCE_SCHEDULER_ENABLED to run MAINTENANCE_SCHEDULE from a daemon thread
+in every server process. The due marker and a lease lock live in the shared
+cache, so a task runs once per interval however many workers there are.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.utils import timezone
+
+from . import deletions
+from .locks import LeaseLock
+from .models import SearchCache, QuestionAnswer, TemporaryUser, UploadedDocument
+from .sqlite import delete_in_batches, delete_overflow
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_POLL_INTERVAL = 60  # seconds between checks for due tasks
+MISSING_FILES_LOGGED = 20  # documents with missing files named in the log per run
+
+_scheduler = None
+_scheduler_guard = threading.Lock()
+
+
+# --- Tasks ---
+
+def purge_search_cache(batch_size=None):
+    """Expired, outdated and over-quota search cache rows (see SearchCacheManager.sweep)"""
+    return {'deleted': SearchCache.objects.sweep(batch_size=batch_size)}
+
+
+def purge_qa_cache(batch_size=None):
+    """Answers older than QA_CACHE_MAX_AGE_DAYS and each document's answers beyond the newest QA_CACHE_MAX_ENTRIES_PER_DOCUMENT"""
+    expired = QuestionAnswer.objects.filter(
+        created_at__lt=timezone.now() - timedelta(days=getattr(settings, 'QA_CACHE_MAX_AGE_DAYS', 90))
+    )
+    return {
+        'expired': delete_in_batches(expired, batch_size),
+        'evicted': delete_overflow(
+            QuestionAnswer.objects.all(), 'document_id', getattr(settings, 'QA_CACHE_MAX_ENTRIES_PER_DOCUMENT', 200),
+            ('-created_at', '-pk'), batch_size
+        ),
+    }
+
+
+def purge_temporary_users(batch_size=None):
+    """Signups whose OTP expired more than TEMPORARY_USER_RETENTION_HOURS ago"""
+    retention = timedelta(hours=getattr(settings, 'TEMPORARY_USER_RETENTION_HOURS', 24))
+    expired = TemporaryUser.objects.filter(created_at__lt=timezone.now() - TemporaryUser.OTP_LIFETIME - retention)
+    return {'expired': delete_in_batches(expired, batch_size)}
+
+
+def _media_files(root):
+    """(name relative to MEDIA_ROOT, modification time) of every file under root, streamed with scandir"""
+    pending = [root]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    name = os.path.relpath(entry.path, settings.MEDIA_ROOT).replace(os.sep, '/')
+                    yield name, entry.stat(follow_symlinks=False).st_mtime
+
+
+def _delete_orphans(batch, dry_run):
+    referenced = set(UploadedDocument.objects.filter(file__in=[name for name, _ in batch]).values_list('file', flat=True))
+    orphans = [name for name, _ in batch if name not in referenced]
+    if not dry_run:
+        for name in orphans:
+            default_storage.delete(name)
+    return len(orphans)
+
+
+def reconcile_media(batch_size=None, dry_run=False):
+    """
+    Delete files under the documents upload directory that no document refers to,
+    and count documents whose file is gone (those rows are reported, never deleted).
+    Files newer than MEDIA_ORPHAN_GRACE_HOURS are left alone: an upload writes its
+    file before its row is committed. With dry_run orphans are only counted.
+    """
+    batch_size = batch_size or getattr(settings, 'MAINTENANCE_BATCH_SIZE', 1000)
+    grace_cutoff = time.time() - getattr(settings, 'MEDIA_ORPHAN_GRACE_HOURS', 24) * 3600
+    upload_dir = UploadedDocument._meta.get_field('file').upload_to
+    result = {'files': 0, 'orphaned': 0, 'missing': 0}
+
+    batch = []
+    for name, modified in _media_files(os.path.join(settings.MEDIA_ROOT, upload_dir)):
+        result['files'] += 1
+        if modified >= grace_cutoff:
+            continue
+        batch.append((name, modified))
+        if len(batch) >= batch_size:
+            result['orphaned'] += _delete_orphans(batch, dry_run)
+            batch = []
+    if batch:
+        result['orphaned'] += _delete_orphans(batch, dry_run)
+
+    last_pk = 0
+    while True:
+        rows = list(UploadedDocument.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'file')[:batch_size])
+        for pk, name in rows:
+            if not name or not default_storage.exists(name):
+                if result['missing'] < MISSING_FILES_LOGGED:
+                    logger.warning(f"Document {pk} refers to a missing file: {name or '(none)'}")
+                result['missing'] += 1
+        if len(rows) < batch_size:
+            break
+        last_pk = rows[-1][0]
+    return result
+
+
+def process_deletions(batch_size=None):
+    """Queued cleanups of deleted documents, e.g. left behind by a process that stopped (see core.deletions)"""
+    return deletions.process_pending(batch_size)
+
+
+TASKS = {
+    'search_cache': purge_search_cache,
+    'qa_cache': purge_qa_cache,
+    'temporary_users': purge_temporary_users,
+    'media': reconcile_media,
+    'deletions': process_deletions,
+}
+
+
+def run_task(name, **options):
+    """
+    Run one task under its lease lock, passing options (batch_size, dry_run for
+    media) through. Returns its counts, or None when the task is already running
+    somewhere else.
+    """
+    lock = LeaseLock(f"maintenance_lock_{name}")
+    if not lock.acquire():
+        return None
+    try:
+        started = time.perf_counter()
+        result = TASKS[name](**options)
+        logger.info(f"Maintenance task {name} finished in {time.perf_counter() - started:.1f}s: {result}")
+        return result
+    finally:
+        lock.release()
+
+
+# --- Scheduler ---
+
+def run_scheduler(schedule=None, stop=None):
+    """
+    Run each task of schedule ({name: seconds between runs}, default
+    MAINTENANCE_SCHEDULE) whenever it is due, until stop (an Event) is set.
+    """
+    schedule = schedule if schedule is not None else getattr(settings, 'MAINTENANCE_SCHEDULE', {})
+    unknown = set(schedule) - set(TASKS)
+    if unknown:
+        logger.warning(f"Unknown maintenance tasks in schedule: {', '.join(sorted(unknown))}")
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        for name, interval in schedule.items():
+            # The first worker to add the marker runs the task; the marker expires when the next run is due
+            if name not in TASKS or not cache.add(f"maintenance_due_{name}", True, timeout=interval):
+                continue
+            try:
+                run_task(name)
+            except Exception as e:
+                logger.error(f"Maintenance task {name} failed: {e}")
+            finally:
+                connections.close_all()
+        stop.wait(SCHEDULER_POLL_INTERVAL)
+
+
+def start_scheduler():
+    """Start this process's scheduler thread when MAINTENANCE_SCHEDULER_ENABLED; safe to call repeatedly"""
+    global _scheduler
+    if not getattr(settings, 'MAINTENANCE_SCHEDULER_ENABLED', False):
+        return False
+    with _scheduler_guard:
+        if _scheduler is None or not _scheduler.is_alive():
+            _scheduler = threading.Thread(target=run_scheduler, name='maintenance', daemon=True)
+            _scheduler.start()
+    return True
@@ -0,0 +1,146 @@
+import gzip
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from core.middleware import brotli
+from core.renderers import FastJSONRenderer, orjson
+
+WORDS = (
+    'cell energy light membrane protein enzyme reaction carbon oxygen water glucose chlorophyll process '
+    'structure function system theory model data analysis result method sample variable equation force '
+    'mass velocity acceleration field charge current voltage resistance circuit wave frequency history '
+    'economy market policy government trade culture society population growth development example'
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark JSON rendering (DRF\'s renderer vs the orjson renderer) and response size with '
+        'gzip/brotli for payloads shaped like the largest API responses.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--text-chars', type=int, default=200000, help='Length of the document text in the detail payload')
+        parser.add_argument('--rows', type=int, default=100, help='Rows in the document list payload')
+        parser.add_argument('--document', type=int, help='Use this stored document for the detail payload')
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        payloads = self.payloads(rng, options)
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed: the fast renderer falls back to DRF\'s'))
+        if brotli is None:
+            self.stdout.write(self.style.WARNING('brotli is not installed: only gzip is measured'))
+
+        gzip_level = getattr(settings, 'API_COMPRESSION_GZIP_LEVEL', 6)
+        brotli_quality = getattr(settings, 'API_COMPRESSION_BROTLI_QUALITY', 5)
+        self.stdout.write(
+            f"{'payload':<18}{'json bytes':>12}{'drf ms':>9}{'orjson ms':>11}{'speedup':>9}"
+            f"{'gzip bytes':>12}{'gzip ms':>9}{'br bytes':>10}{'br ms':>8}"
+        )
+        for name, data in payloads.items():
+            drf_ms, body = self.time_render(JSONRenderer(), data, options['repeat'])
+            fast_ms, fast_body = self.time_render(FastJSONRenderer(), data, options['repeat'])
+            gzip_ms, gzipped = self.time_call(lambda: gzip.compress(body, compresslevel=gzip_level, mtime=0), options['repeat'])
+            row = (
+                f"{name:<18}{len(body):>12}{drf_ms:>9.3f}{fast_ms:>11.3f}{drf_ms / fast_ms:>8.1f}x"
+                f"{len(gzipped):>12}{gzip_ms:>9.3f}"
+            )
+            if brotli is not None:
+                br_ms, brotlied = self.time_call(lambda: brotli.compress(body, quality=brotli_quality), options['repeat'])
+                row += f"{len(brotlied):>10}{br_ms:>8.3f}"
+            self.stdout.write(row)
+        self.stdout.write(
+            f"\nResponses under API_COMPRESSION_MIN_SIZE ({getattr(settings, 'API_COMPRESSION_MIN_SIZE', 1024)} bytes) "
+            "are sent uncompressed."
+        )
+
+    # --- Timing ---
+
+    def time_call(self, func, repeat):
+        """Median milliseconds of func() and its last result"""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), result
+
+    def time_render(self, renderer, data, repeat):
+        return self.time_call(lambda: renderer.render(data, 'application/json', {}), repeat)
+
+    # --- Payloads ---
+
+    def text(self, rng, length):
+        words = []
+        size = 0
+        while size < length:
+            word = rng.choice(WORDS)
+            words.append(word)
+            size += len(word) + 1
+        return ' '.join(words)[:length]
+
+    def document_row(self, rng, pk):
+        return {
+            'id': pk, 'user': 1, 'title': f"Lecture notes {pk}", 'file': f"/media/documents/notes_{pk}.pdf",
+            'document_type': {'id': 1, 'name': 'PDF', 'description': 'PDF documents', 'icon': 'file-pdf',
+                              'color': '#e74c3c', 'created_at': '2026-01-01T00:00:00Z'},
+            'text_length': rng.randrange(1000, 400000), 'page_count': rng.randrange(1, 120),
+            'extraction_status': 'ready', 'extraction_error': '',
+            'uploaded_at': '2026-10-01T12:00:00.000000Z', 'updated_at': '2026-10-01T12:00:05.000000Z',
+        }
+
+    def payloads(self, rng, options):
+        if options['document']:
+            from core.models import UploadedDocument
+            from core.serializers import UploadedDocumentSerializer
+            try:
+                document = UploadedDocument.objects.with_content().get(pk=options['document'])
+            except UploadedDocument.DoesNotExist:
+                raise CommandError(f"Document {options['document']} does not exist")
+            detail = UploadedDocumentSerializer(document).data
+        else:
+            detail = {**self.document_row(rng, 1), 'document_type_id': None,
+                      'extracted_text': self.text(rng, options['text_chars'])}
+            detail['text_length'] = len(detail['extracted_text'])
+
+        quiz = {'id': 1, 'document': 1, 'title': 'Quiz for Lecture notes 1', 'created_at': '2026-10-01T12:01:00Z', 'questions': {
+            'questions': [
+                {'question': self.text(rng, 120) + '?', 'options': [self.text(rng, 40) for _ in range(4)], 'answer': ''}
+                for _ in range(5)
+            ]
+        }}
+        flashcards = {'id': 1, 'document': 1, 'title': 'Flashcards for Lecture notes 1', 'created_at': '2026-10-01T12:01:00Z',
+                      'flashcards': [{'id': i, 'front': self.text(rng, 60), 'back': self.text(rng, 200)} for i in range(5)]}
+        search = {
+            'results': [
+                {'document_id': str(i), 'title': f"Lecture notes {i}", 'snippet': self.text(rng, 300),
+                 'relevance_score': 10 - i, 'document_url': f"/documents/{i}/"}
+                for i in range(1, 11)
+            ],
+            'total_found': 10, 'search_summary': self.text(rng, 200), 'query': 'photosynthesis light reaction',
+            'mode': 'hybrid', 'timings': {'correction_ms': 0.4, 'recall_ms': 12.5, 'rerank_ms': 1450.2, 'total_ms': 1470.1},
+        }
+        artifact_batch = {'results': {
+            str(pk): {
+                'summary': {'status': 'existing', 'data': {'summary': self.text(rng, 1200)}},
+                'quiz': {'status': 'existing', 'data': quiz},
+                'flashcards': {'status': 'existing', 'data': flashcards},
+            } for pk in range(1, 21)
+        }, 'generated': 0}
+        return {
+            'document detail': detail,
+            'document list': {'next': None, 'previous': None,
+                              'results': [self.document_row(rng, pk) for pk in range(1, options['rows'] + 1)]},
+            'artifact batch': artifact_batch,
+            'search results': search,
+            'quiz': quiz,
+            'flashcards': flashcards,
+        }
@@ -0,0 +1,194 @@
+import contextlib
+import io
+import shutil
+import time
+import tracemalloc
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core import views
+from core.models import UploadedDocument, SearchCache, CorpusVersion
+from core.search_index import rebuild_user_index, user_index_dir
+from core.vocabulary import rebuild_user_vocabulary
+
+LETTERS = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark search and suggestions against a synthetic per-user corpus. '
+        'Seeds documents into the configured database - run it against a development database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=2000, help='Documents in the synthetic corpus')
+        parser.add_argument('--words', type=int, default=1500, help='Words per document')
+        parser.add_argument('--vocabulary', type=int, default=20000, help='Distinct words in the corpus')
+        parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent of the term distribution')
+        parser.add_argument('--queries', type=int, default=200, help='Queries replayed per search mode')
+        parser.add_argument('--typo-rate', type=float, default=0.1, help='Fraction of queries with a misspelled term')
+        parser.add_argument('--modes', nargs='+', default=['local', 'hybrid', 'model'], choices=views.SmartSearchView.search_modes)
+        parser.add_argument('--model-latency-ms', type=float, default=0, help='Simulated latency of each stubbed model call')
+        parser.add_argument('--warm', action='store_true', help='Keep the search cache between queries (default: every query misses)')
+        parser.add_argument('--memory-samples', type=int, default=25, help='Requests per mode traced for peak memory')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark user and corpus afterwards')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        user = self.seed_corpus(rng, options)
+        words = self.words
+        queries = self.query_mix(rng, words, options)
+
+        try:
+            with self.benchmark_environment(options['model_latency_ms']):
+                self.stdout.write(f"\n{'endpoint':<22}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries/req':>13}{'peak KB':>10}")
+                for mode in options['modes']:
+                    view = views.SmartSearchView.as_view()
+                    payloads = [{'query': query, 'mode': mode} for query in queries]
+                    self.report(f'search ({mode})', self.run(view, '/api/documents/search/', user, payloads, options))
+
+                prefixes = [query[:int(rng.integers(2, 7))] for query in queries]
+                view = views.SearchSuggestionsView.as_view()
+                payloads = [{'query': prefix} for prefix in prefixes]
+                self.report('suggestions', self.run(view, '/api/documents/search/suggestions/', user, payloads, options))
+        finally:
+            if not options['keep']:
+                self.cleanup(user)
+
+    # --- Corpus ---
+
+    def seed_corpus(self, rng, options):
+        username = f"bench_{options['seed']}_{options['documents']}"
+        self.words = self.synthetic_words(rng, options['vocabulary'])
+        user, created = User.objects.get_or_create(username=username)
+        if not created and UploadedDocument.objects.filter(user=user).count() == options['documents']:
+            self.stdout.write(f'♻️  Reusing corpus of {username}')
+            return user
+
+        self.cleanup(user, delete_user=False)
+        self.stdout.write(f"🌱 Seeding {options['documents']} documents for {username}...")
+        ranks = np.arange(1, len(self.words) + 1)
+        probabilities = 1.0 / ranks ** options['zipf']
+        probabilities /= probabilities.sum()
+
+        started = time.perf_counter()
+        batch = []
+        for i in range(options['documents']):
+            sampled = rng.choice(len(self.words), size=options['words'], p=probabilities)
+            sentences = [' '.join(self.words[sampled[j:j + 12]]) for j in range(0, len(sampled), 12)]
+            title_terms = ' '.join(self.words[rng.choice(len(self.words) // 10, size=3)])
+            batch.append(UploadedDocument(
+                user=user,
+                title=f"{title_terms.title()} {i}.txt",
+                file=f"documents/benchmark_{i}.txt",
+                extracted_text='. '.join(sentences) + '.',
+            ))
+            if len(batch) == 500:
+                UploadedDocument.objects.bulk_create(batch)
+                batch = []
+        UploadedDocument.objects.bulk_create(batch)
+        CorpusVersion.bump(user.id)
+
+        chunks = rebuild_user_index(user.id)
+        phrases = rebuild_user_vocabulary(user.id)
+        self.stdout.write(f'   {chunks} chunks, {phrases} phrases indexed in {time.perf_counter() - started:.1f}s')
+        return user
+
+    def synthetic_words(self, rng, size):
+        words = set()
+        while len(words) < size:
+            length = int(rng.integers(4, 12))
+            words.add(''.join(LETTERS[rng.integers(0, 26, size=length)]))
+        return np.array(sorted(words, key=lambda word: rng.random()))
+
+    def query_mix(self, rng, words, options):
+        """1-3 word queries drawn from mid-frequency terms, some with a typo"""
+        pool = words[len(words) // 100:len(words) // 5]
+        queries = []
+        for _ in range(options['queries']):
+            terms = list(pool[rng.integers(0, len(pool), size=int(rng.integers(1, 4)))])
+            if rng.random() < options['typo_rate']:
+                term = terms[0]
+                position = int(rng.integers(1, len(term)))
+                terms[0] = term[:position] + LETTERS[rng.integers(0, 26)] + term[position + 1:]
+            queries.append(' '.join(terms))
+        return queries
+
+    def cleanup(self, user, delete_user=True):
+        # Drop the index files first so per-document signal handlers have nothing to rewrite
+        shutil.rmtree(user_index_dir(user.id), ignore_errors=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            UploadedDocument.objects.filter(user=user).delete()
+            if delete_user:
+                user.delete()
+
+    # --- Measurement ---
+
+    @contextlib.contextmanager
+    def benchmark_environment(self, latency_ms):
+        """
+        Disable the Gemini client (optionally adding a fixed latency to every model call)
+        and DRF throttling, which would otherwise reject most of the replayed requests.
+        """
+        def delayed(function):
+            def wrapper(*args, **kwargs):
+                if latency_ms:
+                    time.sleep(latency_ms / 1000)
+                return function(*args, **kwargs)
+            return wrapper
+
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(mock.patch('core.services.client', None))
+            for name in ('smart_search_documents', 'rerank_search_candidates', 'generate_search_suggestions'):
+                stack.enter_context(mock.patch.object(views, name, delayed(getattr(views, name))))
+            for view_class in (views.SmartSearchView, views.SearchSuggestionsView):
+                stack.enter_context(mock.patch.object(view_class, 'throttle_classes', []))
+            stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+            yield
+
+    def run(self, view, path, user, payloads, options):
+        factory = APIRequestFactory()
+
+        def request_for(payload):
+            if not options['warm']:
+                SearchCache.objects.filter(user=user).delete()
+            request = factory.post(path, payload, format='json')
+            force_authenticate(request, user=user)
+            return request
+
+        latencies = []
+        query_counts = []
+        for payload in payloads:
+            request = request_for(payload)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = view(request)
+                latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                self.stderr.write(f"⚠️  {path} returned {response.status_code}: {response.data}")
+            query_counts.append(len(queries))
+
+        peaks = []
+        for payload in payloads[:options['memory_samples']]:
+            request = request_for(payload)
+            tracemalloc.start()
+            view(request)
+            peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+            tracemalloc.stop()
+
+        return latencies, query_counts, peaks
+
+    def report(self, label, measurements):
+        latencies, query_counts, peaks = measurements
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        self.stdout.write(
+            f"{label:<22}{len(latencies):>6}{p50:>10.2f}{p95:>10.2f}{p99:>10.2f}"
+            f"{np.mean(query_counts):>13.1f}{max(peaks) if peaks else 0:>10.0f}"
+        )
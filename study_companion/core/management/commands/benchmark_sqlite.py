@@ -0,0 +1,185 @@
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.sqlite import backoff_delays, is_locked_error
+
+# Django's stock SQLite connection: rollback journal, deferred transactions, Python's 5 s busy timeout
+DEFAULT_PROFILE = {'pragmas': {}, 'begin': 'BEGIN', 'timeout': 5.0, 'attempts': 1}
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark concurrent reads and writes on a scratch SQLite file, with Django\'s stock '
+        'connection settings and with the configured profile (SQLITE_PRAGMAS, BEGIN IMMEDIATE, retries). '
+        'The configured database is not touched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help='Reader threads, each with its own connection')
+        parser.add_argument('--writers', type=int, default=4, help='Writer threads, each with its own connection')
+        parser.add_argument('--seconds', type=float, default=5, help='Duration of each run')
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--documents', type=int, default=20000, help='Documents seeded before each run')
+        parser.add_argument('--profiles', nargs='+', default=['default', 'tuned'], choices=['default', 'tuned'])
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        profiles = {
+            'default': DEFAULT_PROFILE,
+            'tuned': {
+                'pragmas': settings.SQLITE_PRAGMAS,
+                'begin': 'BEGIN IMMEDIATE',
+                'timeout': settings.SQLITE_PRAGMAS.get('busy_timeout', 5000) / 1000,
+                'attempts': getattr(settings, 'SQLITE_WRITE_ATTEMPTS', 5),
+            },
+        }
+        self.stdout.write(
+            f"{options['readers']} readers, {options['writers']} writers, {options['seconds']:.0f}s per profile\n\n"
+            f"{'profile':<10}{'reads/s':>10}{'writes/s':>10}{'read p95':>10}{'write p95':>11}"
+            f"{'read errors':>13}{'write errors':>14}{'retries':>9}"
+        )
+        for name in options['profiles']:
+            directory = tempfile.mkdtemp(prefix='benchmark_sqlite_')
+            try:
+                path = os.path.join(directory, 'benchmark.sqlite3')
+                self.seed(path, options)
+                self.report(name, self.run(path, profiles[name], options))
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    # --- Database ---
+
+    def connect(self, path, profile):
+        conn = sqlite3.connect(path, timeout=profile['timeout'], isolation_level=None, check_same_thread=False)
+        for pragma, value in profile['pragmas'].items():
+            conn.execute(f"PRAGMA {pragma}={value}")
+        return conn
+
+    def seed(self, path, options):
+        """Tables shaped like the hot ones: document rows and the per-user search cache"""
+        rng = random.Random(options['seed'])
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.executescript('''
+            CREATE TABLE document (id INTEGER PRIMARY KEY, user_id INTEGER, title TEXT, text_preview TEXT,
+                                   text_length INTEGER, uploaded_at REAL);
+            CREATE INDEX document_user_uploaded ON document (user_id, uploaded_at);
+            CREATE TABLE search_cache (id INTEGER PRIMARY KEY, user_id INTEGER, query_hash TEXT, results TEXT,
+                                       last_used_at REAL, UNIQUE (user_id, query_hash));
+        ''')
+        conn.execute('BEGIN')
+        conn.executemany(
+            'INSERT INTO document (user_id, title, text_preview, text_length, uploaded_at) VALUES (?, ?, ?, ?, ?)',
+            ((rng.randrange(options['users']), f"Document {i}", 'x' * 300, rng.randrange(100000), time.time() - i)
+             for i in range(options['documents']))
+        )
+        conn.execute('COMMIT')
+        conn.close()
+
+    # --- Workload ---
+
+    def run(self, path, profile, options):
+        stop = threading.Event()
+        results = {'reads': [], 'writes': [], 'read_errors': 0, 'write_errors': 0, 'retries': 0}
+        guard = threading.Lock()
+
+        def reader(seed):
+            rng = random.Random(seed)
+            conn = self.connect(path, profile)
+            latencies, errors = [], 0
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    # The document list query
+                    conn.execute(
+                        'SELECT id, title, text_length FROM document WHERE user_id = ? ORDER BY uploaded_at DESC LIMIT 50',
+                        (rng.randrange(options['users']),)
+                    ).fetchall()
+                    latencies.append((time.perf_counter() - started) * 1000)
+                except sqlite3.OperationalError as e:
+                    if not is_locked_error(e):
+                        raise
+                    errors += 1
+            conn.close()
+            with guard:
+                results['reads'].extend(latencies)
+                results['read_errors'] += errors
+
+        def writer(seed):
+            rng = random.Random(seed)
+            conn = self.connect(path, profile)
+            latencies, errors, retries = [], 0, 0
+            while not stop.is_set():
+                started = time.perf_counter()
+                delays = backoff_delays(profile['attempts'])
+                while True:
+                    try:
+                        self.write(conn, profile, rng, options)
+                        latencies.append((time.perf_counter() - started) * 1000)
+                        break
+                    except sqlite3.OperationalError as e:
+                        if not is_locked_error(e):
+                            raise
+                        if conn.in_transaction:
+                            conn.execute('ROLLBACK')
+                        delay = next(delays, None)
+                        if delay is None:
+                            errors += 1
+                            break
+                        retries += 1
+                        time.sleep(delay)
+            conn.close()
+            with guard:
+                results['writes'].extend(latencies)
+                results['write_errors'] += errors
+                results['retries'] += retries
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(options['readers'])]
+        threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        results['seconds'] = options['seconds']
+        return results
+
+    def write(self, conn, profile, rng, options):
+        """A search cache store plus an upload; like update_or_create, the transaction reads before it writes"""
+        user_id = rng.randrange(options['users'])
+        query_hash = f"{rng.randrange(200):064x}"
+        conn.execute(profile['begin'])
+        existing = conn.execute(
+            'SELECT id FROM search_cache WHERE user_id = ? AND query_hash = ?', (user_id, query_hash)
+        ).fetchone()
+        if existing:
+            conn.execute('UPDATE search_cache SET results = ?, last_used_at = ? WHERE id = ?', ('[]', time.time(), existing[0]))
+        else:
+            conn.execute(
+                'INSERT INTO search_cache (user_id, query_hash, results, last_used_at) VALUES (?, ?, ?, ?)',
+                (user_id, query_hash, '[]', time.time())
+            )
+        conn.execute(
+            'INSERT INTO document (user_id, title, text_preview, text_length, uploaded_at) VALUES (?, ?, ?, ?, ?)',
+            (user_id, 'Upload', 'x' * 300, rng.randrange(100000), time.time())
+        )
+        conn.execute('COMMIT')
+
+    def report(self, name, results):
+        def p95(values):
+            return np.percentile(values, 95) if values else float('nan')
+
+        self.stdout.write(
+            f"{name:<10}{len(results['reads']) / results['seconds']:>10.0f}{len(results['writes']) / results['seconds']:>10.0f}"
+            f"{p95(results['reads']):>10.2f}{p95(results['writes']):>11.2f}"
+            f"{results['read_errors']:>13}{results['write_errors']:>14}{results['retries']:>9}"
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from core.tiered_cache import summary_cache
+from core.locks import lock_stats, reset_lock_stats
+
+class Command(BaseCommand):
+    help = 'Report hit rates of the tiered summary cache and lock contention across all workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after reporting')
+
+    def handle(self, *args, **options):
+        stats = summary_cache.stats()
+        self.stdout.write(f"📊 Summary cache: {stats['lookups']} lookups")
+        self.stdout.write(f"   local tier hits:  {stats['local_hit']:>8}  ({stats['local_hit_rate']:.1%})")
+        self.stdout.write(f"   shared tier hits: {stats['shared_hit']:>8}  ({stats['shared_hit_rate']:.1%})")
+        self.stdout.write(f"   stale hits:       {stats['stale_hit']:>8}  ({stats['stale_hit_rate']:.1%})")
+        self.stdout.write(f"   misses:           {stats['miss']:>8}")
+        self.stdout.write(f"   early refreshes:  {stats['early_refresh']:>8}")
+        self.stdout.write(f"   stale refreshes:  {stats['stale_refresh']:>8}")
+        self.stdout.write(f"   waited on lock:   {stats['waited']:>8}")
+
+        locks = lock_stats()
+        self.stdout.write(f"🔒 Lease locks: {len(locks)} kinds")
+        for kind, counts in sorted(locks.items()):
+            self.stdout.write(
+                f"   {kind:<18} acquired {counts['acquired']:>6}  contended {counts['contended']:>6}  "
+                f"lost {counts['lost']:>4}  wait avg {counts['wait_ms_avg']:.0f} ms, max {counts['wait_ms_max']:.0f} ms"
+            )
+
+        if options['reset']:
+            summary_cache.reset_stats()
+            reset_lock_stats()
+            self.stdout.write(self.style.SUCCESS('🧹 Counters reset'))
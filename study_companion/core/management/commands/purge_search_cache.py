@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from core.models import SearchCache
+
+class Command(BaseCommand):
+    help = 'Delete expired, outdated and over-quota search cache rows (run periodically, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-hours', type=int, help='Override SEARCH_CACHE_MAX_AGE_HOURS')
+        parser.add_argument('--batch-size', type=int, help='Override MAINTENANCE_BATCH_SIZE')
+
+    def handle(self, *args, **options):
+        deleted = SearchCache.objects.sweep(max_age_hours=options['max_age_hours'], batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'🧹 Removed {deleted} search cache rows')
+        )
@@ -0,0 +1,26 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from core.search_index import rebuild_user_index
+from core.vocabulary import rebuild_user_vocabulary
+
+class Command(BaseCommand):
+    help = 'Rebuild the local semantic search index and autocomplete vocabulary for one or all users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only rebuild the index of this user ID')
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['user']:
+            users = users.filter(id=options['user'])
+
+        total_chunks = 0
+        for user in users.iterator():
+            chunks = rebuild_user_index(user.id)
+            phrases = rebuild_user_vocabulary(user.id)
+            total_chunks += chunks
+            self.stdout.write(f'🔎 Indexed {chunks} chunks and {phrases} phrases for {user.username}')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'\n🎉 Search index rebuilt: {total_chunks} chunks in total')
+        )
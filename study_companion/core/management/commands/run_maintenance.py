@@ -0,0 +1,45 @@
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.maintenance import TASKS, run_task, run_scheduler
+
+
+class Command(BaseCommand):
+    help = (
+        'Run maintenance tasks: purge search and Q&A cache rows and expired signups, delete media '
+        'files no document refers to and retry queued cleanups of deleted documents. Runs every '
+        'task once by default (e.g. from cron); '
+        'with --schedule keeps running MAINTENANCE_SCHEDULE in the foreground.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('tasks', nargs='*', help=f"Tasks to run: {', '.join(TASKS)} (default: all)")
+        parser.add_argument('--batch-size', type=int, help='Override MAINTENANCE_BATCH_SIZE')
+        parser.add_argument('--dry-run', action='store_true', help='Only count orphaned media files, do not delete them')
+        parser.add_argument('--schedule', action='store_true', help='Run MAINTENANCE_SCHEDULE until interrupted')
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            self.stdout.write('⏰ Running the maintenance schedule, Ctrl+C to stop')
+            stop = threading.Event()
+            try:
+                run_scheduler(stop=stop)
+            except KeyboardInterrupt:
+                stop.set()
+            return
+
+        unknown = [name for name in options['tasks'] if name not in TASKS]
+        if unknown:
+            raise CommandError(f"Unknown tasks: {', '.join(unknown)}. Available: {', '.join(TASKS)}")
+
+        for name in options['tasks'] or TASKS:
+            task_options = {'batch_size': options['batch_size']}
+            if name == 'media':
+                task_options['dry_run'] = options['dry_run']
+            result = run_task(name, **task_options)
+            if result is None:
+                self.stdout.write(self.style.WARNING(f'⏳ {name}: already running elsewhere, skipped'))
+                continue
+            counts = ', '.join(f'{key}={value}' for key, value in result.items())
+            self.stdout.write(self.style.SUCCESS(f'🧹 {name}: {counts}'))
@@ -1,59 +1,198 @@
+import gzip
 import logging
+import math
 import time
+from collections import namedtuple
+from django.conf import settings
 from django.core.cache import cache
 from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
 from django.utils.deprecation import MiddlewareMixin
+from rest_framework.authtoken.models import Token
+
+try:
+    import brotli
+except ImportError:  # Optional: responses are gzip-compressed only
+    brotli = None
 
 logger = logging.getLogger(__name__)
 
+RateLimitStatus = namedtuple('RateLimitStatus', ['allowed', 'limit', 'remaining', 'reset_after', 'retry_after'])
+
+class SlidingWindowRateLimiter:
+    """
+    Sliding-window counter: the count of the current fixed window plus the previous
+    window's count weighted by how much of it still overlaps the sliding window.
+    Built only on atomic cache add/incr, so concurrent workers never lose a hit.
+    """
+
+    def __init__(self, limit, window, prefix='ratelimit'):
+        self.limit = limit
+        self.window = window
+        self.prefix = prefix
+
+    def hit(self, identity, now=None):
+        now = time.time() if now is None else now
+        index = int(now // self.window)
+        elapsed = now - index * self.window
+        current_key = f"{self.prefix}_{identity}_{index}"
+
+        # Counters live for two windows so the next window can still weigh this one
+        cache.add(current_key, 0, timeout=self.window * 2)
+        current = cache.incr(current_key)
+        previous = cache.get(f"{self.prefix}_{identity}_{index - 1}", 0)
+        overlap = (self.window - elapsed) / self.window
+        estimated = previous * overlap + current
+        reset_after = math.ceil(self.window - elapsed)
+
+        if estimated > self.limit:
+            # Rejected requests do not consume quota
+            cache.decr(current_key)
+            return RateLimitStatus(False, self.limit, 0, reset_after, self._retry_after(previous, current - 1, elapsed))
+        return RateLimitStatus(True, self.limit, int(self.limit - estimated), reset_after, None)
+
+    def remaining(self, identity, now=None):
+        """Requests left in the sliding window, without counting one"""
+        now = time.time() if now is None else now
+        index = int(now // self.window)
+        elapsed = now - index * self.window
+        current = cache.get(f"{self.prefix}_{identity}_{index}", 0)
+        previous = cache.get(f"{self.prefix}_{identity}_{index - 1}", 0)
+        return max(0, int(self.limit - (previous * (self.window - elapsed) / self.window + current)))
+
+    def _retry_after(self, previous, current, elapsed):
+        """Seconds until the previous window has decayed enough to admit one more request"""
+        if previous and current < self.limit:
+            wait = (self.window - elapsed) - (self.limit - 1 - current) * self.window / previous
+            return max(1, math.ceil(wait))
+        return max(1, math.ceil(self.window - elapsed))
+
+def api_rate_limiter():
+    """The per-user limiter of AI endpoints, as configured in settings"""
+    return SlidingWindowRateLimiter(
+        limit=getattr(settings, 'API_RATE_LIMIT', 50),
+        window=getattr(settings, 'API_RATE_LIMIT_WINDOW', 3600),
+        prefix='api_usage',
+    )
+
 class APIUsageMonitoringMiddleware(MiddlewareMixin):
     """
-    Middleware to monitor API usage and prevent abuse
+    Middleware to monitor API usage and prevent abuse.
+    AI endpoints are matched on their URL name and limited per user with a sliding window.
     """
     
     def __init__(self, get_response):
         super().__init__(get_response)
-        self.ai_endpoints = [
-            '/api/documents/',
-            '/summarize/',
-            '/generate-quiz/',
-            '/generate-flashcards/',
-            '/qna/',
-            '/search/',
-            '/search/suggestions/'
-        ]
+        self.limited_routes = frozenset(getattr(settings, 'API_RATE_LIMITED_ROUTES', []))
+        self.limiter = api_rate_limiter()
     
-    def process_request(self, request):
-        # Track API usage for authenticated users
-        # Check if user attribute exists (should be added by AuthenticationMiddleware)
-        if hasattr(request, 'user') and request.user.is_authenticated:
-            # Rate limiting for AI endpoints
-            is_ai_endpoint = any(endpoint in request.path for endpoint in self.ai_endpoints)
-            
-            if is_ai_endpoint:
-                # Check rate limit per user per hour
-                rate_limit_key = f"api_usage_{request.user.id}_{time.strftime('%Y%m%d%H')}"
-                current_usage = cache.get(rate_limit_key, 0)
-                
-                # Limit to 50 AI API calls per hour per user
-                if current_usage >= 50:
-                    logger.warning(f"Rate limit exceeded for user {request.user.id} on {request.path}")
-                    return JsonResponse({
-                        "error": "API rate limit exceeded. Please wait before making more requests.",
-                        "limit": "50 requests per hour for AI features"
-                    }, status=429)
-                
-                # Increment usage counter
-                cache.set(rate_limit_key, current_usage + 1, timeout=3600)
+    def _is_ai_endpoint(self, request):
+        match = getattr(request, 'resolver_match', None)
+        return match is not None and match.url_name in self.limited_routes
+    
+    def _user_id(self, request):
+        """Session user, or the owner of the DRF token (DRF itself only authenticates inside the view)"""
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user.id
+        keyword, _, key = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        if keyword == 'Token' and key.strip():
+            return Token.objects.filter(key=key.strip()).values_list('user_id', flat=True).first()
+        return None
+    
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Runs after URL resolution, so endpoints are matched by name instead of path substrings
+        if not self._is_ai_endpoint(request):
+            return None
+        user_id = self._user_id(request)
+        if user_id is None:
+            return None  # Anonymous requests are rejected by the view's own authentication
+        
+        request.api_user_id = user_id
+        request.rate_limit = self.limiter.hit(user_id)
+        if not request.rate_limit.allowed:
+            logger.warning(f"Rate limit exceeded for user {user_id} on {request.path}")
+            return JsonResponse({
+                "error": "API rate limit exceeded. Please wait before making more requests.",
+                "limit": f"{self.limiter.limit} requests per {self.limiter.window // 60} minutes for AI features",
+                "retry_after": request.rate_limit.retry_after,
+            }, status=429)
+        return None
     
     def process_response(self, request, response):
+        rate_limit = getattr(request, 'rate_limit', None)
+        if rate_limit is None:
+            return response
+        
+        # Let clients back off before they hit a 429
+        response['X-RateLimit-Limit'] = str(rate_limit.limit)
+        response['X-RateLimit-Remaining'] = str(rate_limit.remaining)
+        response['X-RateLimit-Reset'] = str(rate_limit.reset_after)
+        if rate_limit.retry_after is not None:
+            response['Retry-After'] = str(rate_limit.retry_after)
+        
         # Log API usage for monitoring
-        if hasattr(request, 'user') and request.user.is_authenticated:
-            is_ai_endpoint = any(endpoint in request.path for endpoint in self.ai_endpoints)
-            
-            if is_ai_endpoint:
-                logger.info(f"AI API usage - User: {request.user.id}, Endpoint: {request.path}, Status: {response.status_code}")
+        logger.info(f"AI API usage - User: {request.api_user_id}, Endpoint: {request.path}, Status: {response.status_code}")
+        return response
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Negotiated compression of API responses: brotli when the client accepts it and the
+    brotli package is installed, otherwise gzip. Bodies under API_COMPRESSION_MIN_SIZE,
+    streaming responses (their lines must reach the client as they are written) and
+    non-text content are sent as they are.
+    """
+    content_types = frozenset(['application/json', 'text/html', 'text/plain'])
+    
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_size = getattr(settings, 'API_COMPRESSION_MIN_SIZE', 1024)
+        self.gzip_level = getattr(settings, 'API_COMPRESSION_GZIP_LEVEL', 6)
+        self.brotli_quality = getattr(settings, 'API_COMPRESSION_BROTLI_QUALITY', 5)
+    
+    @staticmethod
+    def accepted_encodings(header):
+        """Codings the client accepts, from an Accept-Encoding header (q=0 means refused)"""
+        accepted = set()
+        for item in header.split(','):
+            coding, _, params = item.strip().partition(';')
+            quality = params.strip()
+            if quality.startswith('q='):
+                try:
+                    if float(quality[2:]) <= 0:
+                        continue
+                except ValueError:
+                    continue
+            if coding:
+                accepted.add(coding.strip().lower())
+        return accepted
+    
+    def process_response(self, request, response):
+        if (not request.path.startswith('/api/') or response.streaming or response.has_header('Content-Encoding')
+                or response.status_code == 304 or len(response.content) < self.min_size):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in self.content_types:
+            return response
+        
+        patch_vary_headers(response, ['Accept-Encoding'])
+        accepted = self.accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            encoding, compressed = 'br', brotli.compress(response.content, quality=self.brotli_quality)
+        elif 'gzip' in accepted or '*' in accepted:
+            encoding, compressed = 'gzip', gzip.compress(response.content, compresslevel=self.gzip_level, mtime=0)
+        else:
+            return response
+        if len(compressed) >= len(response.content):
+            return response
         
+        response.content = compressed
+        response['Content-Encoding'] = encoding
+        response['Content-Length'] = str(len(compressed))
+        # The compressed body is a different representation: the strong ETag becomes weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
         return response
 
 class ComponentStabilityMiddleware(MiddlewareMixin):
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_corpusversion_searchcache_versioning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documenttype',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='uploadeddocument',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
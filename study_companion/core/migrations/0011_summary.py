@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_documenttype_updated_at_uploadeddocument_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Summary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('prompt_version', models.PositiveSmallIntegerField()),
+                ('model', models.CharField(max_length=100)),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('content_hash', 'prompt_version', 'model')},
+            },
+        ),
+    ]
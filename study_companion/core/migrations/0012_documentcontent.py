@@ -0,0 +1,97 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:28
+
+import django.db.models.deletion
+import hashlib
+import zlib
+
+from django.db import migrations, models
+
+BATCH_SIZE = 200
+TEXT_PREVIEW_LENGTH = 300
+
+
+# Frozen copies of core.text_codecs, so this migration keeps working whatever happens to that module.
+# New rows use zlib (always available); every row records its codec, so the app reads them either way.
+def compress_text(text):
+    return 'zlib', zlib.compress(text.encode('utf-8'), 6)
+
+
+def decompress_text(codec, data):
+    data = bytes(data)
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    return zlib.decompress(data).decode('utf-8')
+
+
+def hash_text(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def move_text_to_content(apps, schema_editor):
+    """Compress every document's text into DocumentContent, storing identical text once"""
+    UploadedDocument = apps.get_model('core', 'UploadedDocument')
+    DocumentContent = apps.get_model('core', 'DocumentContent')
+    documents = UploadedDocument.objects.exclude(extracted_text__isnull=True).exclude(extracted_text='')
+    last_id = 0
+    while True:
+        # Keyset batches: only BATCH_SIZE texts are held in memory at a time
+        batch = list(documents.filter(id__gt=last_id).order_by('id').values_list('id', 'extracted_text')[:BATCH_SIZE])
+        if not batch:
+            break
+        for document_id, text in batch:
+            content_hash = hash_text(text)
+            content_id = DocumentContent.objects.filter(content_hash=content_hash).values_list('id', flat=True).first()
+            if content_id is None:
+                codec, data = compress_text(text)
+                content_id = DocumentContent.objects.create(
+                    content_hash=content_hash, codec=codec, data=data, length=len(text), compressed_size=len(data)
+                ).id
+            UploadedDocument.objects.filter(id=document_id).update(
+                content_id=content_id, text_preview=text[:TEXT_PREVIEW_LENGTH]
+            )
+        last_id = batch[-1][0]
+
+
+def move_content_to_text(apps, schema_editor):
+    UploadedDocument = apps.get_model('core', 'UploadedDocument')
+    for document in UploadedDocument.objects.filter(content__isnull=False).select_related('content').iterator(chunk_size=BATCH_SIZE):
+        document.extracted_text = decompress_text(document.content.codec, document.content.data)
+        document.save(update_fields=['extracted_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentContent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('codec', models.CharField(max_length=10)),
+                ('data', models.BinaryField()),
+                ('length', models.PositiveIntegerField()),
+                ('compressed_size', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='uploadeddocument',
+            name='text_preview',
+            field=models.CharField(blank=True, default='', max_length=300),
+        ),
+        migrations.AddField(
+            model_name='uploadeddocument',
+            name='content',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='documents', to='core.documentcontent'),
+        ),
+        migrations.RunPython(move_text_to_content, move_content_to_text),
+        migrations.RemoveField(
+            model_name='uploadeddocument',
+            name='extracted_text',
+        ),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:31
+
+from django.conf import settings
+import hashlib
+import zlib
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+EXTRACTION_FAILED_PREFIX = "Text extraction failed:"
+
+
+# Frozen copies of core.text_codecs, so this migration keeps working whatever happens to that module.
+# New rows use zlib (always available); every row records its codec, so the app reads them either way.
+def compress_text(text):
+    return 'zlib', zlib.compress(text.encode('utf-8'), 6)
+
+
+def decompress_text(codec, data):
+    data = bytes(data)
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    return zlib.decompress(data).decode('utf-8')
+
+
+def hash_text(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def backfill_extraction_fields(apps, schema_editor):
+    """Derive status and length from the stored text; failure messages move out of the text into extraction_error"""
+    UploadedDocument = apps.get_model('core', 'UploadedDocument')
+    DocumentContent = apps.get_model('core', 'DocumentContent')
+    failed = UploadedDocument.objects.filter(content__isnull=False, text_preview__startswith=EXTRACTION_FAILED_PREFIX)
+
+    UploadedDocument.objects.filter(content__isnull=True).update(extraction_status='empty')
+    UploadedDocument.objects.filter(content__isnull=False).exclude(pk__in=failed.values('pk')).update(
+        extraction_status='ready',
+        text_length=Subquery(DocumentContent.objects.filter(pk=OuterRef('content_id')).values('length')[:1]),
+    )
+    for document in failed.select_related('content').iterator(chunk_size=200):
+        message = decompress_text(document.content.codec, document.content.data)
+        UploadedDocument.objects.filter(pk=document.pk).update(
+            extraction_status='failed',
+            extraction_error=message[len(EXTRACTION_FAILED_PREFIX):].strip(),
+            content=None,
+            text_preview='',
+        )
+    DocumentContent.objects.filter(documents__isnull=True).delete()
+
+
+def restore_failure_messages(apps, schema_editor):
+    UploadedDocument = apps.get_model('core', 'UploadedDocument')
+    DocumentContent = apps.get_model('core', 'DocumentContent')
+    for document in UploadedDocument.objects.filter(extraction_status='failed').iterator(chunk_size=200):
+        message = f"{EXTRACTION_FAILED_PREFIX} {document.extraction_error}"
+        content_hash = hash_text(message)
+        content = DocumentContent.objects.filter(content_hash=content_hash).first()
+        if content is None:
+            codec, data = compress_text(message)
+            content = DocumentContent.objects.create(
+                content_hash=content_hash, codec=codec, data=data, length=len(message), compressed_size=len(data)
+            )
+        UploadedDocument.objects.filter(pk=document.pk).update(content=content, text_preview=message[:300])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_documentcontent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadeddocument',
+            name='extraction_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='uploadeddocument',
+            name='extraction_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('empty', 'Empty'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='uploadeddocument',
+            name='page_count',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='uploadeddocument',
+            name='text_length',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_extraction_fields, restore_failure_messages),
+        migrations.AddIndex(
+            model_name='uploadeddocument',
+            index=models.Index(fields=['user', 'uploaded_at'], name='core_doc_user_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadeddocument',
+            index=models.Index(fields=['user', 'document_type'], name='core_doc_user_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadeddocument',
+            index=models.Index(fields=['user', 'extraction_status'], name='core_doc_user_status_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:34
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_existing_sets_complete(apps, schema_editor):
+    # Sets written before the marker existed cannot be checked card by card; trust every set that has cards
+    FlashcardSet = apps.get_model('core', 'FlashcardSet')
+    Flashcard = apps.get_model('core', 'Flashcard')
+    FlashcardSet.objects.filter(pk__in=Flashcard.objects.values('flashcard_set_id')).update(completed_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_extraction_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flashcardset',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_existing_sets_complete, migrations.RunPython.noop),
+    ]
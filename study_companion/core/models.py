@@ -1,10 +1,16 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.contrib.auth.models import User
+from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
-from django.db.models.signals import pre_delete
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import pre_delete, post_save, post_delete
 from django.dispatch import receiver
-import os
+import hashlib
+
+from .sqlite import retry_on_locked, delete_in_batches, delete_overflow
+from .text_codecs import compress_text, decompress_text
 
 class DocumentType(models.Model):
     """Model for categorizing documents by type"""
@@ -13,6 +19,7 @@ class DocumentType(models.Model):
     icon = models.CharField(max_length=50, default='📄')  # Emoji or icon class
     color = models.CharField(max_length=7, default='#3B82F6')  # Hex color code
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Part of the ETag of documents showing this type
     
     class Meta:
         ordering = ['name']
@@ -20,13 +27,182 @@ class DocumentType(models.Model):
     def __str__(self):
         return self.name
 
+EXTRACTION_FAILED_PREFIX = "Text extraction failed:"
+TEXT_PREVIEW_LENGTH = 300
+
+class DocumentContentManager(models.Manager):
+    def store(self, text):
+        """The row holding text, created only if no document has stored the same text yet"""
+        content_hash = DocumentContent.hash_text(text)
+        content = self.filter(content_hash=content_hash).only('id').first()
+        if content is not None:
+            return content
+        codec, data = compress_text(text)
+        try:
+            with transaction.atomic():
+                return self.create(content_hash=content_hash, codec=codec, data=data,
+                                   length=len(text), compressed_size=len(data))
+        except IntegrityError:
+            # Stored concurrently by another upload of the same text
+            return self.only('id').get(content_hash=content_hash)
+
+    def delete_orphans(self, ids=None):
+        """Delete content no document refers to any more (only among ids, if given)"""
+        orphans = self.filter(documents__isnull=True)
+        if ids is not None:
+            orphans = orphans.filter(pk__in=[pk for pk in ids if pk])
+        deleted, _ = orphans.delete()
+        return deleted
+
+# Extracted document text, compressed and deduplicated
+class DocumentContent(models.Model):
+    """
+    Kept out of the UploadedDocument row so that loading a document never reads
+    its text; identical text uploaded twice is stored once. content_hash is the
+    same SHA-256 as Summary.content_hash, so summaries can be found without
+    decompressing the text.
+    """
+    content_hash = models.CharField(max_length=64, unique=True)
+    codec = models.CharField(max_length=10)
+    data = models.BinaryField()
+    length = models.PositiveIntegerField()  # Characters of the decompressed text
+    compressed_size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = DocumentContentManager()
+
+    @staticmethod
+    def hash_text(text):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    @property
+    def text(self):
+        return decompress_text(self.codec, self.data)
+
+    def __str__(self):
+        return f"Content {self.content_hash[:12]} ({self.length} chars, {self.codec})"
+
+class UploadedDocumentQuerySet(models.QuerySet):
+    def with_text(self):
+        """Documents whose text was extracted successfully (uses the (user, extraction_status) index)"""
+        return self.filter(extraction_status=UploadedDocument.ExtractionStatus.READY)
+
+    def with_content(self):
+        """Load the compressed text in the same query, for loops that read extracted_text"""
+        return self.select_related('content')
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create() bypasses save(), so store text assigned to the new instances first
+        objs = list(objs)
+        for obj in objs:
+            obj._store_pending_text()
+        return super().bulk_create(objs, *args, **kwargs)
+
 class UploadedDocument(models.Model):
+    class ExtractionStatus(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        READY = 'ready', 'Ready'
+        EMPTY = 'empty', 'Empty'
+        FAILED = 'failed', 'Failed'
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     file = models.FileField(upload_to='documents/')
     document_type = models.ForeignKey(DocumentType, on_delete=models.SET_NULL, null=True, blank=True, related_name='documents')
-    extracted_text = models.TextField(blank=True, null=True)
+    # The text lives in DocumentContent; use the extracted_text property to read or assign it
+    content = models.ForeignKey(DocumentContent, on_delete=models.PROTECT, null=True, blank=True, related_name='documents')
+    text_preview = models.CharField(max_length=TEXT_PREVIEW_LENGTH, blank=True, default='')
+    text_length = models.PositiveIntegerField(default=0)
+    page_count = models.PositiveIntegerField(null=True, blank=True)  # None for formats without pages
+    extraction_status = models.CharField(max_length=10, choices=ExtractionStatus.choices, default=ExtractionStatus.PENDING)
+    extraction_error = models.TextField(blank=True, default='')
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Row version stamp used for ETags
+
+    objects = UploadedDocumentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'uploaded_at'], name='core_doc_user_uploaded_idx'),
+            models.Index(fields=['user', 'document_type'], name='core_doc_user_type_idx'),
+            models.Index(fields=['user', 'extraction_status'], name='core_doc_user_status_idx'),
+        ]
+
+    # Saved together whenever the text or the extraction outcome changes
+    EXTRACTION_FIELDS = ('content', 'text_preview', 'text_length', 'page_count', 'extraction_status', 'extraction_error')
+
+    _pending_text = _NO_PENDING_TEXT = object()
+
+    @property
+    def extracted_text(self):
+        """The document's text ('' if there is none), decompressed on first access and kept on the instance"""
+        if self._pending_text is not self._NO_PENDING_TEXT:
+            return self._pending_text or ''
+        if self.content_id is None:
+            return ''
+        cached = self.__dict__.get('_text_cache')
+        if cached is None or cached[0] != self.content_id:
+            cached = self._text_cache = (self.content_id, self.content.text)
+        return cached[1]
+
+    @extracted_text.setter
+    def extracted_text(self, text):
+        # Stored on save(); until then reads return the assigned text
+        self._pending_text = text or None
+        self.text_preview = (text or '')[:TEXT_PREVIEW_LENGTH]
+        self.text_length = len(text or '')
+        self.extraction_status = self.ExtractionStatus.READY if text else self.ExtractionStatus.EMPTY
+        self.extraction_error = ''
+
+    def mark_extraction_failed(self, error):
+        """Record a failed extraction (on save()); any previously extracted text is dropped"""
+        self.extracted_text = None
+        self.page_count = None
+        self.extraction_status = self.ExtractionStatus.FAILED
+        self.extraction_error = str(error)
+
+    @property
+    def has_text(self):
+        """Whether text was extracted successfully, without loading it"""
+        return self.extraction_status == self.ExtractionStatus.READY
+
+    @property
+    def extraction_failed(self):
+        return self.extraction_status == self.ExtractionStatus.FAILED
+
+    @property
+    def extraction_message(self):
+        """The error shown to users, e.g. 'Text extraction failed: ...'"""
+        return f"{EXTRACTION_FAILED_PREFIX} {self.extraction_error}" if self.extraction_failed else ''
+
+    def _store_pending_text(self):
+        """Point the row at the content of newly assigned text; returns the previous content id"""
+        previous_id = self.content_id
+        text = self._pending_text
+        if text is self._NO_PENDING_TEXT:
+            return previous_id
+        self.content = DocumentContent.objects.store(text) if text else None
+        del self._pending_text
+        if text:
+            self._text_cache = (self.content_id, text)
+        return previous_id
+
+    def save(self, *args, **kwargs):
+        if self._pending_text is self._NO_PENDING_TEXT:
+            return super().save(*args, **kwargs)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], *self.EXTRACTION_FIELDS}
+        pending_text, previous_id = self._pending_text, self.content_id
+        try:
+            with transaction.atomic():
+                self._store_pending_text()
+                super().save(*args, **kwargs)
+                if previous_id != self.content_id:
+                    DocumentContent.objects.delete_orphans([previous_id])
+        except Exception:
+            # Roll the instance back with the transaction, so a failed save() can simply be retried
+            self._pending_text, self.content_id = pending_text, previous_id
+            raise
 
     def __str__(self):
         return self.title
@@ -37,69 +213,43 @@ class UploadedDocument(models.Model):
             return self.file.name.split('.')[-1].lower()
         return None
     
-    def auto_assign_document_type(self):
+    def auto_assign_document_type(self, save=True):
         """Automatically assign document type based on file extension"""
-        print(f"🔍 auto_assign_document_type() called for document: {self.title}")
+        from .document_types import registry
         
-        if not self.document_type:
+        if not self.document_type_id:
             extension = self.get_file_extension()
-            print(f"📁 File extension detected: {extension}")
-            
             if extension:
-                # Map file extensions to document types
-                extension_to_type = {
-                    'pdf': 'PDF Document',
-                    'doc': 'Word Document',
-                    'docx': 'Word Document',
-                    'txt': 'Text Document',
-                    'ppt': 'PowerPoint Presentation',
-                    'pptx': 'PowerPoint Presentation',
-                    'xls': 'Excel Spreadsheet',
-                    'xlsx': 'Excel Spreadsheet',
-                }
-                
-                type_name = extension_to_type.get(extension, 'Other Document')
-                print(f"🎯 Mapping extension '{extension}' to type: '{type_name}'")
-                
-                try:
-                    doc_type = DocumentType.objects.get(name=type_name)
-                    print(f"✅ Found existing document type: {doc_type.name}")
-                    self.document_type = doc_type
-                    self.save(update_fields=['document_type'])
-                    print(f"💾 Saved document type assignment")
-                except DocumentType.DoesNotExist:
-                    print(f"⚠️ Document type '{type_name}' not found, creating new one...")
-                    # Create the document type if it doesn't exist
-                    doc_type = DocumentType.objects.create(
-                        name=type_name,
-                        description=f"Auto-generated type for {extension.upper()} files"
-                    )
-                    print(f"✅ Created new document type: {doc_type.name}")
-                    self.document_type = doc_type
-                    self.save(update_fields=['document_type'])
-                    print(f"💾 Saved document type assignment")
+                # Resolved from the in-process registry: no query unless the type has to be created
+                self.document_type = registry.for_extension(extension)
+                print(f"🎯 Mapping extension '{extension}' to type: '{self.document_type.name}'")
+                if save:
+                    self.save(update_fields=['document_type', 'updated_at'])
             else:
                 print("⚠️ No file extension detected")
-        else:
-            print(f"ℹ️ Document already has type: {self.document_type.name}")
 
-# Signal to delete the file when the model instance is deleted
-@receiver(pre_delete, sender=UploadedDocument)
-def delete_uploaded_document_file(sender, instance, **kwargs):
+# Files and index entries of deleted documents are removed after the delete commits
+class PendingDeletion(models.Model):
     """
-    Delete the physical file from media folder when UploadedDocument is deleted.
-    This prevents orphaned files from accumulating in the media directory.
+    Queued by the transaction that deletes the document, so a rollback never loses
+    its file and a commit never leaves it behind; core.deletions works the queue.
+    Not a foreign key: the document (and maybe its user) no longer exists.
     """
-    if instance.file:
-        # Check if the file exists before trying to delete it
-        if os.path.isfile(instance.file.path):
-            try:
-                os.remove(instance.file.path)
-                print(f"✅ Successfully deleted file: {instance.file.path}")
-            except OSError as e:
-                print(f"⚠️  Warning: Could not delete file {instance.file.path}: {e}")
-        else:
-            print(f"ℹ️  File not found (may have been already deleted): {instance.file.path}")
+    user_id = models.BigIntegerField()
+    document_id = models.BigIntegerField()
+    file_name = models.CharField(max_length=255, blank=True, default='')  # Storage name of the upload
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now, db_index=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Cleanup of document {self.document_id} ({self.attempts} attempts)"
+
+@receiver(pre_delete, sender=DocumentType)
+def touch_documents_of_deleted_type(sender, instance, **kwargs):
+    """SET_NULL bypasses save(), so bump the affected documents' version stamps explicitly"""
+    UploadedDocument.objects.filter(document_type=instance).update(updated_at=timezone.now())
 
 class Quiz(models.Model):
     document = models.ForeignKey(UploadedDocument, on_delete=models.CASCADE, related_name='quizzes')
@@ -110,10 +260,18 @@ class Quiz(models.Model):
     def __str__(self):
         return f"Quiz for {self.document.title}"
 
+class FlashcardSetQuerySet(models.QuerySet):
+    def complete(self):
+        """Sets whose cards were all written; others are leftovers of interrupted writes"""
+        return self.filter(completed_at__isnull=False)
+
 class FlashcardSet(models.Model):
     document = models.ForeignKey(UploadedDocument, on_delete=models.CASCADE, related_name='flashcard_sets')
     title = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)  # Set after the last card, in the same transaction
+
+    objects = FlashcardSetQuerySet.as_manager()
 
     def __str__(self):
         return f"Flashcards for {self.document.title}"
@@ -133,8 +291,10 @@ class TemporaryUser(models.Model):
     otp = models.CharField(max_length=6)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    OTP_LIFETIME = timedelta(minutes=5)
+
     def is_otp_expired(self):
-        return timezone.now() > self.created_at + timedelta(minutes=5)
+        return timezone.now() > self.created_at + self.OTP_LIFETIME
 
 
 
@@ -152,13 +312,137 @@ class QuestionAnswer(models.Model):
     def __str__(self):
         return f"Q&A for {self.document.title}: {self.question[:50]}"
 
+# Durable AI summaries, shared by every document whose text is identical
+class Summary(models.Model):
+    """
+    Keyed by the SHA-256 of the summarized text (DocumentContent.hash_text) plus the prompt version and model
+    that produced it, so a restart or cache eviction never pays for the same summary twice.
+    """
+    content_hash = models.CharField(max_length=64)
+    prompt_version = models.PositiveSmallIntegerField()
+    model = models.CharField(max_length=100)
+    text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ('content_hash', 'prompt_version', 'model')
+    
+    def __str__(self):
+        return f"Summary {self.content_hash[:12]} ({self.model}, prompt v{self.prompt_version})"
+
+# Version counter of each user's searchable corpus
+class CorpusVersion(models.Model):
+    """
+    Bumped whenever a user's documents are created, deleted or re-extracted.
+    Cached search results are keyed on it, so they go stale the moment the corpus changes.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='corpus_version')
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def current(cls, user_id):
+        return cls.objects.filter(user_id=user_id).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, user_id, create=True):
+        """
+        Atomically increment the user's corpus version and drop their outdated search cache.
+        Mostly called inside the document write's transaction (signals), where only the
+        outermost writer can retry a locked database; callers outside one wrap it in retry_on_locked.
+        """
+        with transaction.atomic():
+            updated = cls.objects.filter(user_id=user_id).update(version=F('version') + 1, updated_at=timezone.now())
+            if not updated and create:
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(user_id=user_id, version=1)
+                except IntegrityError:
+                    # Created concurrently by another request - increment that row instead
+                    cls.objects.filter(user_id=user_id).update(version=F('version') + 1, updated_at=timezone.now())
+            SearchCache.objects.filter(user_id=user_id).delete()
+
+    def __str__(self):
+        return f"Corpus v{self.version} for {self.user.username}"
+
+@receiver(post_save, sender=UploadedDocument)
+def bump_corpus_version_on_create(sender, instance, created, **kwargs):
+    if created:
+        CorpusVersion.bump(instance.user_id)
+
+@receiver(post_delete, sender=UploadedDocument)
+def bump_corpus_version_on_delete(sender, instance, **kwargs):
+    # Never create a version row here: the user itself may be in the middle of being deleted
+    CorpusVersion.bump(instance.user_id, create=False)
+
+@receiver(post_delete, sender=UploadedDocument)
+def delete_orphaned_content(sender, instance, **kwargs):
+    if instance.content_id:
+        DocumentContent.objects.delete_orphans([instance.content_id])
+
+class SearchCacheManager(models.Manager):
+    def lookup(self, user, query_hash, corpus_version, max_age_hours=None):
+        """Return a cached search for the given corpus version, or None"""
+        max_age_hours = max_age_hours or settings.SEARCH_CACHE_MAX_AGE_HOURS
+        cached_search = self.filter(user=user, query_hash=query_hash, corpus_version=corpus_version).first()
+        if not cached_search or not cached_search.is_fresh(max_age_hours=max_age_hours):
+            return None
+        self.filter(pk=cached_search.pk).update(last_used_at=timezone.now())
+        return cached_search
+
+    @retry_on_locked
+    def store(self, user, query_hash, query, results, corpus_version):
+        """
+        Cache results computed against corpus_version (read before searching, so results
+        computed while the corpus changed are never stored under the new version)
+        and evict the user's least recently used rows.
+        """
+        now = timezone.now()
+        self.update_or_create(
+            user=user,
+            query_hash=query_hash,
+            defaults={
+                'query': query,
+                'results': results,
+                'corpus_version': corpus_version,
+                'created_at': now,
+                'last_used_at': now,
+            }
+        )
+        self.evict_least_recently_used(user.id)
+
+    def evict_least_recently_used(self, user_id, max_entries=None):
+        max_entries = max_entries or settings.SEARCH_CACHE_MAX_ENTRIES_PER_USER
+        overflow = self.filter(user_id=user_id).order_by('-last_used_at').values_list('pk', flat=True)[max_entries:]
+        overflow = list(overflow)
+        if overflow:
+            self.filter(pk__in=overflow).delete()
+        return len(overflow)
+
+    def sweep(self, max_age_hours=None, batch_size=None):
+        """Delete expired rows, rows from outdated corpus versions and per-user overflow, in batches"""
+        max_age_hours = max_age_hours or settings.SEARCH_CACHE_MAX_AGE_HOURS
+        deleted = delete_in_batches(self.filter(created_at__lt=timezone.now() - timedelta(hours=max_age_hours)), batch_size)
+        outdated = self.annotate(
+            current_version=Coalesce(F('user__corpus_version__version'), Value(0))
+        ).exclude(corpus_version=F('current_version'))
+        stale = delete_in_batches(outdated, batch_size)
+        evicted = delete_overflow(
+            self.all(), 'user_id', settings.SEARCH_CACHE_MAX_ENTRIES_PER_USER, ('-last_used_at', '-pk'), batch_size
+        )
+        return deleted + stale + evicted
+
 # Cache for search results
 class SearchCache(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     query_hash = models.CharField(max_length=64, db_index=True)
     query = models.TextField()
     results = models.JSONField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    corpus_version = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects = SearchCacheManager()
     
     class Meta:
         unique_together = ('user', 'query_hash')
@@ -168,4 +452,4 @@ class SearchCache(models.Model):
         return timezone.now() - self.created_at < timedelta(hours=max_age_hours)
     
     def __str__(self):
-        return f"Search cache for {self.user.username}: {self.query[:50]}"
\ No newline at end of file
+        return f"Search cache for {self.user.username}: {self.query[:50]}"
@@ -0,0 +1,18 @@
+from rest_framework.pagination import CursorPagination
+
+
+class DocumentCursorPagination(CursorPagination):
+    """
+    Opt-in cursor pagination for document lists: only requests that pass
+    ?page_size= or ?cursor= get a {next, previous, results} page, so existing
+    clients that expect the full array keep working.
+    """
+    ordering = ('-uploaded_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params and self.page_size_query_param not in request.query_params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
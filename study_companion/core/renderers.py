@@ -0,0 +1,60 @@
+"""
+JSON rendering and parsing for the API with orjson.
+
+orjson serializes our payloads (quiz JSON, search results, document text)
+several times faster than the standard json module DRF uses. It is an optional
+dependency: without it both classes behave exactly like DRF's. Indented output
+(the browsable API, ?indent=) always goes through DRF's renderer.
+"""
+
+import logging
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # Optional: fall back to DRF's json-based classes
+    orjson = None
+    # At import, so once per process
+    logger.warning("orjson is not installed; API JSON is rendered and parsed with DRF's json-based classes")
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    # Types orjson does not know natively (Decimal, lazy translations, timedelta, QuerySets...)
+    return _encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Datetimes go through DRF's encoder too, which writes UTC as 'Z' (orjson would write +00:00)
+        rendered = orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+        # Same escaping as DRF, so the output stays valid inside JavaScript
+        return rendered.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            body = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                body = body.decode(encoding)
+            return orjson.loads(body)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ParseError(f'JSON parse error - {exc}')
@@ -0,0 +1,346 @@
+"""
+Local semantic index used by smart search.
+
+Every user's documents are split into overlapping chunks which are embedded
+with a signed feature-hashing embedder (unigrams + bigrams, sublinear term
+frequency, L2 normalised). The vectors live in one memory-mapped float16
+NumPy file per user, so a query is a single blocked matrix product over the
+whole corpus instead of a Gemini round trip over an arbitrary 10 documents.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from . import deletions
+from .models import UploadedDocument
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = getattr(settings, 'SEARCH_INDEX_DIM', 512)
+CHUNK_SIZE = getattr(settings, 'SEARCH_INDEX_CHUNK_SIZE', 800)
+CHUNK_OVERLAP = getattr(settings, 'SEARCH_INDEX_CHUNK_OVERLAP', 200)
+BLOCK_ROWS = 8192  # rows converted to float32 at a time during scoring
+
+INDEX_FILENAME = 'vectors.npy'
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from',
+    'has', 'have', 'in', 'into', 'is', 'it', 'its', 'of', 'on', 'or', 'that',
+    'the', 'their', 'this', 'to', 'was', 'were', 'which', 'with', 'what',
+    'when', 'where', 'who', 'how', 'can', 'will', 'not', 'also', 'these',
+    'those', 'than', 'then', 'there', 'they', 'we', 'you', 'our', 'such',
+])
+
+ChunkHit = namedtuple('ChunkHit', ['document_id', 'start', 'end', 'score'])
+
+
+def _index_dtype():
+    return np.dtype([
+        ('document_id', '<i8'),
+        ('start', '<i4'),
+        ('end', '<i4'),
+        ('vector', '<f2', (EMBEDDING_DIM,)),
+    ])
+
+
+def tokenize(text):
+    """Lowercase word tokens with stop words and single characters removed"""
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOP_WORDS]
+
+
+@lru_cache(maxsize=200000)
+def _feature_slot(feature):
+    """Map a feature string to (dimension, sign) with a stable hash"""
+    value = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+    return value % EMBEDDING_DIM, 1.0 if value >> 63 else -1.0
+
+
+def embed_text(text):
+    """Embed a piece of text into a normalised float32 vector"""
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    tokens = tokenize(text)
+    if not tokens:
+        return vector
+
+    counts = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1.0
+    for first, second in zip(tokens, tokens[1:]):
+        bigram = f"{first} {second}"
+        counts[bigram] = counts.get(bigram, 0) + 0.5
+
+    slots = np.empty(len(counts), dtype=np.int64)
+    weights = np.empty(len(counts), dtype=np.float32)
+    for i, (feature, count) in enumerate(counts.items()):
+        slot, sign = _feature_slot(feature)
+        slots[i] = slot
+        weights[i] = sign * (1.0 + np.log(count)) if count >= 1 else sign * count
+    np.add.at(vector, slots, weights)
+
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+def chunk_text(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """Split text into overlapping (start, end) character spans on word boundaries"""
+    spans = []
+    length = len(text)
+    start = 0
+    while start < length:
+        end = min(length, start + size)
+        if end < length:
+            boundary = text.rfind(' ', start + size // 2, end)
+            if boundary != -1:
+                end = boundary
+        spans.append((start, end))
+        if end >= length:
+            break
+        next_start = end - overlap
+        space = text.find(' ', next_start, end)
+        start = space + 1 if space != -1 else max(next_start, start + 1)
+    return spans
+
+
+def has_indexable_text(text):
+    return bool(text) and not text.startswith("Text extraction failed:")
+
+
+# --- Storage ---
+
+_write_locks = {}
+_write_locks_guard = threading.Lock()
+_loaded = {}
+_loaded_guard = threading.Lock()
+
+
+def user_index_dir(user_id):
+    return os.path.join(settings.SEARCH_INDEX_ROOT, str(user_id))
+
+
+def _index_path(user_id):
+    return os.path.join(user_index_dir(user_id), INDEX_FILENAME)
+
+
+class UserIndexLock:
+    """Serialises read-modify-write of one user's index across threads and processes"""
+
+    def __init__(self, user_id):
+        with _write_locks_guard:
+            self.thread_lock = _write_locks.setdefault(user_id, threading.Lock())
+        self.lock_path = os.path.join(user_index_dir(user_id), '.lock')
+        self.handle = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        if fcntl:
+            self.handle = open(self.lock_path, 'a')
+            fcntl.flock(self.handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.handle:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+            self.handle.close()
+        self.thread_lock.release()
+
+
+def load_user_index(user_id):
+    """Return the user's index as a read-only memory map, or None if it does not exist"""
+    path = _index_path(user_id)
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    with _loaded_guard:
+        cached = _loaded.get(user_id)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+    index = np.load(path, mmap_mode='r')
+    if index.dtype != _index_dtype():
+        logger.warning(f"Search index for user {user_id} has an outdated layout; rebuild it")
+        return None
+    with _loaded_guard:
+        _loaded[user_id] = (stamp, index)
+    return index
+
+
+def _write_user_index(user_id, rows):
+    path = _index_path(user_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if len(rows) == 0:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as handle:
+        np.save(handle, rows)
+    os.replace(tmp_path, path)
+
+
+def _existing_rows_without(user_id, document_ids):
+    index = load_user_index(user_id)
+    if index is None:
+        return np.empty(0, dtype=_index_dtype())
+    keep = ~np.isin(index['document_id'], list(document_ids))
+    return np.array(index[keep])
+
+
+def _rows_for_text(document_id, text):
+    spans = chunk_text(text)
+    rows = np.empty(len(spans), dtype=_index_dtype())
+    for i, (start, end) in enumerate(spans):
+        rows[i]['document_id'] = document_id
+        rows[i]['start'] = start
+        rows[i]['end'] = end
+        rows[i]['vector'] = embed_text(text[start:end])
+    return rows
+
+
+def index_document(document):
+    """(Re)index a single document; documents without usable text are removed"""
+    text = document.extracted_text
+    new_rows = _rows_for_text(document.pk, text) if has_indexable_text(text) else None
+    with UserIndexLock(document.user_id):
+        rows = _existing_rows_without(document.user_id, [document.pk])
+        if new_rows is not None:
+            rows = np.concatenate([rows, new_rows])
+        _write_user_index(document.user_id, rows)
+
+
+def remove_documents(user_id, document_ids):
+    """Drop the chunks of deleted documents, rewriting the user's index once"""
+    if load_user_index(user_id) is None:
+        return
+    with UserIndexLock(user_id):
+        _write_user_index(user_id, _existing_rows_without(user_id, document_ids))
+
+
+def rebuild_user_index(user_id):
+    """Rebuild a user's index from scratch; returns the number of chunks indexed"""
+    parts = []
+    documents = UploadedDocument.objects.filter(user_id=user_id).with_text().with_content()
+    for document in documents.iterator(chunk_size=50):
+        if has_indexable_text(document.extracted_text):
+            parts.append(_rows_for_text(document.pk, document.extracted_text))
+    rows = np.concatenate(parts) if parts else np.empty(0, dtype=_index_dtype())
+    with UserIndexLock(user_id):
+        _write_user_index(user_id, rows)
+    return len(rows)
+
+
+# --- Querying ---
+
+def search(user_id, query, top_k=20):
+    """Return the top_k best matching chunks for a query, highest score first"""
+    index = load_user_index(user_id)
+    if index is None or len(index) == 0:
+        return []
+    query_vector = embed_text(query)
+    if not query_vector.any():
+        return []
+
+    vectors = index['vector']
+    scores = np.empty(len(index), dtype=np.float32)
+    for start in range(0, len(index), BLOCK_ROWS):
+        block = vectors[start:start + BLOCK_ROWS].astype(np.float32)
+        scores[start:start + len(block)] = block @ query_vector
+
+    top_k = min(top_k, len(scores))
+    candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    candidates = candidates[np.argsort(-scores[candidates])]
+    return [
+        ChunkHit(int(index['document_id'][i]), int(index['start'][i]), int(index['end'][i]), float(scores[i]))
+        for i in candidates if scores[i] > 0
+    ]
+
+
+def _snippet(text, start, end, max_length=300):
+    snippet = ' '.join(text[start:end].split())
+    if len(snippet) > max_length:
+        snippet = snippet[:max_length].rsplit(' ', 1)[0] + "..."
+    if start > 0:
+        snippet = "..." + snippet
+    return snippet
+
+
+def recall_candidates(user_id, query, max_documents=10, top_k_chunks=50):
+    """
+    Stage one of search: the best matching chunk of each of the top documents.
+    Each candidate carries the chunk text so a reranker never needs the full document.
+    """
+    hits = search(user_id, query, top_k=top_k_chunks)
+    best = {}
+    for hit in hits:
+        if hit.document_id not in best:
+            best[hit.document_id] = hit
+    ranked = list(best.values())[:max_documents]
+    if not ranked:
+        return []
+
+    documents = UploadedDocument.objects.filter(
+        user_id=user_id, id__in=[hit.document_id for hit in ranked]
+    ).with_content().in_bulk()
+
+    top_score = ranked[0].score
+    candidates = []
+    for hit in ranked:
+        document = documents.get(hit.document_id)
+        if document is None or not document.extracted_text:
+            continue
+        candidates.append({
+            "document_id": str(hit.document_id),
+            "title": document.title,
+            "text": document.extracted_text[hit.start:hit.end],
+            "snippet": _snippet(document.extracted_text, hit.start, hit.end),
+            "relevance_score": max(1, round(10 * hit.score / top_score)),
+        })
+    return candidates
+
+
+def local_search_results(candidates):
+    """Shape recalled candidates like smart_search_documents results"""
+    return {
+        "results": [
+            {key: candidate[key] for key in ("document_id", "title", "snippet", "relevance_score")}
+            for candidate in candidates
+        ],
+        "total_found": len(candidates),
+        "search_summary": f"Found {len(candidates)} relevant documents using local semantic search",
+    }
+
+
+def search_documents(user_id, query, max_results=10):
+    """Local-only semantic search in the same response shape as smart_search_documents"""
+    return local_search_results(recall_candidates(user_id, query, max_documents=max_results))
+
+
+def remove_deleted_user(user_id, document_ids):
+    """Remove the whole index directory once the account itself is gone"""
+    if not User.objects.filter(pk=user_id).exists():
+        shutil.rmtree(user_index_dir(user_id), ignore_errors=True)
+
+
+# Deleted documents leave the index once their delete commits (see core.deletions)
+deletions.register_cleanup(remove_documents)
+deletions.register_cleanup(remove_deleted_user)
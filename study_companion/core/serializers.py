@@ -1,48 +1,93 @@
 from rest_framework import serializers
 from .models import UploadedDocument, Quiz, FlashcardSet, Flashcard, DocumentType
+from .document_types import registry
 
 class DocumentTypeSerializer(serializers.ModelSerializer):
     class Meta:
         model = DocumentType
         fields = ['id', 'name', 'description', 'icon', 'color', 'created_at']
 
-class UploadedDocumentSerializer(serializers.ModelSerializer):
-    document_type = DocumentTypeSerializer(read_only=True)
+class RegistryDocumentTypeSerializer(DocumentTypeSerializer):
+    """Nested document type read from the in-process registry instead of a per-row query"""
+    def get_attribute(self, instance):
+        return registry.get(instance.document_type_id) if instance.document_type_id else None
+
+class SparseFieldsMixin:
+    """
+    Fields picked by the request (see core.fieldsets): context['fields'] keeps only
+    those fields, context['expand'] adds the stored artifacts in context['artifacts'].
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name in self.context.get('expand') or ():
+            self.fields[name] = serializers.SerializerMethodField()
+    
+    def _artifacts(self, document):
+        return self.context.get('artifacts', {}).get(document.pk, {})
+    
+    def get_summary(self, document):
+        summary = self._artifacts(document).get('summary')
+        if summary is not None:
+            summary_status = 'ready'
+        else:
+            summary_status = 'missing' if document.has_text else 'unavailable'
+        return {'status': summary_status, 'summary': summary}
+    
+    def get_quiz(self, document):
+        quiz = self._artifacts(document).get('quiz')
+        return QuizSerializer(quiz).data if quiz else None
+    
+    def get_flashcards(self, document):
+        flashcard_set = self._artifacts(document).get('flashcards')
+        return FlashcardSetSerializer(flashcard_set).data if flashcard_set else None
+
+class UploadedDocumentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    document_type = RegistryDocumentTypeSerializer(read_only=True)
     document_type_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
+    extracted_text = serializers.CharField(read_only=True)  # Model property, see DocumentContent
     
     class Meta:
         model = UploadedDocument
-        fields = ['id', 'user', 'title', 'file', 'document_type', 'document_type_id', 'extracted_text', 'uploaded_at']
-        read_only_fields = ['user', 'extracted_text', 'uploaded_at']
+        fields = ['id', 'user', 'title', 'file', 'document_type', 'document_type_id', 'extracted_text',
+                  'text_length', 'page_count', 'extraction_status', 'extraction_error', 'uploaded_at', 'updated_at']
+        read_only_fields = ['user', 'text_length', 'page_count', 'extraction_status', 'extraction_error',
+                            'uploaded_at', 'updated_at']
     
     def create(self, validated_data):
         document_type_id = validated_data.pop('document_type_id', None)
         print(f"🔍 UploadedDocumentSerializer.create() - document_type_id: {document_type_id}")
         
-        instance = super().create(validated_data)
-        print(f"📄 Created document instance: {instance.title}")
-        
-        # Auto-assign document type if not provided
+        # Resolve the type from the registry before the INSERT: no lookup queries and no second save
         if document_type_id:
-            print(f"🎯 Manual document type selected: {document_type_id}")
-            try:
-                instance.document_type = DocumentType.objects.get(id=document_type_id)
-                instance.save(update_fields=['document_type'])
-                print(f"✅ Manually assigned document type: {instance.document_type.name}")
-            except DocumentType.DoesNotExist:
+            validated_data['document_type'] = registry.get(document_type_id)
+            if validated_data['document_type'] is None:
                 print(f"❌ Document type with ID {document_type_id} not found")
-                pass
         else:
             print("🤖 Auto-detecting document type based on file extension...")
-            # Auto-assign based on file extension
-            instance.auto_assign_document_type()
-            if instance.document_type:
-                print(f"✅ Auto-assigned document type: {instance.document_type.name}")
-            else:
-                print("⚠️ No document type was auto-assigned")
+            extension = validated_data['file'].name.split('.')[-1].lower()
+            validated_data['document_type'] = registry.for_extension(extension)
         
+        instance = super().create(validated_data)
+        print(f"📄 Created document instance: {instance.title} ({instance.document_type or 'no type'})")
         return instance
 
+class DocumentListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Lightweight rows for document lists: never includes extracted_text, only its
+    length and extraction status.
+    """
+    document_type = RegistryDocumentTypeSerializer(read_only=True)
+    
+    class Meta:
+        model = UploadedDocument
+        fields = ['id', 'user', 'title', 'file', 'document_type', 'text_length', 'page_count', 'extraction_status',
+                  'extraction_error', 'uploaded_at', 'updated_at']
+        read_only_fields = fields
+
 class QuizSerializer(serializers.ModelSerializer):
     class Meta:
         model = Quiz
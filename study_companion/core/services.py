@@ -1,5 +1,6 @@
 import os
 import json
+from collections import namedtuple
 from google import genai
 from google.genai import types
 import PyPDF2
@@ -23,6 +24,21 @@ else:
     print("📝 To enable AI features, add your API key to the .env file")
     print("🔗 Get your API key from: https://makersuite.google.com/app/apikey")
 
+# Summaries are stored durably per (text hash, prompt version, model):
+# bump SUMMARY_PROMPT_VERSION whenever the summary prompt changes
+SUMMARY_MODEL = "gemini-1.5-flash"
+SUMMARY_PROMPT_VERSION = 1
+FALLBACK_SUMMARY_PREFIX = "Basic Summary (AI unavailable):"
+UNAVAILABLE_SUMMARY = "Summary temporarily unavailable. Please try again later."
+
+def is_fallback_summary(summary):
+    """True for the basic summaries produced when the model could not be used"""
+    return summary.startswith(FALLBACK_SUMMARY_PREFIX) or summary == UNAVAILABLE_SUMMARY
+
+def is_fallback_artifact(data):
+    """True for the basic quizzes and flashcards produced when the model could not be used"""
+    return isinstance(data, dict) and bool(data.get('fallback_mode'))
+
 def clean_response_text(text):
     """
     Clean response text to remove asterisks and ensure proper formatting
@@ -92,15 +108,23 @@ brief_generation_config = types.GenerateContentConfig(
 
 
 
+ExtractedText = namedtuple('ExtractedText', 'text page_count')
+
 def extract_text_from_file(file_path):
+    return extract_document_text(file_path).text
+
+def extract_document_text(file_path):
+    """Extract a file's text; page_count is None for formats without pages (Word, plain text)"""
     _, file_extension = os.path.splitext(file_path)
     text = ""
+    page_count = None
     
     try:
         if file_extension.lower() == '.pdf':
             # Primary method: PyPDF2 (unchanged)
             with open(file_path, 'rb') as file:
                 reader = PyPDF2.PdfReader(file)
+                page_count = len(reader.pages)
                 for page in reader.pages:
                     page_text = page.extract_text()
                     if page_text:
@@ -169,6 +193,7 @@ def extract_text_from_file(file_path):
         
         elif file_extension.lower() in ['.jpg', '.jpeg', '.png']:
             text = pytesseract.image_to_string(Image.open(file_path))
+            page_count = 1
         
         elif file_extension.lower() == '.txt':
             with open(file_path, 'r', encoding='utf-8') as file:
@@ -185,9 +210,42 @@ def extract_text_from_file(file_path):
     if not text:
         raise Exception("No text could be extracted from the file. The file might be empty, corrupted, or a scanned document without OCR support.")
     
-    return text
+    return ExtractedText(text, page_count)
 
-def get_gemini_summary(text_content):
+# Every model call is prepared once and then either run on the blocking client
+# (sync views, warm-up) or awaited on the asyncio client (async views); prompts,
+# parsing and fallbacks are shared. A builder returns a plain value instead of a
+# ModelCall when no model call is needed (no client, nothing to ask).
+ModelCall = namedtuple('ModelCall', 'model prompt config parse recover')
+
+def run_model_call(call):
+    """Run a prepared call, blocking until the model answers"""
+    if not isinstance(call, ModelCall):
+        return call
+    try:
+        response = client.models.generate_content(model=call.model, contents=call.prompt, config=call.config)
+        return call.parse(response)
+    except Exception as e:
+        return call.recover(e)
+
+async def arun_model_call(call):
+    """Run a prepared call on the asyncio client: no thread is held while the model works"""
+    if not isinstance(call, ModelCall):
+        return call
+    try:
+        response = await client.aio.models.generate_content(model=call.model, contents=call.prompt, config=call.config)
+        return call.parse(response)
+    except Exception as e:
+        return call.recover(e)
+
+def _clean_json_text(text):
+    """Strip code fences and asterisks from a JSON answer before parsing it"""
+    text = text.strip().replace("```json", "").replace("```", "").strip()
+    if text.startswith("json"):
+        text = text[4:].strip()
+    return clean_response_text(text)
+
+def _summary_call(text_content):
     # Check if client is available
     if not client:
         print("Gemini client not available, using fallback summary")
@@ -205,29 +263,30 @@ IMPORTANT: Do not use asterisks (*) or bullet points with asterisks in your resp
 Text to summarize:
 {text_content}"""
     
-    try:
-        response = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=prompt,
-            config=brief_generation_config  # Use brief config for summaries
-        )
-        
+    def parse(response):
         if not response or not response.text:
             raise Exception("Empty response from Gemini AI")
-        
         # Clean the response to remove any asterisks
         return clean_response_text(response.text)
-        
-    except Exception as e:
+    
+    def recover(e):
         print(f"Error generating summary: {e}")
         # Check if it's a model overload error
         if "503" in str(e) or "overloaded" in str(e).lower() or "unavailable" in str(e).lower():
             print("Model is overloaded, returning fallback summary")
             return fallback_summary(text_content)
-        else:
-            raise Exception(f"Failed to generate summary: {e}")
+        raise Exception(f"Failed to generate summary: {e}")
+    
+    # brief config for summaries
+    return ModelCall(SUMMARY_MODEL, prompt, brief_generation_config, parse, recover)
 
-def get_gemini_quiz(text_content):
+def get_gemini_summary(text_content):
+    return run_model_call(_summary_call(text_content))
+
+async def aget_gemini_summary(text_content):
+    return await arun_model_call(_summary_call(text_content))
+
+def _quiz_call(text_content):
     # Check if client is available
     if not client:
         print("Gemini client not available, using fallback quiz")
@@ -255,38 +314,32 @@ def get_gemini_quiz(text_content):
     Text:
     {text_content}
     """
-    response_text = ""
-    try:
-        response = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=prompt,
-            config=generation_config
-        )
-        response_text = (response.text or "").strip()
-        
-        # Clean the response text more thoroughly
-        response_text = response_text.replace("```json", "").replace("```", "").strip()
-        if response_text.startswith("json"):
-            response_text = response_text[4:].strip()
-        
-        # Remove asterisks from the response before parsing
-        response_text = clean_response_text(response_text)
-        
-        return json.loads(response_text)
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error in quiz: {e}")
-        print(f"Response text: {response_text}")
-        return fallback_quiz(text_content)
-    except Exception as e:
+    
+    def parse(response):
+        response_text = _clean_json_text(response.text or "")
+        try:
+            return json.loads(response_text)
+        except json.JSONDecodeError as e:
+            print(f"JSON decode error in quiz: {e}")
+            print(f"Response text: {response_text}")
+            return fallback_quiz(text_content)
+    
+    def recover(e):
         print(f"Error generating quiz: {e}")
         # Check if it's a model overload error
         if "503" in str(e) or "overloaded" in str(e).lower() or "unavailable" in str(e).lower():
             print("Model is overloaded, returning fallback quiz")
-            return fallback_quiz(text_content)
-        else:
-            return fallback_quiz(text_content)
+        return fallback_quiz(text_content)
+    
+    return ModelCall("gemini-1.5-flash", prompt, generation_config, parse, recover)
 
-def get_gemini_flashcards(text_content):
+def get_gemini_quiz(text_content):
+    return run_model_call(_quiz_call(text_content))
+
+async def aget_gemini_quiz(text_content):
+    return await arun_model_call(_quiz_call(text_content))
+
+def _flashcards_call(text_content):
     # Check if client is available
     if not client:
         print("Gemini client not available, using fallback flashcards")
@@ -310,44 +363,37 @@ def get_gemini_flashcards(text_content):
     Text:
     {text_content}
     """
-    response_text = ""
-    try:
-        response = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=prompt,
-            config=generation_config
-        )
-        response_text = (response.text or "").strip()
-        
-        # Clean the response text more thoroughly
-        response_text = response_text.replace("```json", "").replace("```", "").strip()
-        if response_text.startswith("json"):
-            response_text = response_text[4:].strip()
-        
-        # Remove asterisks from the response before parsing
-        response_text = clean_response_text(response_text)
-        
-        parsed_data = json.loads(response_text)
+    
+    def parse(response):
+        response_text = _clean_json_text(response.text or "")
+        try:
+            parsed_data = json.loads(response_text)
+        except json.JSONDecodeError as e:
+            print(f"JSON decode error in flashcards: {e}")
+            print(f"Response text: {response_text}")
+            return fallback_flashcards(text_content)
         
         # Ensure the response has the expected structure
         if 'flashcards' not in parsed_data:
             raise Exception("Response doesn't contain 'flashcards' key")
-        
         return parsed_data
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error in flashcards: {e}")
-        print(f"Response text: {response_text}")
-        return fallback_flashcards(text_content)
-    except Exception as e:
+    
+    def recover(e):
         print(f"Error generating flashcards: {e}")
         # Check if it's a model overload error
         if "503" in str(e) or "overloaded" in str(e).lower() or "unavailable" in str(e).lower():
             print("Model is overloaded, returning fallback flashcards")
-            return fallback_flashcards(text_content)
-        else:
-            return fallback_flashcards(text_content)
+        return fallback_flashcards(text_content)
+    
+    return ModelCall("gemini-1.5-flash", prompt, generation_config, parse, recover)
 
-def get_gemini_answer(context, question):
+def get_gemini_flashcards(text_content):
+    return run_model_call(_flashcards_call(text_content))
+
+async def aget_gemini_flashcards(text_content):
+    return await arun_model_call(_flashcards_call(text_content))
+
+def _answer_call(context, question):
     # Check if client is available
     if not client:
         print("Gemini client not available, using fallback answer")
@@ -360,179 +406,230 @@ IMPORTANT: Do not use asterisks (*) in your response. Use numbered lists (1. 2.
 Context: {context}
 
 Question: {question}"""
-    try:
-        response = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=prompt,
-            config=generation_config
-        )
+    
+    def parse(response):
         if not response or not response.text:
             raise Exception("Empty response from Gemini API")
-        
         # Clean the response to remove any asterisks
         return clean_response_text(response.text.strip())
-    except Exception as e:
+    
+    def recover(e):
         print(f"Error generating answer: {e}")
         # Check if it's a model overload error
         if "503" in str(e) or "overloaded" in str(e).lower() or "unavailable" in str(e).lower():
             print("Model is overloaded, returning fallback answer")
-            return fallback_answer(context, question)
-        else:
-            return fallback_answer(context, question)
+        return fallback_answer(context, question)
+    
+    return ModelCall("gemini-1.5-flash", prompt, generation_config, parse, recover)
 
-def smart_search_documents(documents_data, search_query):
-    """
-    Perform semantic search across multiple documents using AI
-    """
+def get_gemini_answer(context, question):
+    return run_model_call(_answer_call(context, question))
+
+async def aget_gemini_answer(context, question):
+    return await arun_model_call(_answer_call(context, question))
+
+def _smart_search_call(documents_data, search_query):
     # Check if client is available
     if not client:
         print("Gemini client not available, using fallback text search")
         return fallback_text_search(documents_data, search_query)
     
-    try:
-        # Prepare document context for AI
-        documents_context = ""
-        for doc_data in documents_data:
-            doc_id, title, content = doc_data
-            # Truncate content if too long to fit in context window
-            truncated_content = content[:2000] if len(content) > 2000 else content
-            documents_context += f"\n\n--- Document ID: {doc_id} | Title: {title} ---\n{truncated_content}"
-        
-        prompt = f"""
-        You are a smart search assistant. Search through the following documents and find the most relevant information for the user's query.
-        
-        User Query: "{search_query}"
-        
-        Documents to search through:
-        {documents_context}
-        
-        Please provide:
-        1. A list of relevant document IDs (in order of relevance)
-        2. For each relevant document, provide:
-           - Document title
-           - A brief snippet (1-2 sentences) showing why it's relevant
-           - A relevance score (1-10, where 10 is most relevant)
-        
-        IMPORTANT: Do not use asterisks (*) anywhere in your response. Use plain text formatting only.
-        
-        Format your response as JSON:
-        {{
-            "results": [
-                {{
-                    "document_id": "1",
-                    "title": "Document Title",
-                    "snippet": "Relevant text snippet that matches the query...",
-                    "relevance_score": 8
-                }}
-            ],
-            "total_found": 2,
-            "search_summary": "Brief summary of what was found"
-        }}
-        """
-        
-        response = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=prompt,
-            config=generation_config
-        )
-        
+    # Prepare document context for AI
+    documents_context = ""
+    for doc_data in documents_data:
+        doc_id, title, content = doc_data
+        # Truncate content if too long to fit in context window
+        truncated_content = content[:2000] if len(content) > 2000 else content
+        documents_context += f"\n\n--- Document ID: {doc_id} | Title: {title} ---\n{truncated_content}"
+    
+    prompt = f"""
+    You are a smart search assistant. Search through the following documents and find the most relevant information for the user's query.
+    
+    User Query: "{search_query}"
+    
+    Documents to search through:
+    {documents_context}
+    
+    Please provide:
+    1. A list of relevant document IDs (in order of relevance)
+    2. For each relevant document, provide:
+       - Document title
+       - A brief snippet (1-2 sentences) showing why it's relevant
+       - A relevance score (1-10, where 10 is most relevant)
+    
+    IMPORTANT: Do not use asterisks (*) anywhere in your response. Use plain text formatting only.
+    
+    Format your response as JSON:
+    {{
+        "results": [
+            {{
+                "document_id": "1",
+                "title": "Document Title",
+                "snippet": "Relevant text snippet that matches the query...",
+                "relevance_score": 8
+            }}
+        ],
+        "total_found": 2,
+        "search_summary": "Brief summary of what was found"
+    }}
+    """
+    
+    def parse(response):
         if not response or not response.text:
             raise Exception("Empty response from Gemini AI")
-        
-        # Clean and parse the response
-        response_text = response.text.strip()
-        response_text = response_text.replace("```json", "").replace("```", "").strip()
-        if response_text.startswith("json"):
-            response_text = response_text[4:].strip()
-        
-        # Remove asterisks from the response before parsing
-        response_text = clean_response_text(response_text)
-        
-        search_results = json.loads(response_text)
-        return search_results
-        
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error in smart search: {e}")
-        # Fallback to basic text search
-        return fallback_text_search(documents_data, search_query)
-    except Exception as e:
+        try:
+            return json.loads(_clean_json_text(response.text))
+        except json.JSONDecodeError as e:
+            print(f"JSON decode error in smart search: {e}")
+            # Fallback to basic text search
+            return fallback_text_search(documents_data, search_query)
+    
+    def recover(e):
         print(f"Error in smart search: {e}")
         # Check if it's a model overload error
         if "503" in str(e) or "overloaded" in str(e).lower() or "unavailable" in str(e).lower():
             print("Model is overloaded, falling back to basic text search")
-            return fallback_text_search(documents_data, search_query)
-        else:
-            # For other errors, try fallback search
-            return fallback_text_search(documents_data, search_query)
+        return fallback_text_search(documents_data, search_query)
+    
+    return ModelCall("gemini-1.5-flash", prompt, generation_config, parse, recover)
 
-def generate_search_suggestions(documents_data, partial_query):
+def smart_search_documents(documents_data, search_query):
     """
-    Generate search suggestions based on document content and partial user input
+    Perform semantic search across multiple documents using AI
     """
+    return run_model_call(_smart_search_call(documents_data, search_query))
+
+async def asmart_search_documents(documents_data, search_query):
+    return await arun_model_call(_smart_search_call(documents_data, search_query))
+
+def _rerank_call(candidates, search_query):
+    if not candidates:
+        return fallback_rerank(candidates)
+    
+    # Check if client is available
+    if not client:
+        print("Gemini client not available, using local ranking")
+        return fallback_rerank(candidates)
+    
+    candidates_context = ""
+    for candidate in candidates:
+        candidates_context += f"\n\n--- Document ID: {candidate['document_id']} | Title: {candidate['title']} ---\n{candidate['text']}"
+    
+    prompt = f"""
+    You are a smart search assistant. The passages below were retrieved from the user's documents for their query.
+    Rerank them by how well they answer the query and drop any that are not relevant.
+    
+    User Query: "{search_query}"
+    
+    Retrieved passages:
+    {candidates_context}
+    
+    For each relevant document provide the document title, a brief snippet (1-2 sentences) taken from its passage showing why it is relevant, and a relevance score (1-10, where 10 is most relevant).
+    
+    IMPORTANT: Do not use asterisks (*) anywhere in your response. Use plain text formatting only.
+    
+    Format your response as JSON:
+    {{
+        "results": [
+            {{
+                "document_id": "1",
+                "title": "Document Title",
+                "snippet": "Relevant text snippet that matches the query...",
+                "relevance_score": 8
+            }}
+        ],
+        "total_found": 1,
+        "search_summary": "Brief summary of what was found"
+    }}
+    """
+    
+    def parse(response):
+        if not response or not response.text:
+            raise Exception("Empty response from Gemini AI")
+        try:
+            search_results = json.loads(_clean_json_text(response.text))
+        except json.JSONDecodeError as e:
+            print(f"JSON decode error in search rerank: {e}")
+            return fallback_rerank(candidates)
+        
+        # Never let the model invent documents that were not recalled
+        candidate_ids = {candidate['document_id'] for candidate in candidates}
+        search_results['results'] = [
+            result for result in search_results.get('results', [])
+            if str(result.get('document_id')) in candidate_ids
+        ]
+        return search_results
+    
+    def recover(e):
+        print(f"Error in search rerank: {e}")
+        # Model overloaded or unavailable - the local ranking is still a good answer
+        return fallback_rerank(candidates)
+    
+    return ModelCall("gemini-1.5-flash", prompt, generation_config, parse, recover)
+
+def rerank_search_candidates(candidates, search_query):
+    """
+    Rerank locally recalled chunks with AI and write query-specific snippets.
+    Only the candidate chunks are sent, so the prompt stays small however large the corpus is.
+    """
+    return run_model_call(_rerank_call(candidates, search_query))
+
+async def arerank_search_candidates(candidates, search_query):
+    return await arun_model_call(_rerank_call(candidates, search_query))
+
+def _suggestions_call(documents_data, partial_query):
     # Check if client is available
     if not client:
         print("Gemini client not available, using fallback suggestions")
         return fallback_suggestions(documents_data, partial_query)
     
-    try:
-        if len(partial_query) < 2:
-            return []
-        
-        # Extract key topics and terms from documents
-        documents_context = ""
-        for doc_data in documents_data[:5]:  # Limit to first 5 documents for speed
-            doc_id, title, content = doc_data
-            # Use title and first 500 chars for suggestions
-            truncated_content = content[:500] if len(content) > 500 else content
-            documents_context += f"\n--- {title} ---\n{truncated_content}"
-        
-        prompt = f"""
-        Based on the following documents and the user's partial input, suggest 5-8 relevant search queries that the user might want to search for.
-        
-        User's partial input: "{partial_query}"
-        
-        Document content:
-        {documents_context}
-        
-        Generate suggestions that:
-        1. Start with or contain the user's input
-        2. Are relevant to the document content
-        3. Are complete, meaningful search queries
-        4. Help users discover content in their documents
-        
-        IMPORTANT: Do not use asterisks (*) in the suggestions. Use plain text only.
-        
-        Format as JSON array:
-        {{
-            "suggestions": [
-                "machine learning algorithms",
-                "neural network architecture", 
-                "data preprocessing techniques"
-            ]
-        }}
-        
-        Only return suggestions that would be useful for searching these specific documents.
-        """
-        
-        response = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=prompt,
-            config=generation_config
-        )
-        
+    if len(partial_query) < 2:
+        return []
+    
+    # Extract key topics and terms from documents
+    documents_context = ""
+    for doc_data in documents_data[:5]:  # Limit to first 5 documents for speed
+        doc_id, title, content = doc_data
+        # Use title and first 500 chars for suggestions
+        truncated_content = content[:500] if len(content) > 500 else content
+        documents_context += f"\n--- {title} ---\n{truncated_content}"
+    
+    prompt = f"""
+    Based on the following documents and the user's partial input, suggest 5-8 relevant search queries that the user might want to search for.
+    
+    User's partial input: "{partial_query}"
+    
+    Document content:
+    {documents_context}
+    
+    Generate suggestions that:
+    1. Start with or contain the user's input
+    2. Are relevant to the document content
+    3. Are complete, meaningful search queries
+    4. Help users discover content in their documents
+    
+    IMPORTANT: Do not use asterisks (*) in the suggestions. Use plain text only.
+    
+    Format as JSON array:
+    {{
+        "suggestions": [
+            "machine learning algorithms",
+            "neural network architecture", 
+            "data preprocessing techniques"
+        ]
+    }}
+    
+    Only return suggestions that would be useful for searching these specific documents.
+    """
+    
+    def parse(response):
         if not response or not response.text:
             return []
-        
-        # Clean and parse the response
-        response_text = response.text.strip()
-        response_text = response_text.replace("```json", "").replace("```", "").strip()
-        if response_text.startswith("json"):
-            response_text = response_text[4:].strip()
-        
-        # Remove asterisks from the response before parsing
-        response_text = clean_response_text(response_text)
-        
-        suggestions_data = json.loads(response_text)
+        try:
+            suggestions_data = json.loads(_clean_json_text(response.text))
+        except json.JSONDecodeError as e:
+            print(f"JSON decode error in suggestions: {e}")
+            return fallback_suggestions(documents_data, partial_query)
         suggestions = suggestions_data.get('suggestions', [])
         
         # Filter suggestions to only include those that contain the partial query
@@ -544,18 +641,24 @@ def generate_search_suggestions(documents_data, partial_query):
                 filtered_suggestions.append(clean_suggestion)
         
         return filtered_suggestions[:6]  # Limit to 6 suggestions
-        
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error in suggestions: {e}")
-        return fallback_suggestions(documents_data, partial_query)
-    except Exception as e:
+    
+    def recover(e):
         print(f"Error generating suggestions: {e}")
         # Check if it's a model overload error
         if "503" in str(e) or "overloaded" in str(e).lower() or "unavailable" in str(e).lower():
             print("Model is overloaded, falling back to basic suggestions")
-            return fallback_suggestions(documents_data, partial_query)
-        else:
-            return fallback_suggestions(documents_data, partial_query)
+        return fallback_suggestions(documents_data, partial_query)
+    
+    return ModelCall("gemini-1.5-flash", prompt, generation_config, parse, recover)
+
+def generate_search_suggestions(documents_data, partial_query):
+    """
+    Generate search suggestions based on document content and partial user input
+    """
+    return run_model_call(_suggestions_call(documents_data, partial_query))
+
+async def agenerate_search_suggestions(documents_data, partial_query):
+    return await arun_model_call(_suggestions_call(documents_data, partial_query))
 
 def fallback_text_search(documents_data, search_query):
     """
@@ -626,6 +729,24 @@ def fallback_text_search(documents_data, search_query):
             "search_summary": "Search temporarily unavailable. Please try again later."
         }
 
+def fallback_rerank(candidates):
+    """
+    Keep the local ranking when AI reranking is unavailable
+    """
+    return {
+        "results": [
+            {
+                "document_id": candidate['document_id'],
+                "title": candidate['title'],
+                "snippet": candidate['snippet'],
+                "relevance_score": candidate['relevance_score']
+            }
+            for candidate in candidates
+        ],
+        "total_found": len(candidates),
+        "search_summary": f"Found {len(candidates)} relevant documents using local search (AI ranking unavailable)"
+    }
+
 def fallback_suggestions(documents_data, partial_query):
     """
     Fallback suggestions when AI suggestions are unavailable
@@ -699,11 +820,11 @@ def fallback_summary(text_content):
         if len(summary) > 500:  # Truncate if too long
             summary = summary[:500] + "..."
         
-        return f"Basic Summary (AI unavailable): {summary}"
+        return f"{FALLBACK_SUMMARY_PREFIX} {summary}"
         
     except Exception as e:
         print(f"Error in fallback summary: {e}")
-        return "Summary temporarily unavailable. Please try again later."
+        return UNAVAILABLE_SUMMARY
 
 def fallback_quiz(text_content):
     """
@@ -0,0 +1,114 @@
+"""
+Write handling for running on one SQLite file with several web workers.
+
+The database is opened in WAL mode with BEGIN IMMEDIATE transactions (see
+DATABASES in settings): readers never wait for the writer, and a transaction
+takes the write lock when it begins instead of failing when it later tries
+to upgrade its read lock. Writers still queue for the single write lock;
+busy_timeout makes them wait for it, and retry_on_locked retries the hot
+writers whose wait ran out. Bulk deletes (delete_in_batches, delete_overflow)
+take the lock for one short transaction per batch instead of one long one.
+"""
+
+import functools
+import logging
+import random
+import sqlite3
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.db.models import Count
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_DELAY = 0.05  # seconds
+RETRY_MAX_DELAY = 2.0
+
+
+def is_locked_error(error):
+    return isinstance(error, (OperationalError, sqlite3.OperationalError)) and 'locked' in str(error)
+
+
+def backoff_delays(attempts, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+    """Sleeps between attempts: exponential with full jitter, so retrying writers do not collide again"""
+    for attempt in range(attempts - 1):
+        yield random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def retry_on_locked(func):
+    """
+    Retry func when SQLite reports the database as locked. Inside an atomic
+    block it runs once: the failed statement aborted the whole transaction,
+    so only the code that owns the outermost block can retry it.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if connection.in_atomic_block:
+            return func(*args, **kwargs)
+        for delay in backoff_delays(getattr(settings, 'SQLITE_WRITE_ATTEMPTS', 5)):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if not is_locked_error(e):
+                    raise
+                logger.warning(f"{func.__qualname__} hit a locked database, retrying in {delay * 1000:.0f} ms")
+                time.sleep(delay)
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def _batch_settings(batch_size):
+    return batch_size or getattr(settings, 'MAINTENANCE_BATCH_SIZE', 1000), getattr(settings, 'MAINTENANCE_BATCH_PAUSE_SECONDS', 0)
+
+
+@retry_on_locked
+def _delete_pks(model, pks):
+    _, per_model = model._base_manager.filter(pk__in=pks).delete()
+    return per_model.get(model._meta.label, 0)
+
+
+def delete_in_batches(queryset, batch_size=None):
+    """
+    Delete the rows of queryset batch_size primary keys at a time, each batch in
+    its own transaction, so purging millions of rows neither holds the write lock
+    for long nor loads every key. Returns the number of rows deleted.
+    """
+    batch_size, pause = _batch_settings(batch_size)
+    deleted = 0
+    while True:
+        pks = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+        if pks:
+            deleted += _delete_pks(queryset.model, pks)
+        if len(pks) < batch_size:
+            return deleted
+        time.sleep(pause)
+
+
+def delete_overflow(queryset, group_field, keep, ordering, batch_size=None):
+    """
+    For each value of group_field, keep the first `keep` rows of queryset in
+    `ordering` and delete the rest in batches. Groups over the limit are read a
+    page at a time in key order, so memory stays bounded however many there are.
+    Returns the number of rows deleted.
+    """
+    batch_size, pause = _batch_settings(batch_size)
+    deleted = 0
+    last_group = None
+    while True:
+        groups = queryset.order_by().values(group_field).annotate(rows=Count('pk')).filter(rows__gt=keep)
+        if last_group is not None:
+            groups = groups.filter(**{f'{group_field}__gt': last_group})
+        page = list(groups.order_by(group_field).values_list(group_field, flat=True)[:batch_size])
+        for group in page:
+            rows = queryset.filter(**{group_field: group}).order_by(*ordering).values_list('pk', flat=True)
+            while True:
+                pks = list(rows[keep:keep + batch_size])
+                if pks:
+                    deleted += _delete_pks(queryset.model, pks)
+                if len(pks) < batch_size:
+                    break
+                time.sleep(pause)
+        if len(page) < batch_size:
+            return deleted
+        last_group = page[-1]
@@ -0,0 +1,101 @@
+"""
+Document summaries: tiered cache -> Summary table -> model.
+
+Summaries are keyed by the hash of the summarized text, the prompt version and
+the model, so identical text uploaded as different documents shares a single
+stored summary, and a re-extracted document gets a new one automatically.
+Fallback summaries (model unavailable) are returned but never stored. The
+a-prefixed functions are the async versions used by the async views.
+"""
+
+from .models import DocumentContent, Summary, UploadedDocument
+from .services import get_gemini_summary, aget_gemini_summary, is_fallback_summary, SUMMARY_MODEL, SUMMARY_PROMPT_VERSION
+from .tiered_cache import summary_cache
+
+
+def summary_key(content_hash):
+    return f"{content_hash}_v{SUMMARY_PROMPT_VERSION}_{SUMMARY_MODEL}"
+
+
+def get_summary(text):
+    """Return the summary of text, generating and storing it only if no stored copy exists"""
+    return _get_summary(DocumentContent.hash_text(text), lambda: text)
+
+
+def content_hash(document):
+    """
+    The hash of the document's text, without reading the compressed text: from the
+    content row if it was loaded (e.g. select_related('content').defer('content__data')),
+    otherwise with a query for the hash alone.
+    """
+    if UploadedDocument.content.is_cached(document):
+        return document.content.content_hash
+    return DocumentContent.objects.filter(pk=document.content_id).values_list('content_hash', flat=True).first()
+
+
+def get_document_summary(document):
+    """Like get_summary, but the document's text is only decompressed if the summary has to be generated"""
+    return _get_summary(content_hash(document), lambda: document.extracted_text)
+
+
+def store_document_summary(document):
+    """
+    Return (summary, created) where created is True only if this call generated and
+    stored a new Summary row; a fallback summary comes back with created False.
+    """
+    outcome = {}
+    summary = _get_summary(content_hash(document), lambda: document.extracted_text, outcome)
+    return summary, outcome.get('created', False)
+
+
+async def aget_document_summary(document):
+    """get_document_summary for async views; load the document with its content row (with_content())"""
+    return await _aget_summary(document.content.content_hash, lambda: document.extracted_text)
+
+
+def _summary_lookup(content_hash):
+    return {'content_hash': content_hash, 'prompt_version': SUMMARY_PROMPT_VERSION, 'model': SUMMARY_MODEL}
+
+
+def _load_or_generate(content_hash, load_text, outcome=None):
+    lookup = _summary_lookup(content_hash)
+
+    def load_or_generate():
+        stored = Summary.objects.filter(**lookup).values_list('text', flat=True).first()
+        if stored is not None:
+            return stored
+        summary = get_gemini_summary(load_text())
+        if not is_fallback_summary(summary):
+            _, created = Summary.objects.get_or_create(**lookup, defaults={'text': summary})
+            if outcome is not None:
+                outcome['created'] = created
+        return summary
+
+    return load_or_generate
+
+
+def _get_summary(content_hash, load_text, outcome=None):
+    summary, _ = summary_cache.get_or_compute(
+        summary_key(content_hash), _load_or_generate(content_hash, load_text, outcome),
+        cacheable=lambda summary: not is_fallback_summary(summary)
+    )
+    return summary
+
+
+async def _aget_summary(content_hash, load_text):
+    lookup = _summary_lookup(content_hash)
+
+    async def aload_or_generate():
+        stored = await Summary.objects.filter(**lookup).values_list('text', flat=True).afirst()
+        if stored is not None:
+            return stored
+        summary = await aget_gemini_summary(load_text())
+        if not is_fallback_summary(summary):
+            await Summary.objects.aget_or_create(**lookup, defaults={'text': summary})
+        return summary
+
+    summary, _ = await summary_cache.aget_or_compute(
+        summary_key(content_hash), _load_or_generate(content_hash, load_text), aload_or_generate,
+        cacheable=lambda summary: not is_fallback_summary(summary)
+    )
+    return summary
@@ -0,0 +1,70 @@
+"""Shared fixtures: per-test temporary directories for runtime data, documents with text and thread races"""
+
+import os
+import shutil
+import tempfile
+import threading
+
+from django.test import override_settings
+
+from core import search_index, vocabulary
+from core.models import UploadedDocument
+
+
+def temporary_directory(testcase, setting=None):
+    """A directory removed after the test; with setting, that setting points at it meanwhile"""
+    directory = tempfile.mkdtemp()
+    testcase.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+    if setting:
+        overridden = override_settings(**{setting: directory})
+        overridden.enable()
+        testcase.addCleanup(overridden.disable)
+    return directory
+
+
+class SharedCacheMixin:
+    """Run against a private SQLiteCache file instead of the development cache"""
+
+    def setUp(self):
+        super().setUp()
+        location = os.path.join(temporary_directory(self), 'cache.sqlite3')
+        overridden = override_settings(CACHES={'default': {'BACKEND': 'core.cache_backend.SQLiteCache', 'LOCATION': location}})
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+
+
+class SearchIndexMixin:
+    """Keep per-user search indexes and vocabularies in a temporary SEARCH_INDEX_ROOT"""
+
+    def setUp(self):
+        super().setUp()
+        temporary_directory(self, 'SEARCH_INDEX_ROOT')
+        # Loaded indexes are cached per user id, and ids are reused between tests
+        for loaded in (search_index._loaded, vocabulary._loaded, vocabulary._term_indexes):
+            loaded.clear()
+            self.addCleanup(loaded.clear)
+
+
+def make_document(user, title, text, **fields):
+    """A saved document whose text was extracted successfully"""
+    document = UploadedDocument(user=user, title=title, file=f"documents/{title}.txt", **fields)
+    document.extracted_text = text
+    document.save()
+    return document
+
+
+def run_in_threads(target, count):
+    """Start count threads at the same moment and return their results"""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(index):
+        barrier.wait()
+        results[index] = target()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
@@ -0,0 +1,80 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.middleware import api_rate_limiter
+from core.models import FlashcardSet, Quiz
+from core.tests.helpers import SharedCacheMixin, make_document
+
+QUIZ = {'questions': [{'question': 'What powers the cell?', 'options': ['Mitochondria', 'Ribosomes'], 'answer': 0}]}
+
+
+class ArtifactBatchViewTests(SharedCacheMixin, TestCase):
+    url = '/api/documents/artifacts/'
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('batch', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.document = make_document(self.user, 'Notes', 'Mitochondria are the powerhouse of the cell.')
+        self.limiter = api_rate_limiter()
+
+    def post(self, payload):
+        return self.client.post(self.url, payload, format='json')
+
+    def test_invalid_input_is_rejected(self):
+        for payload in [
+            {},
+            {'document_ids': []},
+            {'document_ids': str(self.document.pk)},
+            {'document_ids': [True]},
+            {'document_ids': [1.5]},
+            {'document_ids': [None]},
+            {'document_ids': ['abc']},
+            {'document_ids': [self.document.pk], 'artifacts': 'quiz'},
+            {'document_ids': [self.document.pk], 'artifacts': [['quiz']]},
+            {'document_ids': [self.document.pk], 'artifacts': ['poem']},
+        ]:
+            with self.subTest(payload=payload):
+                response = self.post(payload)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_existing_artifacts_are_returned_without_generating(self):
+        Quiz.objects.create(document=self.document, title='Quiz', questions=[])
+        response = self.post({'document_ids': [str(self.document.pk), 999999], 'artifacts': ['quiz']})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['results'][str(self.document.pk)]['quiz']['status'], 'existing')
+        self.assertEqual(body['results']['999999'], {'error': 'Document not found.'})
+        self.assertEqual(body['generated'], 0)
+
+    @mock.patch('core.artifacts.get_gemini_quiz', return_value=QUIZ)
+    def test_generated_artifacts_are_stored_and_charged(self, generate):
+        body = self.post({'document_ids': [self.document.pk], 'artifacts': ['quiz']}).json()
+        self.assertEqual(body['results'][str(self.document.pk)]['quiz']['status'], 'created')
+        self.assertEqual(body['generated'], 1)
+        self.assertEqual(self.limiter.remaining(self.user.pk), self.limiter.limit - 1)
+
+        body = self.post({'document_ids': [self.document.pk], 'artifacts': ['quiz']}).json()
+        self.assertEqual(body['results'][str(self.document.pk)]['quiz']['status'], 'existing')
+        generate.assert_called_once()
+
+    def test_fallbacks_are_reported_as_failed_and_never_stored_or_charged(self):
+        # No model configured in tests, so quizzes and flashcards come back as fallbacks
+        with self.assertLogs('core.artifacts', 'ERROR'):
+            body = self.post({'document_ids': [self.document.pk], 'artifacts': ['quiz', 'flashcards']}).json()
+        outcome = body['results'][str(self.document.pk)]
+        self.assertEqual((outcome['quiz']['status'], outcome['flashcards']['status']), ('failed', 'failed'))
+        self.assertEqual(body['generated'], 0)
+        self.assertFalse(Quiz.objects.exists() or FlashcardSet.objects.exists())
+        self.assertEqual(self.limiter.remaining(self.user.pk), self.limiter.limit)
+
+    def test_single_quiz_fallbacks_answer_503_without_storing(self):
+        response = self.client.post(f'/api/documents/{self.document.pk}/generate-quiz/')
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(response.json()['fallback_mode'])
+        self.assertFalse(Quiz.objects.exists())
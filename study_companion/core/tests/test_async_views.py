@@ -0,0 +1,73 @@
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.test import AsyncClient, TestCase
+from rest_framework.authtoken.models import Token
+
+from core.models import QuestionAnswer, Quiz, Summary
+from core.tests.helpers import SharedCacheMixin, SearchIndexMixin, make_document
+from core.tests.test_search_index import BIOLOGY
+from core.tiered_cache import summary_cache
+from core.uploads import refresh_document_indexes
+
+QUIZ = {'questions': [{'question': 'Where does photosynthesis happen?', 'options': ['Chloroplasts', 'Roots'], 'answer': 0}]}
+
+
+class AsyncViewTests(SearchIndexMixin, SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        summary_cache._local.clear()
+        self.addCleanup(summary_cache._local.clear)
+        self.user = User.objects.create_user('awaiter')
+        self.document = make_document(self.user, 'biology', BIOLOGY)
+        refresh_document_indexes(self.document)
+        # AsyncClient only sends headers given per request
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=self.user).key}'}
+        self.client = AsyncClient()
+
+    def url(self, action):
+        return f'/api/async/documents/{self.document.pk}/{action}/'
+
+    async def post(self, url, data=None):
+        return await self.client.post(url, data or {}, content_type='application/json', headers=self.headers)
+
+    @mock.patch('core.summaries.aget_gemini_summary', new_callable=mock.AsyncMock, return_value='Plants make glucose.')
+    async def test_summaries_are_awaited_and_stored(self, generate):
+        response = await self.post(self.url('summarize'))
+        self.assertEqual(response.json(), {'summary': 'Plants make glucose.'})
+        self.assertTrue(await Summary.objects.filter(text='Plants make glucose.').aexists())
+        generate.assert_awaited_once_with(BIOLOGY)
+
+    @mock.patch('core.artifacts.aget_gemini_quiz', new_callable=mock.AsyncMock, return_value=QUIZ)
+    async def test_quizzes_are_created_once(self, generate):
+        self.assertEqual((await self.post(self.url('generate-quiz'))).status_code, 201)
+        self.assertEqual((await self.post(self.url('generate-quiz'))).status_code, 200)
+        self.assertEqual(await Quiz.objects.acount(), 1)
+        generate.assert_awaited_once()
+
+    async def test_fallback_quizzes_answer_503_without_storing(self):
+        with self.assertLogs(level='ERROR'):
+            response = await self.post(self.url('generate-quiz'))  # No model configured in tests
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(await Quiz.objects.aexists())
+
+    @mock.patch('core.async_views.aget_gemini_answer', new_callable=mock.AsyncMock, return_value='In chloroplasts.')
+    async def test_answers_are_cached_per_question(self, answer):
+        for _ in range(2):
+            response = await self.post(self.url('qna'), {'question': 'Where does photosynthesis happen?'})
+            self.assertEqual(response.json()['answer'], 'In chloroplasts.')
+        answer.assert_awaited_once()
+        self.assertEqual(await QuestionAnswer.objects.acount(), 1)
+
+    async def test_local_search_runs_without_the_model(self):
+        response = await self.post('/api/async/documents/search/', {'query': 'chlorophyll and glucose', 'mode': 'local'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['document_id'], str(self.document.pk))
+
+    async def test_requests_are_authenticated_and_scoped_to_the_owner(self):
+        other = await sync_to_async(User.objects.create_user)('stranger')
+        self.headers = {'Authorization': f'Token {(await Token.objects.acreate(user=other)).key}'}
+        self.assertEqual((await self.post(self.url('summarize'))).status_code, 404)
+        self.assertEqual((await self.client.get(self.url('summarize'), headers=self.headers)).status_code, 405)
+        self.assertEqual((await self.client.post(self.url('summarize'))).status_code, 401)
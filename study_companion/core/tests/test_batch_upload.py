@@ -0,0 +1,69 @@
+import json
+import os
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from core.models import UploadedDocument
+from core.services import ExtractedText
+from core.tests.helpers import SharedCacheMixin, SearchIndexMixin, temporary_directory
+
+
+def fake_extraction(path):
+    name = os.path.basename(path)
+    if name.startswith('broken'):
+        raise ValueError('no text layer')
+    if name.startswith('blank'):
+        return ExtractedText('', 1)
+    return ExtractedText(f'Lecture notes from {name}.', 3)
+
+
+# Extraction runs on pool threads with their own connections, so the rows must really be committed
+@mock.patch('core.uploads.extract_document_text', side_effect=fake_extraction)
+class BatchUploadTests(SearchIndexMixin, SharedCacheMixin, TransactionTestCase):
+    url = '/api/documents/upload/batch/'
+
+    def setUp(self):
+        super().setUp()
+        temporary_directory(self, 'MEDIA_ROOT')
+        self.user = User.objects.create_user('uploader')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, *names, **data):
+        files = [SimpleUploadedFile(name, b'%PDF-1.4 fake', content_type='application/pdf') for name in names]
+        return self.client.post(self.url, {'files': files, **data}, format='multipart')
+
+    def lines(self, response):
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_results_stream_back_as_ndjson(self, extract):
+        with self.assertLogs('core.uploads', 'INFO') as logs:
+            response = self.upload('week1.pdf', 'broken.pdf', 'blank.pdf')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            lines = self.lines(response)
+        self.assertEqual([record.levelname for record in logs.records].count('ERROR'), 1)  # With the traceback
+
+        self.assertEqual(lines[-1], {'done': True, 'total': 3, 'ready': 1, 'empty': 1, 'failed': 1})
+        statuses = {line['index']: line['status'] for line in lines[:-1]}
+        self.assertEqual(statuses, {0: 'ready', 1: 'failed', 2: 'empty'})
+        ready = next(line['document'] for line in lines if line.get('index') == 0)
+        self.assertEqual(ready['title'], 'week1')
+        self.assertEqual(ready['document_type']['name'], 'PDF Document')
+
+        documents = UploadedDocument.objects.filter(user=self.user)
+        self.assertEqual(documents.count(), 3)
+        self.assertEqual(documents.get(title='broken').extraction_error, 'no text layer')
+        self.assertEqual(documents.get(title='week1').extracted_text, 'Lecture notes from week1.pdf.')
+
+    @override_settings(UPLOAD_BATCH_MAX_FILES=2)
+    def test_invalid_batches_create_nothing(self, extract):
+        self.assertEqual(self.upload().status_code, 400)
+        self.assertEqual(self.upload('a.pdf', 'b.pdf', 'c.pdf').status_code, 400)
+        self.assertEqual(self.upload('a.pdf', document_type_id='999').status_code, 400)
+        self.assertFalse(UploadedDocument.objects.exists())
+        extract.assert_not_called()
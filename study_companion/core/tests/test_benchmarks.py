@@ -0,0 +1,30 @@
+import io
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.models import UploadedDocument
+from core.tests.helpers import SharedCacheMixin, SearchIndexMixin
+
+
+class BenchmarkSearchCommandTests(SearchIndexMixin, SharedCacheMixin, TestCase):
+    def benchmark(self, **options):
+        out = io.StringIO()
+        call_command(
+            'benchmark_search', documents=6, words=60, vocabulary=300, queries=8,
+            memory_samples=2, stdout=out, stderr=out, **options,
+        )
+        return out.getvalue()
+
+    def test_reports_every_mode_and_cleans_up(self):
+        output = self.benchmark()
+        for label in ('search (local)', 'search (hybrid)', 'search (model)', 'suggestions'):
+            self.assertIn(label, output)
+        self.assertNotIn('returned', output)  # No request failed
+        self.assertFalse(User.objects.filter(username__startswith='bench_').exists())
+
+    def test_keep_leaves_the_corpus_for_the_next_run(self):
+        self.benchmark(modes=['local'], keep=True)
+        self.assertEqual(UploadedDocument.objects.filter(user__username='bench_42_6').count(), 6)
+        self.assertIn('Reusing corpus', self.benchmark(modes=['local']))
@@ -0,0 +1,61 @@
+import os
+import threading
+
+from django.test import TestCase
+
+from core.cache_backend import SQLiteCache
+from core.tests.helpers import run_in_threads, temporary_directory
+
+
+class SQLiteCacheTests(TestCase):
+    def make_cache(self, **options):
+        location = os.path.join(temporary_directory(self), 'cache.sqlite3')
+        return SQLiteCache(location, {'OPTIONS': options})
+
+    def test_add_only_stores_missing_or_expired_keys(self):
+        backend = self.make_cache()
+        self.assertTrue(backend.add('key', 'first'))
+        self.assertFalse(backend.add('key', 'second'))
+        self.assertEqual(backend.get('key'), 'first')
+
+        backend.set('expired', 'old', timeout=0)
+        self.assertTrue(backend.add('expired', 'new'))
+        self.assertEqual(backend.get('expired'), 'new')
+
+    def test_concurrent_add_has_one_winner(self):
+        backend = self.make_cache()
+        results = run_in_threads(lambda: backend.add('lock', threading.get_ident()), 8)
+        self.assertEqual(results.count(True), 1)
+
+    def test_concurrent_incr_loses_no_updates(self):
+        backend = self.make_cache()
+        backend.add('counter', 0)
+
+        def increment():
+            for _ in range(50):
+                backend.incr('counter')
+
+        run_in_threads(increment, 8)
+        self.assertEqual(backend.get('counter'), 400)
+
+    def test_incr_of_missing_key_raises(self):
+        backend = self.make_cache()
+        with self.assertRaises(ValueError):
+            backend.incr('missing')
+
+    def test_cull_drops_least_recently_used_entries(self):
+        backend = self.make_cache(MAX_ENTRIES=10, CULL_FREQUENCY=2)
+        for index in range(11):
+            backend.set(f'key{index}', index)
+        entries, _ = backend.stats()
+        self.assertEqual(entries, 5)  # Trimmed to half of MAX_ENTRIES, not emptied
+        self.assertIsNone(backend.get('key0'))
+        self.assertEqual(backend.get('key10'), 10)
+
+    def test_compare_and_delete_only_removes_the_expected_value(self):
+        backend = self.make_cache()
+        backend.set('owner', 'token-a')
+        self.assertFalse(backend.compare_and_delete('owner', 'token-b'))
+        self.assertTrue(backend.compare_and_touch('owner', 'token-a', timeout=60))
+        self.assertTrue(backend.compare_and_delete('owner', 'token-a'))
+        self.assertIsNone(backend.get('owner'))
@@ -0,0 +1,100 @@
+import datetime
+import gzip
+import io
+import json
+import unittest
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core import middleware
+from core.middleware import CompressionMiddleware
+from core.renderers import FastJSONParser, FastJSONRenderer
+from core.tests.helpers import SharedCacheMixin, make_document
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = json.dumps({'text': 'Photosynthesis makes glucose. ' * 100}).encode()
+
+    def compress(self, response, accept_encoding='gzip', path='/api/documents/'):
+        request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def json_response(self, body=None):
+        response = HttpResponse(body or self.body, content_type='application/json')
+        response['ETag'] = '"abc"'
+        return response
+
+    def test_large_json_is_gzipped_and_its_etag_weakened(self):
+        response = self.compress(self.json_response())
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    @unittest.skipIf(middleware.brotli is None, 'brotli is not installed')
+    def test_brotli_is_preferred_when_accepted(self):
+        response = self.compress(self.json_response(), 'gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(middleware.brotli.decompress(response.content), self.body)
+
+    def test_responses_left_as_they_are(self):
+        cases = {
+            'small body': (self.json_response(b'{}'), 'gzip', '/api/documents/'),
+            'refused coding': (self.json_response(), 'gzip;q=0', '/api/documents/'),
+            'no accepted coding': (self.json_response(), 'identity', '/api/documents/'),
+            'outside the API': (self.json_response(), 'gzip', '/admin/'),
+            'binary content': (HttpResponse(self.body, content_type='application/pdf'), 'gzip', '/api/documents/'),
+        }
+        for label, (response, accept_encoding, path) in cases.items():
+            with self.subTest(label):
+                response = self.compress(response, accept_encoding, path)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertEqual(response.content, self.body if label != 'small body' else b'{}')
+
+    def test_streaming_responses_are_never_buffered(self):
+        lines = (line for line in [b'{"index": 0}\n'] * 200)
+        response = self.compress(StreamingHttpResponse(lines, content_type='application/json'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(next(iter(response.streaming_content)), b'{"index": 0}\n')
+
+
+class CompressedRevalidationTests(SharedCacheMixin, TestCase):
+    def test_weak_etags_of_compressed_lists_still_revalidate(self):
+        user = User.objects.create_user('compressed')
+        for index in range(10):
+            make_document(user, f'Lecture notes with a long enough title {index}', 'Notes.')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.get('/api/documents/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 10)
+        revalidated = client.get('/api/documents/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+
+class FastJSONTests(SimpleTestCase):
+    def test_output_matches_drf(self):
+        data = {
+            'when': datetime.datetime(2024, 5, 1, 12, 30, 0, 123456, tzinfo=datetime.timezone.utc),
+            'day': datetime.date(2024, 5, 1),
+            'price': Decimal('1.50'), 'text': 'line separator', 'ids': [1, 2], 1: 'numeric key',
+        }
+        self.assertEqual(json.loads(FastJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+        self.assertEqual(json.loads(FastJSONRenderer().render(data))['when'], '2024-05-01T12:30:00.123456Z')
+        self.assertNotIn(b'\xe2\x80\xa8', FastJSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_parser(self):
+        parser = FastJSONParser()
+        self.assertEqual(parser.parse(io.BytesIO('{"query": "ß"}'.encode())), {'query': 'ß'})
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b'{"query": '))
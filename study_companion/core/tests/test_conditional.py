@@ -0,0 +1,53 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import Quiz
+from core.tests.helpers import SharedCacheMixin, make_document
+
+
+class PrivateConditionalTests(SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('revalidator')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.document = make_document(self.user, 'notes', 'Some notes.')
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_documents_are_answered_with_304(self):
+        for url in ('/api/documents/', f'/api/documents/{self.document.pk}/'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('private', response['Cache-Control'])
+                self.assertIn('no-cache', response['Cache-Control'])
+                self.assertIn('Authorization', response['Vary'])
+
+                revalidated = self.revalidate(url, response)
+                self.assertEqual(revalidated.status_code, 304)
+                self.assertEqual(revalidated.content, b'')
+                self.assertIn('private', revalidated['Cache-Control'])
+
+    def test_changes_and_query_parameters_change_the_etag(self):
+        response = self.client.get('/api/documents/')
+        self.assertNotEqual(self.client.get('/api/documents/?fields=id,title')['ETag'], response['ETag'])
+        make_document(self.user, 'more notes', 'More notes.')
+        self.assertEqual(self.revalidate('/api/documents/', response).status_code, 200)
+
+    def test_etags_are_per_user(self):
+        response = self.client.get('/api/documents/')
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('neighbour'))
+        self.assertEqual(other.get('/api/documents/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        self.assertEqual(other.get(f'/api/documents/{self.document.pk}/').status_code, 404)
+
+    def test_quiz_reads_are_revalidated(self):
+        url = f'/api/documents/{self.document.pk}/generate-quiz/'
+        self.assertEqual(self.client.get(url).status_code, 404)
+        Quiz.objects.create(document=self.document, title='Quiz', questions=[])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
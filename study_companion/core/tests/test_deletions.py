@@ -0,0 +1,74 @@
+import os
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from core import deletions
+from core.models import PendingDeletion, UploadedDocument
+from core.tests.helpers import temporary_directory
+
+
+class PendingDeletionTests(TestCase):
+    def setUp(self):
+        temporary_directory(self, 'MEDIA_ROOT')
+
+        self.cleaned = []
+        handlers = mock.patch.object(deletions, '_cleanup_handlers', [self.record_cleanup])
+        handlers.start()
+        self.addCleanup(handlers.stop)
+
+        self.user = User.objects.create_user('deleter')
+        self.document = UploadedDocument.objects.create(
+            user=self.user, title='Doomed', file=SimpleUploadedFile('doomed.txt', b'bye')
+        )
+        self.path = self.document.file.path
+
+    def record_cleanup(self, user_id, document_ids):
+        self.cleaned.append((user_id, document_ids))
+
+    def delete_document(self):
+        document_id = self.document.pk
+        # The worker is only woken once the delete commits
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.document.delete()
+        self.assertEqual(callbacks, [deletions.wake_worker])
+        return document_id
+
+    def test_delete_queues_cleanup_and_keeps_the_file_until_processed(self):
+        document_id = self.delete_document()
+        item = PendingDeletion.objects.get()
+        self.assertEqual((item.user_id, item.document_id), (self.user.pk, document_id))
+        self.assertTrue(os.path.exists(self.path))
+
+        self.assertEqual(deletions.process_pending(), {'cleaned': 1, 'failed': 0})
+        self.assertEqual(self.cleaned, [(self.user.pk, [document_id])])
+        self.assertFalse(os.path.exists(self.path))
+        self.assertFalse(PendingDeletion.objects.exists())
+
+    def test_failed_cleanup_is_retried_later(self):
+        self.delete_document()
+        with mock.patch.object(deletions, '_cleanup_handlers', [mock.Mock(side_effect=OSError('index busy'))]):
+            self.assertEqual(deletions.process_batch(), (0, 1))
+
+        item = PendingDeletion.objects.get()
+        self.assertEqual((item.attempts, item.last_error), (1, 'index busy'))
+        self.assertGreater(item.next_attempt_at, timezone.now())
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(deletions.process_batch(), (0, 0))  # Not due yet
+
+        PendingDeletion.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(deletions.process_batch(), (1, 0))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_rolled_back_deletes_keep_the_document_and_its_file(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.document.delete()
+            raise RuntimeError('request failed')
+        self.assertFalse(PendingDeletion.objects.exists())
+        self.assertTrue(UploadedDocument.objects.filter(title='Doomed').exists())
+        self.assertEqual(deletions.process_pending(), {'cleaned': 0, 'failed': 0})
+        self.assertTrue(os.path.exists(self.path))
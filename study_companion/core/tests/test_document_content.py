@@ -0,0 +1,84 @@
+import hashlib
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+
+from core.models import DocumentContent, UploadedDocument
+from core.tests.helpers import SharedCacheMixin, make_document
+from core.text_codecs import decompress_text
+
+TEXT = 'Photosynthesis converts light into chemical energy. ' * 20
+
+
+class DocumentContentTests(SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('reader')
+
+    def test_identical_text_is_stored_once_and_compressed(self):
+        first = make_document(self.user, 'a', TEXT)
+        copy = make_document(self.user, 'b', TEXT)
+        self.assertEqual(first.content_id, copy.content_id)
+        content = DocumentContent.objects.get()
+        self.assertLess(content.compressed_size, content.length)
+        self.assertEqual(UploadedDocument.objects.get(pk=copy.pk).extracted_text, TEXT)
+
+        first.delete()
+        copy.delete()
+        self.assertFalse(DocumentContent.objects.exists())
+
+    def test_documents_without_text_read_as_empty(self):
+        empty = make_document(self.user, 'scan', '')
+        self.assertEqual(empty.extracted_text, '')
+        self.assertEqual(UploadedDocument.objects.get(pk=empty.pk).extracted_text, '')
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        body = client.get(f'/api/documents/{empty.pk}/').json()
+        self.assertEqual((body['extracted_text'], body['extraction_status']), ('', 'empty'))
+
+
+class ContentMigrationTests(TransactionTestCase):
+    """0012 moves the text column into deduplicated, compressed DocumentContent rows"""
+
+    migrate_from = ('core', '0011_summary')
+    migrate_to = ('core', '0012_documentcontent')
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([target])
+        return executor.loader.project_state([target]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def test_text_moves_into_shared_content_rows_and_back(self):
+        old_apps = self.migrate(self.migrate_from)
+        user = old_apps.get_model('auth', 'User').objects.create(username='migration')
+        OldDocument = old_apps.get_model('core', 'UploadedDocument')
+        first = OldDocument.objects.create(user=user, title='a', file='documents/a.txt', extracted_text=TEXT)
+        copy = OldDocument.objects.create(user=user, title='b', file='documents/b.txt', extracted_text=TEXT)
+        empty = OldDocument.objects.create(user=user, title='c', file='documents/c.png', extracted_text='')
+
+        new_apps = self.migrate(self.migrate_to)
+        Document = new_apps.get_model('core', 'UploadedDocument')
+        first, copy, empty = (Document.objects.get(pk=document.pk) for document in (first, copy, empty))
+        self.assertEqual(first.content_id, copy.content_id)
+        self.assertIsNone(empty.content_id)
+        self.assertEqual(first.text_preview, TEXT[:300])
+
+        content = new_apps.get_model('core', 'DocumentContent').objects.get()
+        # Summaries are looked up by the same hash, so existing Summary rows keep matching
+        self.assertEqual(content.content_hash, hashlib.sha256(TEXT.encode('utf-8')).hexdigest())
+        self.assertEqual(content.content_hash, DocumentContent.hash_text(TEXT))
+        self.assertEqual(decompress_text(content.codec, content.data), TEXT)  # Readable by the app
+
+        old_apps = self.migrate(self.migrate_from)
+        restored = old_apps.get_model('core', 'UploadedDocument').objects.get(pk=copy.pk)
+        self.assertEqual(restored.extracted_text, TEXT)
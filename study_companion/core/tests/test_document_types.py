@@ -0,0 +1,71 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.document_types import DocumentTypeRegistry, registry
+from core.models import DocumentType
+from core.tests.helpers import SharedCacheMixin
+
+
+class DocumentTypeRegistryTests(SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.notes = DocumentType.objects.create(name='Lecture Notes')
+        self.registry = DocumentTypeRegistry()
+
+    def test_rows_are_loaded_once(self):
+        self.assertEqual([doc_type.name for doc_type in self.registry.all()], ['Lecture Notes'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.registry.get(self.notes.pk).name, 'Lecture Notes')
+            self.assertEqual(self.registry.get_by_name('Lecture Notes'), self.notes)
+            self.assertIsNone(self.registry.get(self.notes.pk + 1))
+
+    def test_committed_changes_reload_every_process(self):
+        other_process = DocumentTypeRegistry()
+        for loaded in (self.registry, other_process):
+            loaded.all()
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            DocumentType.objects.create(name='Exam Papers')
+        self.assertEqual(len(self.registry.all()), 1)  # Not committed yet
+
+        for callback in callbacks:
+            callback()
+        for loaded in (self.registry, other_process):
+            self.assertEqual([doc_type.name for doc_type in loaded.all()], ['Exam Papers', 'Lecture Notes'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.notes.delete()
+        self.assertIsNone(other_process.get_by_name('Lecture Notes'))
+
+    def test_extensions_resolve_to_types_created_on_first_use(self):
+        pdf = self.registry.for_extension('PDF')
+        self.assertEqual(pdf.name, 'PDF Document')
+        self.assertEqual(self.registry.for_extension('docx').name, 'Word Document')
+        self.assertEqual(self.registry.for_extension('').name, 'Other Document')
+        self.assertEqual(self.registry.for_extension('pdf'), pdf)
+        self.assertEqual(DocumentType.objects.filter(name='PDF Document').count(), 1)
+
+
+class DocumentTypeViewTests(SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # The module registry outlives tests, and row ids are reused between them
+        registry.invalidate()
+        self.addCleanup(registry.invalidate)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('typist'))
+
+    def names(self):
+        return [doc_type['name'] for doc_type in self.client.get('/api/document-types/').json()]
+
+    def test_listing_follows_created_and_deleted_types(self):
+        self.assertEqual(self.names(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            created = self.client.post('/api/document-types/create/', {'name': 'Lab Reports'}, format='json')
+        self.assertEqual(created.status_code, 201)
+        self.assertEqual(self.names(), ['Lab Reports'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/document-types/{created.json()['id']}/")
+        self.assertEqual(self.names(), [])
@@ -0,0 +1,114 @@
+import zlib
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+
+from core.models import DocumentContent, UploadedDocument
+from core.services import ExtractedText
+from core.tests.helpers import SearchIndexMixin, SharedCacheMixin, make_document
+
+
+class ExtractionStatusTests(SearchIndexMixin, SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('extractor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_status_follows_the_extraction_outcome(self):
+        ready = make_document(self.user, 'notes', 'Some notes.')
+        empty = make_document(self.user, 'scan', '')
+        self.assertEqual((ready.extraction_status, ready.text_length, ready.text_preview), ('ready', 11, 'Some notes.'))
+        self.assertEqual(empty.extraction_status, 'empty')
+
+        ready.mark_extraction_failed('no text layer')
+        ready.save()
+        ready = UploadedDocument.objects.get(pk=ready.pk)
+        self.assertEqual((ready.extraction_status, ready.content_id, ready.text_length), ('failed', None, 0))
+        self.assertEqual(ready.extraction_message, 'Text extraction failed: no text layer')
+        self.assertFalse(DocumentContent.objects.exists())  # The old text went with it
+        self.assertFalse(UploadedDocument.objects.with_text().exists())
+
+    def test_ai_features_refuse_documents_without_text(self):
+        document = make_document(self.user, 'scan', '')
+        response = self.client.post(f'/api/documents/{document.pk}/summarize/')
+        self.assertEqual(response.status_code, 400)
+
+        document.mark_extraction_failed('no text layer')
+        document.save()
+        response = self.client.post(f'/api/documents/{document.pk}/generate-quiz/')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Text extraction failed: no text layer', response.json()['error'])
+
+    @mock.patch('core.views.extract_document_text')
+    def test_retrying_extraction_updates_the_status(self, extract):
+        document = make_document(self.user, 'scan', '')
+        url = f'/api/documents/{document.pk}/retry-extraction/'
+
+        extract.side_effect = ValueError('still no text layer')
+        self.client.post(url)
+        document.refresh_from_db()
+        self.assertEqual((document.extraction_status, document.extraction_error), ('failed', 'still no text layer'))
+
+        extract.side_effect, extract.return_value = None, ExtractedText('Recovered notes.', 2)
+        self.assertTrue(self.client.post(url).json()['success'])
+        document = UploadedDocument.objects.get(pk=document.pk)
+        self.assertEqual((document.extraction_status, document.page_count, document.extraction_error), ('ready', 2, ''))
+        self.assertEqual(document.extracted_text, 'Recovered notes.')
+
+        self.assertEqual(self.client.post(url).json()['message'], 'Text extraction already successful')
+
+
+class ExtractionStatusMigrationTests(TransactionTestCase):
+    """0013 derives the extraction fields from the stored text and moves failure messages out of it"""
+
+    migrate_from = ('core', '0012_documentcontent')
+    migrate_to = ('core', '0013_extraction_status')
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([target])
+        return executor.loader.project_state([target]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def create_document(self, apps, user, title, text):
+        content = None
+        if text:
+            data = zlib.compress(text.encode('utf-8'))
+            content = apps.get_model('core', 'DocumentContent').objects.create(
+                content_hash=DocumentContent.hash_text(text), codec='zlib', data=data,
+                length=len(text), compressed_size=len(data),
+            )
+        return apps.get_model('core', 'UploadedDocument').objects.create(
+            user=user, title=title, file=f'documents/{title}', content=content, text_preview=text[:300]
+        )
+
+    def test_status_is_backfilled_and_restored(self):
+        old_apps = self.migrate(self.migrate_from)
+        user = old_apps.get_model('auth', 'User').objects.create(username='migration')
+        ready = self.create_document(old_apps, user, 'notes.txt', 'Some notes.')
+        failed = self.create_document(old_apps, user, 'scan.pdf', 'Text extraction failed: no text layer')
+        empty = self.create_document(old_apps, user, 'photo.png', '')
+
+        new_apps = self.migrate(self.migrate_to)
+        Document = new_apps.get_model('core', 'UploadedDocument')
+        ready, failed, empty = (Document.objects.get(pk=document.pk) for document in (ready, failed, empty))
+        self.assertEqual((ready.extraction_status, ready.text_length), ('ready', 11))
+        self.assertEqual((failed.extraction_status, failed.extraction_error), ('failed', 'no text layer'))
+        self.assertEqual((failed.content_id, failed.text_preview), (None, ''))
+        self.assertEqual(empty.extraction_status, 'empty')
+        self.assertEqual(new_apps.get_model('core', 'DocumentContent').objects.count(), 1)  # The message row is gone
+
+        old_apps = self.migrate(self.migrate_from)
+        restored = old_apps.get_model('core', 'UploadedDocument').objects.select_related('content').get(pk=failed.pk)
+        self.assertEqual(restored.text_preview, 'Text extraction failed: no text layer')
+        self.assertEqual(zlib.decompress(restored.content.data).decode('utf-8'), 'Text extraction failed: no text layer')
@@ -0,0 +1,71 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from core.artifacts import store_flashcards
+from core.models import DocumentContent, Quiz, Summary
+from core.services import SUMMARY_MODEL, SUMMARY_PROMPT_VERSION
+from core.tests.helpers import SharedCacheMixin, make_document
+
+TEXT = 'Mitochondria are the powerhouse of the cell.'
+
+
+class SparseFieldsetTests(SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('sparse')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.document = make_document(self.user, 'cells', TEXT)
+
+    def add_artifacts(self, document):
+        Quiz.objects.create(document=document, title='Quiz', questions=[{'question': 'What powers the cell?'}])
+        store_flashcards(document, [{'front': 'Powerhouse', 'back': 'Mitochondria'}])
+        Summary.objects.get_or_create(
+            content_hash=DocumentContent.hash_text(TEXT), prompt_version=SUMMARY_PROMPT_VERSION, model=SUMMARY_MODEL,
+            defaults={'text': 'Cells run on mitochondria.'},
+        )
+
+    def test_only_the_requested_fields_are_returned(self):
+        self.assertEqual(self.client.get('/api/documents/?fields=id, title').json(), [{'id': self.document.pk, 'title': 'cells'}])
+        detail = self.client.get(f'/api/documents/{self.document.pk}/?fields=title,extracted_text').json()
+        self.assertEqual(detail, {'title': 'cells', 'extracted_text': TEXT})
+
+    def test_sparse_reads_skip_the_text(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f'/api/documents/{self.document.pk}/?fields=id,title')
+        self.assertFalse([query for query in queries if 'core_documentcontent' in query['sql']])
+
+    def test_unknown_names_are_a_400(self):
+        response = self.client.get('/api/documents/?fields=id,secret&expand=poem')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'fields', 'expand'})
+        self.assertIn('secret', response.json()['fields'])
+        # Write-only fields are not readable either
+        self.assertEqual(self.client.get(f'/api/documents/{self.document.pk}/?fields=document_type_id').status_code, 400)
+
+    def test_expansions_add_the_stored_artifacts(self):
+        self.add_artifacts(self.document)
+        body = self.client.get(f'/api/documents/{self.document.pk}/?fields=id&expand=summary,quiz,flashcards').json()
+        self.assertEqual(body['summary'], {'status': 'ready', 'summary': 'Cells run on mitochondria.'})
+        self.assertEqual(body['quiz']['questions'], [{'question': 'What powers the cell?'}])
+        self.assertEqual(body['flashcards']['flashcards'][0]['back'], 'Mitochondria')
+
+        bare = make_document(self.user, 'scan', '')
+        body = self.client.get(f'/api/documents/{bare.pk}/?expand=summary,quiz').json()
+        self.assertEqual((body['summary']['status'], body['quiz']), ('unavailable', None))
+
+    def test_expanded_lists_need_one_query_per_artifact_kind(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/api/documents/?expand=summary,quiz,flashcards')
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        self.add_artifacts(self.document)
+        baseline = count_queries()
+        for index in range(3):
+            self.add_artifacts(make_document(self.user, f'copy {index}', TEXT))
+        self.assertEqual(count_queries(), baseline)
@@ -0,0 +1,65 @@
+import time
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from core import locks
+from core.locks import LeaseLock, LockTimeout
+from core.tests.helpers import SharedCacheMixin, run_in_threads
+
+
+class LeaseLockTests(SharedCacheMixin, TestCase):
+    def test_lock_is_exclusive_until_released(self):
+        first = LeaseLock('test_lock_1', heartbeat=False)
+        second = LeaseLock('test_lock_1', heartbeat=False)
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        self.assertTrue(first.release())
+        self.assertTrue(second.acquire())
+        second.release()
+
+    def test_expired_lease_can_be_taken_over(self):
+        first = LeaseLock('test_lock_2', lease=1, heartbeat=False)
+        second = LeaseLock('test_lock_2', heartbeat=False)
+        self.assertTrue(first.acquire())
+        time.sleep(1.1)
+        self.assertTrue(second.acquire())
+        # The old owner must not release the new owner's lock
+        self.assertFalse(first.release())
+        self.assertFalse(LeaseLock('test_lock_2', heartbeat=False).acquire())
+        second.release()
+
+    def test_heartbeat_keeps_the_lease_alive(self):
+        lock = LeaseLock('test_lock_3', lease=1)
+        self.assertTrue(lock.acquire())
+        try:
+            time.sleep(1.5)
+            self.assertTrue(lock.held)
+            self.assertFalse(LeaseLock('test_lock_3', heartbeat=False).acquire())
+        finally:
+            lock.release()
+
+    def test_with_block_raises_when_the_lock_is_busy(self):
+        with LeaseLock('test_lock_4', heartbeat=False):
+            with self.assertRaises(LockTimeout):
+                with LeaseLock('test_lock_4', heartbeat=False, wait=0.2):
+                    pass
+        with LeaseLock('test_lock_4', heartbeat=False) as lock:
+            self.assertTrue(lock.held)
+
+    def test_stats_are_shared_through_the_cache(self):
+        locks.reset_lock_stats()
+        holder = LeaseLock('test_lock_5', heartbeat=False)
+        holder.acquire()
+        LeaseLock('test_lock_5', heartbeat=False).acquire()
+        holder.release()
+
+        stats = locks.lock_stats()['test']
+        self.assertEqual((stats['acquired'], stats['contended']), (1, 1))
+        self.assertEqual(cache.get('lock_stats_test_acquired'), 1)
+
+    def test_one_of_many_racing_owners_wins(self):
+        def take():
+            lock = LeaseLock('test_lock_6', heartbeat=False)
+            return lock.acquire()
+        self.assertEqual(run_in_threads(take, 6).count(True), 1)
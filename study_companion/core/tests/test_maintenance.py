@@ -0,0 +1,87 @@
+import io
+import os
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import maintenance
+from core.locks import LeaseLock
+from core.models import QuestionAnswer, TemporaryUser
+from core.tests.helpers import SharedCacheMixin, make_document, temporary_directory
+
+
+@override_settings(MAINTENANCE_BATCH_PAUSE_SECONDS=0)
+class MaintenanceTaskTests(SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('maintained')
+
+    @override_settings(QA_CACHE_MAX_AGE_DAYS=30, QA_CACHE_MAX_ENTRIES_PER_DOCUMENT=2)
+    def test_qa_cache_drops_old_answers_and_each_documents_overflow(self):
+        document = make_document(self.user, 'notes', 'Some notes.')
+        for index in range(5):
+            QuestionAnswer.objects.create(document=document, question_hash=str(index), question='q', answer='a')
+        QuestionAnswer.objects.filter(question_hash='4').update(created_at=timezone.now() - timedelta(days=31))
+
+        self.assertEqual(maintenance.purge_qa_cache(batch_size=2), {'expired': 1, 'evicted': 2})
+        self.assertEqual(set(QuestionAnswer.objects.values_list('question_hash', flat=True)), {'2', '3'})
+
+    @override_settings(TEMPORARY_USER_RETENTION_HOURS=1)
+    def test_expired_signups_are_purged(self):
+        for name in ('stale', 'pending'):
+            TemporaryUser.objects.create(username=name, email=f'{name}@example.com', password='x', otp='123456')
+        TemporaryUser.objects.filter(username='stale').update(created_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(maintenance.purge_temporary_users(), {'expired': 1})
+        self.assertEqual(list(TemporaryUser.objects.values_list('username', flat=True)), ['pending'])
+
+    @override_settings(MEDIA_ORPHAN_GRACE_HOURS=1)
+    def test_media_reconciliation(self):
+        root = temporary_directory(self, 'MEDIA_ROOT')
+        os.makedirs(os.path.join(root, 'documents', 'nested'))
+        old = time.time() - 7200
+        for name, modified in (('kept.txt', old), ('orphan.txt', old), ('nested/orphan.txt', old), ('uploading.txt', None)):
+            path = os.path.join(root, 'documents', name)
+            with open(path, 'w') as file:
+                file.write('text')
+            if modified:
+                os.utime(path, (modified, modified))
+        make_document(self.user, 'kept', 'Some notes.')  # documents/kept.txt
+        make_document(self.user, 'gone', 'Some notes.')  # Its file was never written
+
+        with self.assertLogs('core.maintenance', 'WARNING'):
+            self.assertEqual(maintenance.reconcile_media(dry_run=True), {'files': 4, 'orphaned': 2, 'missing': 1})
+        self.assertTrue(os.path.exists(os.path.join(root, 'documents', 'orphan.txt')))
+
+        with self.assertLogs('core.maintenance', 'WARNING'):
+            maintenance.reconcile_media(batch_size=1)
+        remaining = sorted(os.listdir(os.path.join(root, 'documents')))
+        self.assertEqual(remaining, ['kept.txt', 'nested', 'uploading.txt'])
+        self.assertEqual(os.listdir(os.path.join(root, 'documents', 'nested')), [])
+
+    def test_tasks_already_running_elsewhere_are_skipped(self):
+        with LeaseLock('maintenance_lock_temporary_users', heartbeat=False):
+            self.assertIsNone(maintenance.run_task('temporary_users'))
+        self.assertEqual(maintenance.run_task('temporary_users'), {'expired': 0})
+
+    def test_scheduled_tasks_run_once_per_interval_across_workers(self):
+        task = mock.Mock(return_value={})
+        with mock.patch.dict(maintenance.TASKS, {'temporary_users': task}):
+            for _ in range(2):  # Two workers, or two passes of one
+                stop = threading.Event()
+                with mock.patch.object(stop, 'wait', side_effect=lambda timeout: stop.set()):
+                    maintenance.run_scheduler({'temporary_users': 3600}, stop)
+        task.assert_called_once_with()
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('run_maintenance', 'qa_cache', 'temporary_users', stdout=out)
+        self.assertIn('qa_cache: expired=0, evicted=0', out.getvalue())
+        self.assertIn('temporary_users: expired=0', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('run_maintenance', 'everything')
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import UploadedDocument
+from core.tests.helpers import SharedCacheMixin, make_document
+
+
+class DocumentCursorPaginationTests(SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('pager')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        now = timezone.now()
+        for index in range(5):
+            document = make_document(self.user, f'notes {index}', f'Notes number {index}.')
+            UploadedDocument.objects.filter(pk=document.pk).update(uploaded_at=now - timedelta(minutes=index))
+        # Same upload time: the id breaks the tie
+        tied = make_document(self.user, 'notes tied', 'Tied notes.')
+        UploadedDocument.objects.filter(pk=tied.pk).update(uploaded_at=now - timedelta(minutes=4))
+
+    def titles(self, results):
+        return [document['title'] for document in results]
+
+    def test_without_paging_parameters_the_full_array_is_returned(self):
+        body = self.client.get('/api/documents/').json()
+        self.assertIsInstance(body, list)
+        self.assertEqual(len(body), 6)
+
+    def test_cursor_pages_walk_every_document_once(self):
+        body = self.client.get('/api/documents/?page_size=2').json()
+        pages = [self.titles(body['results'])]
+        self.assertIsNone(body['previous'])
+        while body['next']:
+            body = self.client.get(body['next']).json()
+            pages.append(self.titles(body['results']))
+        self.assertEqual(pages, [['notes 0', 'notes 1'], ['notes 2', 'notes 3'], ['notes tied', 'notes 4']])
+
+        previous = self.client.get(body['previous']).json()
+        self.assertEqual(self.titles(previous['results']), ['notes 2', 'notes 3'])
+
+    def test_page_size_is_capped(self):
+        body = self.client.get('/api/documents/?page_size=1000').json()
+        self.assertEqual(len(body['results']), 6)
+
+    def test_sparse_pages_load_the_cursor_columns_with_the_rows(self):
+        first = self.client.get('/api/documents/?page_size=2&fields=title').json()
+        self.assertEqual(first['results'], [{'title': 'notes 0'}, {'title': 'notes 1'}])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(first['next'])
+        self.assertEqual(response.json()['results'], [{'title': 'notes 2'}, {'title': 'notes 3'}])
+        document_queries = [query for query in queries if 'FROM "core_uploadeddocument"' in query['sql']]
+        # The ETag aggregate and the page itself; no per-row reload of uploaded_at
+        self.assertEqual(len(document_queries), 2)
@@ -0,0 +1,68 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.middleware import SlidingWindowRateLimiter
+from core.tests.helpers import SharedCacheMixin, SearchIndexMixin
+
+
+class SlidingWindowRateLimiterTests(SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.limiter = SlidingWindowRateLimiter(limit=3, window=60, prefix='test_limit')
+        self.window_start = 6000.0  # A multiple of the window
+
+    def test_hits_count_down_to_the_limit(self):
+        now = self.window_start
+        self.assertEqual(self.limiter.remaining(1, now=now), 3)
+        self.assertEqual([self.limiter.hit(1, now=now).remaining for _ in range(3)], [2, 1, 0])
+
+        rejected = self.limiter.hit(1, now=now)
+        self.assertFalse(rejected.allowed)
+        self.assertGreaterEqual(rejected.retry_after, 1)
+        self.assertEqual(self.limiter.remaining(1, now=now), 0)
+        self.assertEqual(self.limiter.remaining(2, now=now), 3)  # Limits are per identity
+
+    def test_rejected_hits_do_not_consume_quota(self):
+        for _ in range(5):
+            self.limiter.hit(1, now=self.window_start)
+        self.assertEqual(cache.get(f'test_limit_1_{int(self.window_start // 60)}'), 3)
+
+    def test_previous_window_is_weighted_by_its_overlap(self):
+        for _ in range(3):
+            self.limiter.hit(1, now=self.window_start)
+        halfway = self.window_start + 90  # Half of the previous window still overlaps
+        self.assertEqual(self.limiter.remaining(1, now=halfway), 1)
+        self.assertTrue(self.limiter.hit(1, now=halfway).allowed)
+        self.assertFalse(self.limiter.hit(1, now=halfway).allowed)
+
+
+@override_settings(API_RATE_LIMIT=2)
+class APIUsageMonitoringMiddlewareTests(SearchIndexMixin, SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('limited')
+        self.client = APIClient()  # Created after the override, so the middleware sees the lower limit
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user).key}")
+
+    def search(self):
+        return self.client.post('/api/documents/search/', {'query': 'photosynthesis', 'mode': 'local'}, format='json')
+
+    def test_token_users_are_limited_on_ai_routes(self):
+        first, second, rejected = self.search(), self.search(), self.search()
+        self.assertEqual([first.status_code, second.status_code], [200, 200])
+        self.assertEqual(first['X-RateLimit-Limit'], '2')
+        self.assertEqual([first['X-RateLimit-Remaining'], second['X-RateLimit-Remaining']], ['1', '0'])
+
+        self.assertEqual(rejected.status_code, 429)
+        self.assertGreaterEqual(int(rejected['Retry-After']), 1)
+        self.assertEqual(rejected.json()['retry_after'], int(rejected['Retry-After']))
+
+    def test_other_routes_are_not_counted(self):
+        for _ in range(3):
+            response = self.client.get('/api/documents/')
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('X-RateLimit-Remaining', response)
+        self.assertEqual(self.search()['X-RateLimit-Remaining'], '1')
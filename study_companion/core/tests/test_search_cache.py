@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import CorpusVersion, SearchCache
+from core.tests.helpers import SharedCacheMixin, SearchIndexMixin, make_document
+from core.tests.test_search_index import BIOLOGY, HISTORY
+from core.uploads import refresh_document_indexes
+
+
+class CorpusVersionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('versioned')
+
+    def store(self, query_hash, version=None):
+        version = CorpusVersion.current(self.user.pk) if version is None else version
+        SearchCache.objects.store(self.user, query_hash, 'query', {'results': []}, version)
+
+    def test_document_changes_bump_the_version_and_drop_cached_searches(self):
+        self.assertEqual(CorpusVersion.current(self.user.pk), 0)
+        document = make_document(self.user, 'notes', 'Some notes.')
+        self.assertEqual(CorpusVersion.current(self.user.pk), 1)
+
+        self.store('a' * 64)
+        self.assertIsNotNone(SearchCache.objects.lookup(self.user, 'a' * 64, 1))
+        document.delete()
+        self.assertEqual(CorpusVersion.current(self.user.pk), 2)
+        self.assertFalse(SearchCache.objects.exists())
+
+    def test_results_of_another_version_are_never_served(self):
+        self.store('b' * 64, version=3)
+        self.assertIsNone(SearchCache.objects.lookup(self.user, 'b' * 64, 4))
+        self.assertIsNotNone(SearchCache.objects.lookup(self.user, 'b' * 64, 3))
+
+    def test_expired_results_are_not_served(self):
+        self.store('c' * 64)
+        SearchCache.objects.update(created_at=timezone.now() - timedelta(hours=25))
+        self.assertIsNone(SearchCache.objects.lookup(self.user, 'c' * 64, 0, max_age_hours=24))
+
+    @override_settings(SEARCH_CACHE_MAX_ENTRIES_PER_USER=2)
+    def test_least_recently_used_rows_are_evicted(self):
+        for index, query_hash in enumerate('def'):
+            self.store(query_hash * 64)
+            SearchCache.objects.filter(query_hash=query_hash * 64).update(last_used_at=timezone.now() + timedelta(seconds=index))
+        self.assertEqual(sorted(SearchCache.objects.values_list('query_hash', flat=True)), ['e' * 64, 'f' * 64])
+
+    def test_sweep_deletes_expired_and_outdated_rows(self):
+        make_document(self.user, 'notes', 'Some notes.')  # Version 1
+        self.store('g' * 64)
+        self.store('h' * 64, version=0)
+        self.store('i' * 64)
+        SearchCache.objects.filter(query_hash='i' * 64).update(created_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(SearchCache.objects.sweep(), 2)
+        self.assertEqual(list(SearchCache.objects.values_list('query_hash', flat=True)), ['g' * 64])
+
+
+class SearchCacheViewTests(SearchIndexMixin, SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('cached')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        refresh_document_indexes(make_document(self.user, 'biology', BIOLOGY))
+
+    def search(self):
+        return self.client.post('/api/documents/search/', {'query': 'Glucose and chlorophyll', 'mode': 'local'}, format='json').json()
+
+    def test_repeated_searches_are_cached_until_the_corpus_changes(self):
+        first = self.search()
+        self.assertIn('recall_ms', first['timings'])
+        cached = self.search()
+        self.assertIn('cache_ms', cached['timings'])
+        self.assertEqual(cached['query'], 'Glucose and chlorophyll')
+        self.assertEqual(cached['results'], first['results'])
+
+        refresh_document_indexes(make_document(self.user, 'history', HISTORY))
+        self.assertIn('recall_ms', self.search()['timings'])
@@ -0,0 +1,83 @@
+import os
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from core import search_index
+from core.tests.helpers import SearchIndexMixin, make_document
+
+BIOLOGY = (
+    "Photosynthesis takes place in the chloroplasts of plant cells. Chlorophyll absorbs "
+    "light energy, which drives the conversion of carbon dioxide and water into glucose. "
+) * 10
+HISTORY = (
+    "The French Revolution began in 1789 with the storming of the Bastille. The monarchy "
+    "was abolished and the republic declared, ending centuries of absolute rule. "
+) * 10
+
+
+class ChunkTextTests(TestCase):
+    def test_spans_cover_the_text_with_overlap_on_word_boundaries(self):
+        text = ' '.join(f"word{index}" for index in range(400))
+        spans = search_index.chunk_text(text, size=200, overlap=50)
+
+        self.assertEqual(spans[0][0], 0)
+        self.assertEqual(spans[-1][1], len(text))
+        for (start, end), (next_start, _) in zip(spans, spans[1:]):
+            self.assertLessEqual(end - start, 200)
+            self.assertLess(next_start, end)  # Consecutive chunks overlap
+            self.assertEqual(text[next_start - 1], ' ')  # and start at a word
+            self.assertEqual(text[end], ' ')  # and end before a space
+
+    def test_short_and_empty_text(self):
+        self.assertEqual(search_index.chunk_text('just a few words'), [(0, 16)])
+        self.assertEqual(search_index.chunk_text(''), [])
+
+
+class SearchIndexTests(SearchIndexMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('indexer')
+        self.biology = make_document(self.user, 'biology', BIOLOGY)
+        self.history = make_document(self.user, 'history', HISTORY)
+        search_index.index_document(self.biology)
+        search_index.index_document(self.history)
+
+    def test_search_ranks_the_matching_document_first(self):
+        hits = search_index.search(self.user.pk, 'how do chloroplasts turn light into glucose')
+        self.assertEqual(hits[0].document_id, self.biology.pk)
+        self.assertEqual([hit.score for hit in hits], sorted((hit.score for hit in hits), reverse=True))
+
+        candidates = search_index.recall_candidates(self.user.pk, 'storming of the bastille')
+        self.assertEqual(candidates[0]['document_id'], str(self.history.pk))
+        self.assertEqual(candidates[0]['relevance_score'], 10)
+        self.assertIn('Bastille', candidates[0]['text'])
+
+    def test_indexes_are_per_user(self):
+        other = User.objects.create_user('other')
+        self.assertEqual(search_index.search(other.pk, 'photosynthesis'), [])
+
+    def test_reindexing_without_text_drops_the_document(self):
+        self.biology.mark_extraction_failed('unreadable')
+        self.biology.save()
+        search_index.index_document(self.biology)
+        document_ids = {hit.document_id for hit in search_index.search(self.user.pk, 'photosynthesis chlorophyll glucose')}
+        self.assertNotIn(self.biology.pk, document_ids)
+
+    def test_remove_documents(self):
+        search_index.remove_documents(self.user.pk, [self.history.pk])
+        index = search_index.load_user_index(self.user.pk)
+        self.assertEqual(set(index['document_id']), {self.biology.pk})
+
+        search_index.remove_documents(self.user.pk, [self.biology.pk])
+        self.assertIsNone(search_index.load_user_index(self.user.pk))
+
+    def test_remove_deleted_user_only_removes_indexes_of_deleted_accounts(self):
+        directory = search_index.user_index_dir(self.user.pk)
+        search_index.remove_deleted_user(self.user.pk, [self.biology.pk])
+        self.assertTrue(os.path.isdir(directory))
+
+        user_id = self.user.pk
+        self.user.delete()
+        search_index.remove_deleted_user(user_id, [self.biology.pk, self.history.pk])
+        self.assertFalse(os.path.exists(directory))
@@ -0,0 +1,64 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.tests.helpers import SharedCacheMixin, SearchIndexMixin, make_document
+from core.tests.test_search_index import BIOLOGY, HISTORY
+from core.uploads import refresh_document_indexes
+
+
+class SmartSearchViewTests(SearchIndexMixin, SharedCacheMixin, TestCase):
+    url = '/api/documents/search/'
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('searcher')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.biology = make_document(self.user, 'biology', BIOLOGY)
+        self.history = make_document(self.user, 'history', HISTORY)
+        for document in (self.biology, self.history):
+            refresh_document_indexes(document)
+
+    def search(self, query, mode):
+        return self.client.post(self.url, {'query': query, 'mode': mode}, format='json')
+
+    @mock.patch('core.views.smart_search_documents')
+    @mock.patch('core.views.rerank_search_candidates')
+    def test_local_mode_never_calls_the_model(self, rerank, model_search):
+        response = self.search('chloroplasts and chlorophyll', 'local')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['mode'], 'local')
+        self.assertEqual(body['results'][0]['document_id'], str(self.biology.pk))
+        self.assertEqual(body['results'][0]['document_url'], f"/documents/{self.biology.pk}/")
+        rerank.assert_not_called()
+        model_search.assert_not_called()
+
+    @mock.patch('core.views.smart_search_documents')
+    @mock.patch('core.views.rerank_search_candidates')
+    def test_hybrid_mode_reranks_only_the_recalled_chunks(self, rerank, model_search):
+        rerank.return_value = {'results': [], 'total_found': 0, 'search_summary': 'reranked'}
+        response = self.search('the French monarchy and the Bastille', 'hybrid')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['search_summary'], 'reranked')
+
+        candidates, query = rerank.call_args.args
+        self.assertEqual(candidates[0]['document_id'], str(self.history.pk))
+        self.assertTrue(all(len(candidate['text']) <= 800 for candidate in candidates))  # Chunks, not documents
+        self.assertIn('timings', response.json())
+        model_search.assert_not_called()
+
+    @mock.patch('core.views.smart_search_documents')
+    @mock.patch('core.views.rerank_search_candidates')
+    def test_hybrid_mode_without_recalled_candidates_uses_model_search(self, rerank, model_search):
+        model_search.return_value = {'results': [], 'total_found': 0, 'search_summary': 'model'}
+        response = self.search('quantum entanglement', 'hybrid')
+        self.assertEqual(response.json()['search_summary'], 'model')
+        rerank.assert_not_called()
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.search('ab', 'local').status_code, 400)
+        self.assertEqual(self.search('photosynthesis', 'psychic').status_code, 400)
@@ -0,0 +1,101 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core import sqlite
+from core.models import CorpusVersion, SearchCache
+from core.tests.helpers import SearchIndexMixin, make_document
+from core.uploads import refresh_document_indexes
+
+
+def locked_then(result, failures=1):
+    """A callable that finds the database locked `failures` times, then returns result"""
+    calls = []
+
+    def write():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise OperationalError('database is locked')
+        return result
+    write.calls = calls
+    return write
+
+
+@override_settings(SQLITE_WRITE_ATTEMPTS=3)
+@mock.patch('core.sqlite.time.sleep')
+class RetryOnLockedTests(TransactionTestCase):
+    # Not TestCase: its per-test transaction would make every write run only once
+    def test_locked_writes_are_retried_with_backoff(self, sleep):
+        write = locked_then('written', failures=2)
+        with self.assertLogs('core.sqlite', 'WARNING'):
+            self.assertEqual(sqlite.retry_on_locked(write)(), 'written')
+        self.assertEqual((len(write.calls), sleep.call_count), (3, 2))
+
+    def test_gives_up_after_the_configured_attempts(self, sleep):
+        write = locked_then('written', failures=3)
+        with self.assertLogs('core.sqlite', 'WARNING'), self.assertRaises(OperationalError):
+            sqlite.retry_on_locked(write)()
+        self.assertEqual(len(write.calls), 3)
+
+    def test_other_errors_and_writes_inside_transactions_are_not_retried(self, sleep):
+        def broken():
+            raise OperationalError('no such table: core_missing')
+        with self.assertRaises(OperationalError):
+            sqlite.retry_on_locked(broken)()
+
+        write = locked_then('written')
+        with transaction.atomic(), self.assertRaises(OperationalError):
+            sqlite.retry_on_locked(write)()  # The transaction is aborted; only its owner can retry
+        self.assertEqual(len(write.calls), 1)
+        sleep.assert_not_called()
+
+
+class CorpusVersionRetryTests(SearchIndexMixin, TransactionTestCase):
+    @mock.patch('core.sqlite.time.sleep')
+    def test_reindexing_retries_a_locked_version_bump(self, sleep):
+        user = User.objects.create_user('retried')
+        document = make_document(user, 'notes', 'Some notes.')  # Version 1
+        SearchCache.objects.store(user, 'a' * 64, 'query', {'results': []}, 1)
+
+        original = CorpusVersion.objects.filter
+        failures = [OperationalError('database is locked')]
+
+        def filter(*args, **kwargs):
+            if failures:
+                raise failures.pop()
+            return original(*args, **kwargs)
+
+        with mock.patch.object(CorpusVersion.objects, 'filter', side_effect=filter), self.assertLogs('core.sqlite', 'WARNING'):
+            refresh_document_indexes(document)
+        self.assertEqual(CorpusVersion.current(user.pk), 2)
+        self.assertFalse(SearchCache.objects.exists())
+
+
+class BatchedDeleteTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(f'cached{index}') for index in range(3)]
+        for user in self.users:
+            for index in range(5):
+                SearchCache.objects.create(user=user, query_hash=f'{index}' * 64, query='q', results={}, corpus_version=0)
+
+    def test_delete_in_batches_removes_every_row(self):
+        queryset = SearchCache.objects.filter(user__in=self.users[:2])
+        self.assertEqual(sqlite.delete_in_batches(queryset, batch_size=3), 10)
+        self.assertEqual(SearchCache.objects.count(), 5)
+
+    def test_delete_overflow_keeps_the_first_rows_of_each_group(self):
+        deleted = sqlite.delete_overflow(SearchCache.objects.all(), 'user', keep=2, ordering=['-query_hash'], batch_size=2)
+        self.assertEqual(deleted, 9)
+        for user in self.users:
+            self.assertEqual(
+                sorted(SearchCache.objects.filter(user=user).values_list('query_hash', flat=True)), ['3' * 64, '4' * 64]
+            )
+
+    def test_connections_use_the_configured_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+            cursor.execute('PRAGMA foreign_keys')
+            self.assertEqual(cursor.fetchone()[0], 1)
@@ -0,0 +1,62 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core import vocabulary
+from core.tests.helpers import SharedCacheMixin, SearchIndexMixin, make_document
+
+GENETICS = "Mitosis and meiosis. Mitosis copies the cell. Mitosis again, then mitosis. Cell division ends. Cell division restarts."
+
+
+class VocabularySuggestTests(SearchIndexMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('suggester')
+        self.document = make_document(self.user, 'Genetics_Notes.pdf', GENETICS)
+        vocabulary.index_document(self.document)
+
+    def test_prefix_matches_ordered_by_weight(self):
+        self.assertEqual(vocabulary.suggest(self.user.pk, 'mi'), ['mitosis'])
+        self.assertEqual(vocabulary.suggest(self.user.pk, 'M'), ['mitosis', 'meiosis'])
+        self.assertEqual(vocabulary.suggest(self.user.pk, 'm', limit=1), ['mitosis'])
+        self.assertEqual(vocabulary.suggest(self.user.pk, 'x'), [])
+        self.assertEqual(vocabulary.suggest(self.user.pk, '   '), [])
+
+    def test_titles_and_repeated_phrases_are_suggested(self):
+        self.assertIn('genetics notes', vocabulary.suggest(self.user.pk, 'gen'))
+        self.assertIn('cell division', vocabulary.suggest(self.user.pk, 'cell '))
+
+    def test_removed_documents_leave_the_vocabulary(self):
+        vocabulary.remove_documents(self.user.pk, [self.document.pk])
+        self.assertEqual(vocabulary.suggest(self.user.pk, 'm'), [])
+
+
+class SearchSuggestionsViewTests(SearchIndexMixin, SharedCacheMixin, TestCase):
+    url = '/api/documents/search/suggestions/'
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('typer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        vocabulary.index_document(make_document(self.user, 'genetics', GENETICS))
+
+    def suggest(self, query, **extra):
+        return self.client.post(self.url, {'query': query, **extra}, format='json').json()['suggestions']
+
+    @mock.patch('core.views.generate_search_suggestions')
+    def test_local_suggestions_need_no_model_call(self, generate):
+        self.assertEqual(self.suggest('mit'), ['mitosis'])
+        for enrich in (False, 'false', '0', 'no', ''):
+            with self.subTest(enrich=enrich):
+                self.assertEqual(self.suggest('mit', enrich=enrich), ['mitosis'])
+        generate.assert_not_called()
+
+    @mock.patch('core.views.generate_search_suggestions', return_value=['mitochondria', 'mitosis'])
+    def test_enrichment_merges_model_suggestions(self, generate):
+        for enrich in (True, 'true', '1', 'yes'):
+            with self.subTest(enrich=enrich):
+                self.assertEqual(self.suggest('mit', enrich=enrich), ['mitosis', 'mitochondria'])
+        generate.assert_called_once()  # Later requests are served from the cache
@@ -0,0 +1,68 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from core import summaries
+from core.models import DocumentContent, Summary, UploadedDocument
+from core.tests.helpers import SharedCacheMixin, make_document
+from core.tiered_cache import summary_cache
+
+TEXT = "Photosynthesis turns light, water and carbon dioxide into glucose and oxygen."
+
+
+class SummaryTests(SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # The local tier lives in this process, across tests
+        summary_cache._local.clear()
+        self.addCleanup(summary_cache._local.clear)
+        self.user = User.objects.create_user('summarizer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def summarize(self, document):
+        return self.client.post(f'/api/documents/{document.pk}/summarize/')
+
+    @mock.patch('core.summaries.get_gemini_summary', return_value='A short summary.')
+    def test_identical_text_shares_one_stored_summary(self, generate):
+        first = make_document(self.user, 'notes', TEXT)
+        copy = make_document(User.objects.create_user('classmate'), 'copy', TEXT)
+        self.assertEqual(summaries.store_document_summary(first), ('A short summary.', True))
+
+        summary_cache._local.clear()
+        summary_cache.invalidate(summaries.summary_key(first.content.content_hash))  # Only the table is left
+        self.assertEqual(summaries.store_document_summary(copy), ('A short summary.', False))
+        self.assertEqual(summaries.get_summary(TEXT), 'A short summary.')
+        generate.assert_called_once_with(TEXT)
+        self.assertEqual(Summary.objects.get().content_hash, DocumentContent.hash_text(TEXT))
+
+    @mock.patch('core.summaries.get_gemini_summary', return_value='A short summary.')
+    def test_stored_summaries_are_found_without_reading_the_text(self, generate):
+        document = make_document(self.user, 'notes', TEXT)
+        self.assertEqual(self.summarize(document).json(), {'summary': 'A short summary.'})
+        summary_cache._local.clear()
+        summary_cache.invalidate(summaries.summary_key(document.content.content_hash))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.summarize(document).json(), {'summary': 'A short summary.'})
+        self.assertFalse([query for query in queries if '"core_documentcontent"."data"' in query['sql']])
+
+        # Documents loaded without their content row look the hash up on its own
+        plain = UploadedDocument.objects.get(pk=document.pk)
+        with CaptureQueriesContext(connection) as queries:
+            summaries.get_document_summary(plain)
+        self.assertFalse([query for query in queries if '"core_documentcontent"."data"' in query['sql']])
+        generate.assert_called_once()
+
+    def test_fallback_summaries_are_never_stored(self):
+        document = make_document(self.user, 'notes', TEXT)  # No model configured in tests
+        summary, created = summaries.store_document_summary(document)
+        self.assertFalse(created)
+        self.assertTrue(summaries.is_fallback_summary(summary))
+        self.assertFalse(Summary.objects.exists())
+        self.assertIsNone(cache.get(summary_cache._shared_key(summaries.summary_key(document.content.content_hash))))
@@ -0,0 +1,87 @@
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import TestCase
+
+from core.locks import LeaseLock
+from core.tests.helpers import SharedCacheMixin
+from core.tiered_cache import CacheBusy, TieredCache
+
+
+class TieredCacheTests(SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.tiered = TieredCache('test', ttl=60, stale_ttl=60, beta=0, wait=0.3)
+        self.calls = []
+
+    def compute(self, value='fresh'):
+        def compute():
+            self.calls.append(value)
+            return value
+        return compute
+
+    def store_expired(self, key, value):
+        cache.set(self.tiered._shared_key(key), {'value': value, 'expires_at': time.time() - 1, 'delta': 0.1}, timeout=60)
+
+    def wait_for_refreshes(self):
+        for thread in threading.enumerate():
+            if thread.name.startswith('refresh-test-'):
+                thread.join(5)
+
+    def test_values_are_computed_once_then_read_from_each_tier(self):
+        self.assertEqual(self.tiered.get_or_compute('key', self.compute()), ('fresh', 'computed'))
+        self.assertEqual(self.tiered.get_or_compute('key', self.compute()), ('fresh', 'local'))
+        other_worker = TieredCache('test', ttl=60, stale_ttl=60, beta=0)
+        self.assertEqual(other_worker.get_or_compute('key', self.compute()), ('fresh', 'shared'))
+        self.assertEqual(self.calls, ['fresh'])
+
+        stats = self.tiered.stats()
+        self.assertEqual((stats['miss'], stats['local_hit'], stats['lookups']), (1, 1, 2))
+
+    def test_uncacheable_values_are_returned_but_not_stored(self):
+        for _ in range(2):
+            value, source = self.tiered.get_or_compute('key', self.compute('fallback'), cacheable=lambda value: False)
+            self.assertEqual((value, source), ('fallback', 'computed'))
+        self.assertEqual(self.calls, ['fallback', 'fallback'])
+        self.assertIsNone(cache.get(self.tiered._shared_key('key')))
+
+    def test_stale_values_are_served_while_one_refresh_runs(self):
+        self.store_expired('key', 'old')
+        self.assertEqual(self.tiered.get_or_compute('key', self.compute()), ('old', 'stale'))
+        self.wait_for_refreshes()
+        self.assertEqual(self.calls, ['fresh'])
+        self.assertEqual(self.tiered.get_or_compute('key', self.compute())[0], 'fresh')
+
+    def test_stale_values_are_not_refreshed_by_a_second_worker(self):
+        self.store_expired('key', 'old')
+        with LeaseLock('test_lock_key', heartbeat=False):  # Another worker is refreshing
+            self.assertEqual(self.tiered.get_or_compute('key', self.compute()), ('old', 'stale'))
+        self.assertEqual(self.calls, [])
+
+    def test_a_failed_refresh_keeps_the_stale_value(self):
+        self.store_expired('key', 'old')
+
+        def failing():
+            raise RuntimeError('model unavailable')
+
+        with self.assertLogs('core.tiered_cache', 'WARNING'):
+            self.tiered.get_or_compute('key', failing)
+            self.wait_for_refreshes()
+        self.assertEqual(self.tiered.get_or_compute('key', self.compute()), ('old', 'stale'))
+
+    def test_cold_misses_wait_for_the_worker_computing_the_value(self):
+        with LeaseLock('test_lock_key', heartbeat=False):
+            with self.assertRaises(CacheBusy):
+                self.tiered.get_or_compute('key', self.compute())
+        self.assertEqual(self.calls, [])
+
+    def test_async_misses_await_the_computation(self):
+        async def acompute():
+            return 'async'
+
+        get = async_to_sync(self.tiered.aget_or_compute)
+        self.assertEqual(get('key', self.compute(), acompute), ('async', 'computed'))
+        self.assertEqual(get('key', self.compute(), acompute), ('async', 'local'))
+        self.assertEqual(self.calls, [])
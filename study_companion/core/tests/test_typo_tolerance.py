@@ -0,0 +1,73 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core import vocabulary
+from core.tests.helpers import SharedCacheMixin, SearchIndexMixin, make_document
+from core.tests.test_search_index import BIOLOGY
+from core.uploads import refresh_document_indexes
+
+LINEAR_ALGEBRA = "Every eigenvector of the matrix has an eigenvalue. The eigenvector is scaled by its eigenvalue."
+
+
+class EditDistanceTests(TestCase):
+    def test_distances(self):
+        self.assertEqual(vocabulary.edit_distance('kitten', 'sitting', 3), 3)
+        self.assertEqual(vocabulary.edit_distance('same', 'same', 1), 0)
+        self.assertEqual(vocabulary.edit_distance('abcd', 'abdc', 2), 1)  # A transposition is one edit
+
+    def test_stops_once_the_bound_is_exceeded(self):
+        self.assertEqual(vocabulary.edit_distance('abc', 'xyzxyz', 1), 2)
+        self.assertEqual(vocabulary.edit_distance('abcdef', 'uvwxyz', 2), 3)
+
+
+class CorrectQueryTests(SearchIndexMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('speller')
+        for title, text in (('biology', BIOLOGY), ('algebra', LINEAR_ALGEBRA)):
+            vocabulary.index_document(make_document(self.user, title, text))
+
+    def correct(self, query):
+        return vocabulary.correct_query(self.user.pk, query)
+
+    def test_misspelled_terms_are_replaced_by_known_terms(self):
+        self.assertEqual(self.correct('Photosinthesis in CHLOROPLATS'), 'photosynthesis in chloroplasts')
+        self.assertEqual(self.correct('chlorophyl'), 'chlorophyll')
+
+    def test_split_compounds_are_joined(self):
+        self.assertEqual(self.correct('eigen vector'), 'eigenvector')
+
+    def test_known_short_and_unknown_terms_are_kept(self):
+        self.assertEqual(self.correct('  glucose   water '), 'glucose water')
+        self.assertEqual(self.correct('cels'), 'cels')  # Too short to correct safely
+        self.assertEqual(self.correct('thermodynamics'), 'thermodynamics')
+
+    def test_a_user_without_vocabulary_gets_the_normalized_query(self):
+        other = User.objects.create_user('newcomer')
+        self.assertEqual(vocabulary.correct_query(other.pk, 'Photosinthesis  Now'), 'photosinthesis now')
+
+    def test_suggestions_tolerate_a_misspelled_prefix(self):
+        self.assertEqual(vocabulary.suggest(self.user.pk, 'photosinth'), [])
+        self.assertEqual(vocabulary.suggest_with_typos(self.user.pk, 'photosinth')[0], 'photosynthesis')
+
+
+class CorrectedSearchTests(SearchIndexMixin, SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('corrected')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        refresh_document_indexes(make_document(self.user, 'biology', BIOLOGY))
+
+    def search(self, query):
+        return self.client.post('/api/documents/search/', {'query': query, 'mode': 'local'}, format='json').json()
+
+    def test_corrections_are_reported(self):
+        body = self.search('chlorophyl absorbs light')
+        self.assertEqual(body['corrected_query'], 'chlorophyll absorbs light')
+        self.assertEqual(body['query'], 'chlorophyl absorbs light')
+        self.assertTrue(body['results'])
+
+    def test_whitespace_and_case_alone_are_not_corrections(self):
+        self.assertNotIn('corrected_query', self.search('Chlorophyll   absorbs  light'))
@@ -0,0 +1,58 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from core import services, warmup
+from core.middleware import api_rate_limiter
+from core.models import FlashcardSet, Quiz, Summary
+from core.tests.helpers import SharedCacheMixin, make_document
+from core.tiered_cache import summary_cache
+
+QUIZ = {'questions': [{'question': 'What makes glucose?', 'options': ['Photosynthesis', 'Rust'], 'answer': 0}]}
+
+
+@override_settings(WARMUP_MIN_REMAINING_QUOTA=0, WARMUP_SLOT_WAIT_SECONDS=0)
+class WarmDocumentTests(SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        summary_cache._local.clear()
+        self.addCleanup(summary_cache._local.clear)
+        self.user = User.objects.create_user('warmed')
+        self.document = make_document(self.user, 'notes', 'Photosynthesis makes glucose.')
+        self.limiter = api_rate_limiter()
+
+    def used(self):
+        return self.limiter.limit - self.limiter.remaining(self.user.pk)
+
+    @mock.patch('core.artifacts.get_gemini_quiz', return_value=QUIZ)
+    @mock.patch('core.summaries.get_gemini_summary', return_value='A short summary.')
+    def test_generated_artifacts_are_stored_and_charged_once(self, summary, quiz):
+        self.assertEqual(warmup.warm_document(self.document.pk, self.user.pk, ['summary', 'quiz']), ['summary', 'quiz'])
+        self.assertEqual(self.used(), 2)
+        self.assertEqual(Quiz.objects.get().questions, QUIZ)
+
+        # Already there: nothing is generated or charged again
+        self.assertEqual(warmup.warm_document(self.document.pk, self.user.pk, ['summary', 'quiz']), [])
+        self.assertEqual(self.used(), 2)
+        quiz.assert_called_once()
+
+    @mock.patch('core.artifacts.get_gemini_flashcards')
+    def test_fallbacks_are_neither_stored_nor_charged(self, flashcards):
+        # No model configured in tests, so the summary and quiz come back as fallbacks
+        with self.assertLogs('core.warmup', 'INFO'):
+            generated = warmup.warm_document(self.document.pk, self.user.pk, ['quiz', 'summary', 'flashcards'])
+        self.assertEqual(generated, [])
+        self.assertEqual(self.used(), 0)
+        self.assertFalse(Quiz.objects.exists() or Summary.objects.exists() or FlashcardSet.objects.exists())
+        flashcards.assert_not_called()  # A failing model ends the warm-up
+
+    @override_settings(WARMUP_MIN_REMAINING_QUOTA=api_rate_limiter().limit)
+    @mock.patch('core.artifacts.get_gemini_quiz', return_value=QUIZ)
+    def test_users_low_on_quota_are_skipped(self, quiz):
+        self.assertEqual(warmup.warm_document(self.document.pk, self.user.pk, ['quiz']), [])
+        quiz.assert_not_called()
+
+    def test_nothing_is_scheduled_without_a_model(self):
+        with mock.patch.object(services, 'client', None):
+            self.assertFalse(warmup.schedule_warmup(self.document))
@@ -0,0 +1,56 @@
+"""
+Compression of stored document text (see DocumentContent).
+
+zstd compresses extracted text better than zlib and decompresses several
+times faster, but needs the optional `zstandard` package; without it zlib is
+used. Every row records the codec it was written with, so rows of either
+codec stay readable whatever is configured now.
+"""
+
+import logging
+import zlib
+
+from django.conf import settings
+
+try:
+    import zstandard
+except ImportError:  # Optional: store zlib-compressed text instead
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ZLIB = 'zlib'
+ZSTD = 'zstd'
+DEFAULT_LEVELS = {ZLIB: 6, ZSTD: 10}
+
+
+def default_codec():
+    codec = getattr(settings, 'DOCUMENT_CONTENT_CODEC', None) or (ZSTD if zstandard else ZLIB)
+    if codec == ZSTD and zstandard is None:
+        logger.warning("DOCUMENT_CONTENT_CODEC is 'zstd' but zstandard is not installed, using zlib")
+        return ZLIB
+    if codec not in DEFAULT_LEVELS:
+        raise ValueError(f"Unknown document content codec: {codec}")
+    return codec
+
+
+def compress_text(text, codec=None):
+    """Return (codec, compressed bytes) for text"""
+    codec = codec or default_codec()
+    level = getattr(settings, 'DOCUMENT_CONTENT_LEVEL', None) or DEFAULT_LEVELS[codec]
+    raw = text.encode('utf-8')
+    if codec == ZSTD:
+        # Compressor objects are not thread-safe, and creating one is cheap next to compressing a document
+        return codec, zstandard.ZstdCompressor(level=level).compress(raw)
+    return codec, zlib.compress(raw, level)
+
+
+def decompress_text(codec, data):
+    data = bytes(data)  # BinaryField values are memoryviews on some backends
+    if codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("This document's text is zstd-compressed; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    if codec == ZLIB:
+        return zlib.decompress(data).decode('utf-8')
+    raise ValueError(f"Unknown document content codec: {codec}")
@@ -0,0 +1,289 @@
+"""
+Two-tier cache for expensive AI results (currently document summaries, see core.summaries).
+
+Tier one is a small in-process LRU; tier two is the shared cache every worker
+sees. Entries carry their logical expiry and how long they took to compute,
+which enables:
+
+- probabilistic early recomputation (XFetch): as an entry nears expiry, a
+  request occasionally refreshes it in the background, earlier the slower it
+  is to compute, so popular entries rarely expire at all;
+- stale-while-revalidate: an expired entry is still served for a grace period
+  while exactly one worker (holding the lease lock) regenerates it;
+- waiting instead of failing: on a cold miss, requests that lose the lock
+  wait for the winner's result instead of getting an immediate 429.
+
+Async views use aget_or_compute(), which awaits the computation and waits on
+the event loop instead of in a thread.
+
+Hit counters per tier are kept in-process and flushed to the shared cache
+periodically, so `stats()` reports hit rates across all workers.
+"""
+
+import asyncio
+import logging
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from .locks import LeaseLock
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('local_hit', 'shared_hit', 'stale_hit', 'miss', 'early_refresh', 'stale_refresh', 'waited')
+STATS_FLUSH_INTERVAL = 30  # seconds
+
+
+class CacheBusy(Exception):
+    """Another worker is computing the value and it did not arrive in time"""
+
+
+class TieredCache:
+    def __init__(self, namespace, ttl, stale_ttl, local_max_entries=256, local_ttl=60, beta=1.0, wait=10):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.local_max_entries = local_max_entries
+        self.local_ttl = local_ttl
+        self.beta = beta
+        self.wait = wait
+        self._local = OrderedDict()
+        self._local_guard = threading.Lock()
+        self._counts = dict.fromkeys(METRICS, 0)
+        self._counts_guard = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def _shared_key(self, key):
+        return f"tiered_{self.namespace}_{key}"
+
+    def _lock(self, key):
+        return LeaseLock(f"{self.namespace}_lock_{key}")
+
+    # --- Tiers ---
+
+    def _local_get(self, key, now):
+        with self._local_guard:
+            item = self._local.get(key)
+            if item is None:
+                return None
+            entry, local_until = item
+            if now >= local_until or now >= entry['expires_at']:
+                # Expired locally: re-read the shared tier, another worker may have refreshed it
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return entry
+
+    def _local_set(self, key, entry):
+        local_until = min(time.time() + self.local_ttl, entry['expires_at'])
+        with self._local_guard:
+            self._local[key] = (entry, local_until)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_max_entries:
+                self._local.popitem(last=False)
+
+    def _store(self, key, value, delta):
+        entry = {'value': value, 'expires_at': time.time() + self.ttl, 'delta': delta}
+        cache.set(self._shared_key(key), entry, timeout=self.ttl + self.stale_ttl)
+        self._local_set(key, entry)
+
+    def invalidate(self, key):
+        """Drop key from the shared tier and this process's local tier"""
+        cache.delete(self._shared_key(key))
+        with self._local_guard:
+            self._local.pop(key, None)
+
+    # --- Reads ---
+
+    def get_or_compute(self, key, compute, cacheable=None):
+        """
+        Return (value, source) where source is 'local', 'shared', 'stale' or 'computed'.
+        Values for which cacheable(value) is False are returned but never stored.
+        Raises CacheBusy if another worker is computing a missing value for too long.
+        """
+        now = time.time()
+        entry, source = self._local_get(key, now), 'local'
+        if entry is None:
+            entry, source = cache.get(self._shared_key(key)), 'shared'
+            if entry is not None and now < entry['expires_at']:
+                self._local_set(key, entry)
+
+        if entry is None:
+            self._count('miss')
+            return self._compute_or_wait(key, compute, cacheable), 'computed'
+
+        if now < entry['expires_at']:
+            self._count(f'{source}_hit')
+            if self._should_refresh_early(entry, now):
+                self._refresh_in_background(key, compute, cacheable, 'early_refresh')
+            return entry['value'], source
+
+        self._count('stale_hit')
+        self._refresh_in_background(key, compute, cacheable, 'stale_refresh')
+        return entry['value'], 'stale'
+
+    async def aget_or_compute(self, key, compute, acompute, cacheable=None):
+        """
+        get_or_compute() for async code: a missing value is computed by awaiting
+        acompute(). Background refreshes still run compute() on a thread, since
+        they outlive the request.
+        """
+        now = time.time()
+        entry, source = self._local_get(key, now), 'local'
+        if entry is None:
+            entry, source = await cache.aget(self._shared_key(key)), 'shared'
+            if entry is not None and now < entry['expires_at']:
+                self._local_set(key, entry)
+
+        if entry is None:
+            await self._acount('miss')
+            return await self._acompute_or_wait(key, acompute, cacheable), 'computed'
+
+        if now < entry['expires_at']:
+            await self._acount(f'{source}_hit')
+            if self._should_refresh_early(entry, now):
+                await sync_to_async(self._refresh_in_background)(key, compute, cacheable, 'early_refresh')
+            return entry['value'], source
+
+        await self._acount('stale_hit')
+        await sync_to_async(self._refresh_in_background)(key, compute, cacheable, 'stale_refresh')
+        return entry['value'], 'stale'
+
+    def _should_refresh_early(self, entry, now):
+        # XFetch: -log(U) is exponentially distributed, so the chance grows smoothly towards expiry
+        return now - entry['delta'] * self.beta * math.log(1.0 - random.random()) >= entry['expires_at']
+
+    def _compute(self, key, compute, cacheable):
+        started = time.perf_counter()
+        value = compute()
+        if cacheable is not None and not cacheable(value):
+            return value
+        self._store(key, value, time.perf_counter() - started)
+        return value
+
+    def _compute_or_wait(self, key, compute, cacheable):
+        lock = self._lock(key)
+        if lock.acquire():
+            try:
+                # Another worker may have finished between the cache read and acquiring the lock
+                entry = cache.get(self._shared_key(key))
+                if entry is not None and time.time() < entry['expires_at']:
+                    return entry['value']
+                return self._compute(key, compute, cacheable)
+            finally:
+                lock.release()
+
+        self._count('waited')
+        deadline = time.monotonic() + self.wait
+        while time.monotonic() < deadline:
+            time.sleep(0.25)
+            entry = cache.get(self._shared_key(key))
+            if entry is not None:
+                self._local_set(key, entry)
+                return entry['value']
+        raise CacheBusy(key)
+
+    async def _acompute(self, key, acompute, cacheable):
+        started = time.perf_counter()
+        value = await acompute()
+        if cacheable is not None and not cacheable(value):
+            return value
+        await sync_to_async(self._store)(key, value, time.perf_counter() - started)
+        return value
+
+    async def _acompute_or_wait(self, key, acompute, cacheable):
+        lock = self._lock(key)
+        if await lock.aacquire():
+            try:
+                entry = await cache.aget(self._shared_key(key))
+                if entry is not None and time.time() < entry['expires_at']:
+                    return entry['value']
+                return await self._acompute(key, acompute, cacheable)
+            finally:
+                await lock.arelease()
+
+        await self._acount('waited')
+        deadline = time.monotonic() + self.wait
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.25)
+            entry = await cache.aget(self._shared_key(key))
+            if entry is not None:
+                self._local_set(key, entry)
+                return entry['value']
+        raise CacheBusy(key)
+
+    def _refresh_in_background(self, key, compute, cacheable, reason):
+        lock = self._lock(key)
+        if not lock.acquire():
+            return  # Another worker is already refreshing this entry
+        self._count(reason)
+
+        def refresh():
+            try:
+                self._compute(key, compute, cacheable)
+            except Exception as e:
+                logger.warning(f"Background refresh of {self.namespace} {key} failed, keeping the old value: {e}")
+            finally:
+                lock.release()
+                connections.close_all()
+
+        threading.Thread(target=refresh, name=f"refresh-{self.namespace}-{key}", daemon=True).start()
+
+    # --- Statistics ---
+
+    def _count(self, metric):
+        with self._counts_guard:
+            self._counts[metric] += 1
+            due = time.monotonic() - self._last_flush >= STATS_FLUSH_INTERVAL
+        if due:
+            self.flush_stats()
+
+    async def _acount(self, metric):
+        with self._counts_guard:
+            self._counts[metric] += 1
+            due = time.monotonic() - self._last_flush >= STATS_FLUSH_INTERVAL
+        if due:
+            await sync_to_async(self.flush_stats)()
+
+    def flush_stats(self):
+        """Add this process's counters to the shared totals"""
+        with self._counts_guard:
+            counts, self._counts = self._counts, dict.fromkeys(METRICS, 0)
+            self._last_flush = time.monotonic()
+        for metric, value in counts.items():
+            if value:
+                key = f"tiered_stats_{self.namespace}_{metric}"
+                cache.add(key, 0, timeout=None)
+                cache.incr(key, value)
+
+    def stats(self):
+        """Counters across all workers plus hit rates per tier"""
+        self.flush_stats()
+        totals = {metric: cache.get(f"tiered_stats_{self.namespace}_{metric}", 0) for metric in METRICS}
+        lookups = totals['local_hit'] + totals['shared_hit'] + totals['stale_hit'] + totals['miss']
+        for tier in ('local_hit', 'shared_hit', 'stale_hit'):
+            totals[f'{tier}_rate'] = totals[tier] / lookups if lookups else 0.0
+        totals['lookups'] = lookups
+        return totals
+
+    def reset_stats(self):
+        with self._counts_guard:
+            self._counts = dict.fromkeys(METRICS, 0)
+        cache.delete_many([f"tiered_stats_{self.namespace}_{metric}" for metric in METRICS])
+
+
+summary_cache = TieredCache(
+    'summary',
+    ttl=getattr(settings, 'SUMMARY_CACHE_TTL', 86400),
+    stale_ttl=getattr(settings, 'SUMMARY_CACHE_STALE_TTL', 6 * 3600),
+    local_max_entries=getattr(settings, 'SUMMARY_CACHE_LOCAL_ENTRIES', 256),
+    local_ttl=getattr(settings, 'SUMMARY_CACHE_LOCAL_TTL', 60),
+    wait=getattr(settings, 'SUMMARY_CACHE_WAIT_SECONDS', 10),
+)
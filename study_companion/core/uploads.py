@@ -0,0 +1,139 @@
+"""
+Document uploads and text extraction.
+
+A batch upload creates all of its documents in one transaction, then extracts
+their text on a thread pool shared by every request in the process, so
+UPLOAD_EXTRACTION_WORKERS bounds the extractions running at once no matter how
+many batches arrive together. Each job stores its own result, so the work is
+finished even if the client stops reading the streamed results.
+"""
+
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from . import search_index, vocabulary
+from .document_types import registry as document_type_registry
+from .models import UploadedDocument, CorpusVersion
+from .services import extract_document_text
+from .sqlite import retry_on_locked
+from .warmup import schedule_warmup
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_guard = threading.Lock()
+
+
+def extraction_pool():
+    global _pool
+    with _pool_guard:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'UPLOAD_EXTRACTION_WORKERS', 4), thread_name_prefix='text-extraction'
+            )
+    return _pool
+
+
+def refresh_document_indexes(document):
+    """
+    Re-index a document for local search and autocomplete after (re-)extraction.
+    Bumps the owner's corpus version so cached searches go stale; indexing problems never fail the request.
+    """
+    retry_on_locked(CorpusVersion.bump)(document.user_id)
+    for index in (search_index, vocabulary):
+        try:
+            index.index_document(document)
+        except Exception as e:
+            logger.error(f"{index.__name__} indexing failed for doc {document.pk}: {str(e)}")
+
+
+def extract_and_store(document):
+    """
+    Extract the document's text and save the outcome; a failed extraction keeps the
+    document, marked as failed, so the user can retry later. Returns the document.
+    """
+    try:
+        extracted = extract_document_text(document.file.path)
+        document.extracted_text = extracted.text
+        document.page_count = extracted.page_count
+        retry_on_locked(document.save)()
+        logger.info(f"Text extraction successful for document {document.pk}")
+    except Exception as e:
+        logger.exception(f"Text extraction failed for document {document.pk}, saving it without text")
+        document.mark_extraction_failed(e)
+        retry_on_locked(document.save)()
+    refresh_document_indexes(document)
+    schedule_warmup(document)
+    return document
+
+
+def _extraction_job(document):
+    try:
+        return extract_and_store(document)
+    finally:
+        # Pool threads outlive the request; give back their per-thread connection
+        connections.close_all()
+
+
+def create_documents(user, files, document_type=None):
+    """
+    Create one pending document per uploaded file in a single transaction.
+    Titles come from the file names; without an explicit type each file's type is
+    detected from its extension. Files already written to storage are removed if
+    the transaction fails.
+    """
+    title_length = UploadedDocument._meta.get_field('title').max_length
+    documents = [
+        UploadedDocument(
+            user=user,
+            title=(os.path.splitext(os.path.basename(upload.name))[0] or upload.name)[:title_length],
+            file=upload,
+            document_type=document_type or document_type_registry.for_extension(upload.name.rsplit('.', 1)[-1].lower()),
+        )
+        for upload in files
+    ]
+    try:
+        with transaction.atomic():
+            # bulk_create() writes the files to storage and skips post_save, so bump the corpus once here
+            UploadedDocument.objects.bulk_create(documents)
+            CorpusVersion.bump(user.id)
+    except Exception:
+        for document in documents:
+            if document.file and document.file._committed:
+                document.file.storage.delete(document.file.name)
+        raise
+    return documents
+
+
+def extract_in_background(documents):
+    """Queue extraction of each document on the shared pool; returns {future: index in documents}"""
+    pool = extraction_pool()
+    return {pool.submit(_extraction_job, document): index for index, document in enumerate(documents)}
+
+
+def stream_extraction_results(futures, serialize):
+    """
+    NDJSON lines, one per document in the order its extraction finishes, then a
+    summary line. Each line carries the file's index in the upload so the client
+    can match results to files.
+    """
+    counts = dict.fromkeys(['ready', 'empty', 'failed'], 0)
+    for future in as_completed(futures):
+        index = futures[future]
+        try:
+            document = future.result()
+        except Exception as e:
+            # Only saving the outcome can fail here; extraction errors are stored on the document
+            logger.error(f"Storing extraction result for upload {index} failed: {str(e)}")
+            counts['failed'] += 1
+            yield json.dumps({"index": index, "status": "error", "error": str(e)}) + "\n"
+            continue
+        counts[str(document.extraction_status)] += 1
+        yield json.dumps({"index": index, "status": document.extraction_status, "document": serialize(document)}) + "\n"
+    yield json.dumps({"done": True, "total": len(futures), **counts}) + "\n"
@@ -1,11 +1,13 @@
 from django.urls import path
 from .views import (
     DocumentUploadView,
+    DocumentBatchUploadView,
     DocumentListView,
     DocumentDetailView,
     SummarizeDocumentView,
     GenerateQuizView,
     GenerateFlashcardsView,
+    ArtifactBatchView,
     QnAView,
     SmartSearchView,
     SearchSuggestionsView,
@@ -14,6 +16,14 @@ from .views import (
     DocumentTypeCreateView,
     DocumentTypeDetailView,
 )
+from .async_views import (
+    AsyncSummarizeDocumentView,
+    AsyncGenerateQuizView,
+    AsyncGenerateFlashcardsView,
+    AsyncQnAView,
+    AsyncSmartSearchView,
+    AsyncSearchSuggestionsView,
+)
 
 urlpatterns = [
     # Document Type URLs
@@ -23,13 +33,23 @@ urlpatterns = [
     
     # Document URLs
     path('documents/upload/', DocumentUploadView.as_view(), name='document-upload'),
+    path('documents/upload/batch/', DocumentBatchUploadView.as_view(), name='document-batch-upload'),
     path('documents/', DocumentListView.as_view(), name='document-list'),
     path('documents/search/', SmartSearchView.as_view(), name='smart-search'),
     path('documents/search/suggestions/', SearchSuggestionsView.as_view(), name='search-suggestions'),
+    path('documents/artifacts/', ArtifactBatchView.as_view(), name='artifact-batch'),
     path('documents/<int:pk>/', DocumentDetailView.as_view(), name='document-detail'),
     path('documents/<int:pk>/summarize/', SummarizeDocumentView.as_view(), name='document-summarize'),
     path('documents/<int:pk>/generate-quiz/', GenerateQuizView.as_view(), name='generate-quiz'),
     path('documents/<int:pk>/generate-flashcards/', GenerateFlashcardsView.as_view(), name='generate-flashcards'),
     path('documents/<int:pk>/qna/', QnAView.as_view(), name='document-qna'),
     path('documents/<int:pk>/retry-extraction/', RetryTextExtractionView.as_view(), name='retry-text-extraction'),
+    
+    # Async versions of the AI endpoints for ASGI deployments (POST only)
+    path('async/documents/search/', AsyncSmartSearchView.as_view(), name='async-smart-search'),
+    path('async/documents/search/suggestions/', AsyncSearchSuggestionsView.as_view(), name='async-search-suggestions'),
+    path('async/documents/<int:pk>/summarize/', AsyncSummarizeDocumentView.as_view(), name='async-document-summarize'),
+    path('async/documents/<int:pk>/generate-quiz/', AsyncGenerateQuizView.as_view(), name='async-generate-quiz'),
+    path('async/documents/<int:pk>/generate-flashcards/', AsyncGenerateFlashcardsView.as_view(), name='async-generate-flashcards'),
+    path('async/documents/<int:pk>/qna/', AsyncQnAView.as_view(), name='async-document-qna'),
 ]
\ No newline at end of file
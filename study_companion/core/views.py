@@ -6,6 +6,8 @@ from django.core.mail import send_mail
 from django.conf import settings
 from django.core.cache import cache
 from django.utils import timezone
+from django.http import StreamingHttpResponse
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
@@ -14,19 +16,34 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 from .services import (
-    extract_text_from_file, get_gemini_summary,
-    get_gemini_quiz, get_gemini_flashcards, get_gemini_answer,
-    smart_search_documents, generate_search_suggestions
+    extract_document_text, get_gemini_answer,
+    smart_search_documents, generate_search_suggestions, rerank_search_candidates
 )
-from .models import UploadedDocument, Quiz, FlashcardSet, Flashcard, TemporaryUser, QuestionAnswer, SearchCache, DocumentType
+from .models import UploadedDocument, Quiz, FlashcardSet, TemporaryUser, QuestionAnswer, SearchCache, DocumentType, CorpusVersion
+from .pagination import DocumentCursorPagination
+from .fieldsets import SparseFieldsetMixin
 from .serializers import (
-    UploadedDocumentSerializer,
+    UploadedDocumentSerializer, DocumentListSerializer,
     QuizSerializer, FlashcardSetSerializer, DocumentTypeSerializer
 )
+from . import search_index, vocabulary
+from .locks import LeaseLock
+from .sqlite import retry_on_locked
+from .tiered_cache import CacheBusy
+from .summaries import get_document_summary
+from .artifacts import generate_quiz, generate_flashcards, generate_artifacts, ArtifactBusy, ArtifactUnavailable, ARTIFACT_GENERATORS
+from .middleware import api_rate_limiter
+from .warmup import schedule_warmup
+from .uploads import (
+    refresh_document_indexes, extract_and_store, create_documents, extract_in_background, stream_extraction_results
+)
+from .document_types import registry as document_type_registry
+from .conditional import private_conditional, document_list_etag, document_etag, quiz_etag, flashcards_etag
 import random
 import logging
 import hashlib
 import json
+import time
 from datetime import timedelta
 
 # --- Authentication Views ---
@@ -149,6 +166,18 @@ class ValidateTokenView(views.APIView):
 
 # --- Document & AI Views (These should generally require IsAuthenticated) ---
 
+def _elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 2)
+
+def _merge_suggestions(local_suggestions, extra_suggestions, limit):
+    merged = list(local_suggestions)
+    seen = {suggestion.lower() for suggestion in merged}
+    for suggestion in extra_suggestions:
+        if suggestion.lower() not in seen:
+            merged.append(suggestion)
+            seen.add(suggestion.lower())
+    return merged[:limit]
+
 class DocumentUploadView(generics.CreateAPIView):
     queryset = UploadedDocument.objects.all()
     serializer_class = UploadedDocumentSerializer
@@ -157,18 +186,56 @@ class DocumentUploadView(generics.CreateAPIView):
 
     def perform_create(self, serializer):
         document = serializer.save(user=self.request.user)
+        # A failed extraction keeps the document; users can retry it later
+        extract_and_store(document)
+
+class DocumentBatchUploadView(views.APIView):
+    """
+    Upload many files in one multipart request (field 'files', optional
+    'document_type_id'). All documents are created in one transaction; their text
+    is extracted on the shared extraction pool and the results stream back as
+    NDJSON, one line per file in the order extraction finishes.
+    """
+    parser_classes = (MultiPartParser, FormParser)
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        # Spool every file to disk while the body is parsed instead of holding small ones in memory
+        request._request.upload_handlers = [TemporaryFileUploadHandler(request._request)]
+        files = request.FILES.getlist('files')
+        if not files:
+            return Response({"error": "No files uploaded."}, status=status.HTTP_400_BAD_REQUEST)
+        max_files = getattr(settings, 'UPLOAD_BATCH_MAX_FILES', 50)
+        if len(files) > max_files:
+            return Response({"error": f"At most {max_files} files can be uploaded at once."}, status=status.HTTP_400_BAD_REQUEST)
+
+        document_type = None
+        document_type_id = request.data.get('document_type_id')
+        if document_type_id:
+            try:
+                document_type = document_type_registry.get(int(document_type_id))
+            except (TypeError, ValueError):
+                document_type = None
+            if document_type is None:
+                return Response({"error": "Document type not found."}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            extracted_text = extract_text_from_file(document.file.path)
-            document.extracted_text = extracted_text
-            document.save()
-            print(f"Text extraction successful for document: {document.title}")
+            documents = create_documents(request.user, files, document_type)
         except Exception as e:
-            print(f"Text extraction failed for document: {document.title}, Error: {e}")
-            # Don't delete the document - just save it without extracted text
-            # Users can still upload the file and manually add content later
-            document.extracted_text = f"Text extraction failed: {str(e)}"
-            document.save()
-            print(f"Document saved without text extraction: {document.title}")
+            logging.error(f"Batch upload failed for user {request.user.id}: {str(e)}")
+            return Response({"error": "Could not save the uploaded files. Please try again."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        logging.info(f"Created {len(documents)} documents in one batch for user {request.user.id}, extracting text")
+
+        context = {'request': request}
+        futures = extract_in_background(documents)
+        response = StreamingHttpResponse(
+            stream_extraction_results(futures, lambda document: DocumentListSerializer(document, context=context).data),
+            content_type='application/x-ndjson',
+            status=status.HTTP_201_CREATED,
+        )
+        response['Cache-Control'] = 'no-store'
+        response['X-Accel-Buffering'] = 'no'  # Let proxies pass each line through as it is written
+        return response
 
 class DocumentTypeListView(generics.ListAPIView):
     """List all available document types"""
@@ -177,6 +244,11 @@ class DocumentTypeListView(generics.ListAPIView):
     
     def get_queryset(self):
         return DocumentType.objects.all()
+    
+    def list(self, request, *args, **kwargs):
+        # Served from the in-process registry; no query unless a type changed
+        serializer = self.get_serializer(document_type_registry.all(), many=True)
+        return Response(serializer.data)
 
 class DocumentTypeCreateView(generics.CreateAPIView):
     """Create a new document type (admin only)"""
@@ -194,9 +266,12 @@ class DocumentTypeDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         return DocumentType.objects.all()
 
-class DocumentListView(generics.ListAPIView):
-    serializer_class = UploadedDocumentSerializer
+class DocumentListView(SparseFieldsetMixin, generics.ListAPIView):
+    # Light rows without extracted_text; only the detail endpoint returns the text.
+    # ?fields= and ?expand= pick what each row carries (see core.fieldsets)
+    serializer_class = DocumentListSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = DocumentCursorPagination
     
     def get_queryset(self):
         queryset = UploadedDocument.objects.filter(user=self.request.user)
@@ -206,193 +281,273 @@ class DocumentListView(generics.ListAPIView):
         if document_type_id:
             queryset = queryset.filter(document_type_id=document_type_id)
         
-        return queryset.order_by('-uploaded_at')
+        return self.fieldset_queryset(queryset.order_by('-uploaded_at', '-id'))
+    
+    @private_conditional(document_list_etag)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
-class DocumentDetailView(generics.RetrieveDestroyAPIView):
+class DocumentDetailView(SparseFieldsetMixin, generics.RetrieveDestroyAPIView):
     serializer_class = UploadedDocumentSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return UploadedDocument.objects.filter(user=self.request.user)
+        # Loads the content row only when extracted_text is among the requested fields
+        return self.fieldset_queryset(UploadedDocument.objects.filter(user=self.request.user))
+    
+    @private_conditional(document_etag)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+def _text_unavailable(doc, action):
+    """Error response when the document has no text to work with, otherwise None"""
+    if doc.extraction_failed:
+        return Response({"error": f"Cannot {action}. " + doc.extraction_message}, status=status.HTTP_400_BAD_REQUEST)
+    if not doc.has_text:
+        return Response({"error": "Text not extracted from document."}, status=status.HTTP_400_BAD_REQUEST)
+    return None
+
+def _is_overload_error(e):
+    # Fallback quizzes and flashcards are not stored, so the client is told the model is unavailable
+    if isinstance(e, ArtifactUnavailable):
+        return True
+    return "503" in str(e) or "overloaded" in str(e).lower() or "unavailable" in str(e).lower()
 
 class SummarizeDocumentView(views.APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request, pk):
         try:
-            doc = UploadedDocument.objects.get(pk=pk, user=request.user)
-            if not doc.extracted_text:
-                return Response({"error": "Text not extracted from document."}, status=status.HTTP_400_BAD_REQUEST)
-            
+            # The content row without its compressed text: the summary is looked up by content_hash
+            doc = UploadedDocument.objects.select_related('content').defer('content__data').get(pk=pk, user=request.user)
             # Check if text extraction failed
-            if doc.extracted_text.startswith("Text extraction failed:"):
-                return Response({"error": "Cannot generate summary. " + doc.extracted_text}, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Check for cached summary first to prevent token waste
-            cache_key = f"summary_doc_{pk}"
-            cached_summary = cache.get(cache_key)
-            if cached_summary:
-                return Response({"summary": cached_summary})
-            
-            # Prevent concurrent API calls for same document
-            lock_key = f"summary_lock_{pk}"
-            if cache.get(lock_key):
-                return Response({"error": "Summary is already being generated. Please wait a moment and try again."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
-            
-            # Set lock to prevent concurrent requests - reduced from 60 to 30 seconds
-            cache.set(lock_key, True, timeout=30)  # 30 second lock
+            error = _text_unavailable(doc, "generate summary")
+            if error:
+                return error
             
+            # Tiered cache in front of the durable Summary table (keyed by text hash, prompt version
+            # and model): refreshed early, served stale while regenerating, never paid for twice
             try:
-                summary = get_gemini_summary(doc.extracted_text)
-                # Cache the result for 24 hours to prevent regeneration
-                cache.set(cache_key, summary, timeout=86400)
-                return Response({"summary": summary})
-            finally:
-                # Always release the lock
-                cache.delete(lock_key)
+                summary = get_document_summary(doc)
+            except CacheBusy:
+                return self.busy_response()
+            return Response({"summary": summary})
                 
         except UploadedDocument.DoesNotExist:
             return Response({"error": "Document not found."}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            logging.error(f"Summary generation failed for doc {pk}: {str(e)}")
-            # Check if it's a model overload error
-            if "503" in str(e) or "overloaded" in str(e).lower() or "unavailable" in str(e).lower():
-                return Response({
-                    "error": "AI summary is temporarily unavailable due to high demand.",
-                    "details": "We're using a basic summary instead. Please try again in a few minutes for AI-powered summary.",
-                    "fallback_mode": True
-                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
-            else:
-                return Response({"error": "Failed to generate summary. Please try again later."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return self.failure_response(pk, e)
+    
+    def busy_response(self):
+        return Response({"error": "Summary is already being generated. Please wait a moment and try again."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    def failure_response(self, pk, e):
+        logging.error(f"Summary generation failed for doc {pk}: {str(e)}")
+        # Check if it's a model overload error
+        if _is_overload_error(e):
+            return Response({
+                "error": "AI summary is temporarily unavailable due to high demand.",
+                "details": "We're using a basic summary instead. Please try again in a few minutes for AI-powered summary.",
+                "fallback_mode": True
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({"error": "Failed to generate summary. Please try again later."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class GenerateQuizView(views.APIView):
     permission_classes = [IsAuthenticated]
     
+    @private_conditional(quiz_etag)
+    def get(self, request, pk):
+        """Return the document's existing quiz without generating one"""
+        quiz = Quiz.objects.filter(document_id=pk, document__user=request.user).order_by('id').first()
+        if not quiz:
+            return Response({"error": "No quiz has been generated for this document yet."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(QuizSerializer(quiz).data)
+    
     def post(self, request, pk):
         try:
             doc = UploadedDocument.objects.get(pk=pk, user=request.user)
-            if not doc.extracted_text:
-                return Response({"error": "Text not extracted from document."}, status=status.HTTP_400_BAD_REQUEST)
-            
             # Check if text extraction failed
-            if doc.extracted_text.startswith("Text extraction failed:"):
-                return Response({"error": "Cannot generate quiz. " + doc.extracted_text}, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Check if quiz already exists for this document to prevent duplicate API calls
-            existing_quiz = Quiz.objects.filter(document=doc).first()
-            if existing_quiz:
-                serializer = QuizSerializer(existing_quiz)
-                return Response(serializer.data, status=status.HTTP_200_OK)
-            
-            # Prevent concurrent API calls for same document
-            lock_key = f"quiz_lock_{pk}"
-            if cache.get(lock_key):
-                return Response({"error": "Quiz is already being generated. Please wait a moment and try again."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
-            
-            # Set lock to prevent concurrent requests - reduced from 60 to 30 seconds
-            cache.set(lock_key, True, timeout=30)  # 30 second lock
+            error = _text_unavailable(doc, "generate quiz")
+            if error:
+                return error
             
+            # Existing quiz, or a new one generated under a lease lock shared by all workers
             try:
-                quiz_data = get_gemini_quiz(doc.extracted_text)
-                quiz = Quiz.objects.create(document=doc, title=f"Quiz for {doc.title}", questions=quiz_data)
-                serializer = QuizSerializer(quiz)
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
-            finally:
-                # Always release the lock
-                cache.delete(lock_key)
+                quiz, created = generate_quiz(doc)
+            except ArtifactBusy:
+                return self.busy_response()
+            serializer = QuizSerializer(quiz)
+            return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
                 
         except UploadedDocument.DoesNotExist:
             return Response({"error": "Document not found."}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            logging.error(f"Quiz generation failed for doc {pk}: {str(e)}")
-            # Check if it's a model overload error
-            if "503" in str(e) or "overloaded" in str(e).lower() or "unavailable" in str(e).lower():
-                return Response({
-                    "error": "AI quiz generation is temporarily unavailable due to high demand.",
-                    "details": "We're using a basic quiz instead. Please try again in a few minutes for AI-powered quiz.",
-                    "fallback_mode": True
-                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
-            else:
-                return Response({"error": "Failed to generate quiz. Please try again later."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return self.failure_response(pk, e)
+    
+    def busy_response(self):
+        return Response({"error": "Quiz is already being generated. Please wait a moment and try again."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    def failure_response(self, pk, e):
+        logging.error(f"Quiz generation failed for doc {pk}: {str(e)}")
+        # Check if it's a model overload error
+        if _is_overload_error(e):
+            return Response({
+                "error": "AI quiz generation is temporarily unavailable due to high demand.",
+                "details": "We're using a basic quiz instead. Please try again in a few minutes for AI-powered quiz.",
+                "fallback_mode": True
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({"error": "Failed to generate quiz. Please try again later."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class GenerateFlashcardsView(views.APIView):
     permission_classes = [IsAuthenticated]
     
+    @private_conditional(flashcards_etag)
+    def get(self, request, pk):
+        """Return the document's existing flashcard set without generating one"""
+        flashcard_set = FlashcardSet.objects.complete().filter(
+            document_id=pk, document__user=request.user
+        ).prefetch_related('flashcards').order_by('id').first()
+        if not flashcard_set:
+            return Response({"error": "No flashcards have been generated for this document yet."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(FlashcardSetSerializer(flashcard_set).data)
+    
     def post(self, request, pk):
         try:
             doc = UploadedDocument.objects.get(pk=pk, user=request.user)
-            if not doc.extracted_text:
-                return Response({"error": "Text not extracted from document."}, status=status.HTTP_400_BAD_REQUEST)
-            
             # Check if text extraction failed
-            if doc.extracted_text.startswith("Text extraction failed:"):
-                return Response({"error": "Cannot generate flashcards. " + doc.extracted_text}, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Check if flashcards already exist for this document to prevent duplicate API calls
-            existing_flashcard_set = FlashcardSet.objects.filter(document=doc).first()
-            if existing_flashcard_set:
-                serializer = FlashcardSetSerializer(existing_flashcard_set)
-                return Response(serializer.data, status=status.HTTP_200_OK)
-            
-            # Prevent concurrent API calls for same document
-            lock_key = f"flashcards_lock_{pk}"
-            if cache.get(lock_key):
-                return Response({"error": "Flashcards are already being generated. Please wait a moment and try again."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
-            
-            # Set lock to prevent concurrent requests - reduced from 60 to 30 seconds
-            cache.set(lock_key, True, timeout=30)  # 30 second lock
+            error = _text_unavailable(doc, "generate flashcards")
+            if error:
+                return error
             
+            # Existing flashcards, or a new set generated under a lease lock shared by all workers
             try:
-                flashcard_data = get_gemini_flashcards(doc.extracted_text)
-                flashcard_set = FlashcardSet.objects.create(document=doc, title=f"Flashcards for {doc.title}")
-                
-                for item in flashcard_data['flashcards']:
-                    Flashcard.objects.create(flashcard_set=flashcard_set, front=item['front'], back=item['back'])
-                
-                serializer = FlashcardSetSerializer(flashcard_set)
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
-            finally:
-                # Always release the lock
-                cache.delete(lock_key)
+                flashcard_set, created = generate_flashcards(doc)
+            except ArtifactBusy:
+                return self.busy_response()
+            serializer = FlashcardSetSerializer(flashcard_set)
+            return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
                 
         except UploadedDocument.DoesNotExist:
             return Response({"error": "Document not found."}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            logging.error(f"Flashcards generation failed for doc {pk}: {str(e)}")
-            # Check if it's a model overload error
-            if "503" in str(e) or "overloaded" in str(e).lower() or "unavailable" in str(e).lower():
-                return Response({
-                    "error": "AI flashcard generation is temporarily unavailable due to high demand.",
-                    "details": "We're using basic flashcards instead. Please try again in a few minutes for AI-powered flashcards.",
-                    "fallback_mode": True
-                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            return self.failure_response(pk, e)
+    
+    def busy_response(self):
+        return Response({"error": "Flashcards are already being generated. Please wait a moment and try again."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    def failure_response(self, pk, e):
+        logging.error(f"Flashcards generation failed for doc {pk}: {str(e)}")
+        # Check if it's a model overload error
+        if _is_overload_error(e):
+            return Response({
+                "error": "AI flashcard generation is temporarily unavailable due to high demand.",
+                "details": "We're using basic flashcards instead. Please try again in a few minutes for AI-powered flashcards.",
+                "fallback_mode": True
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({"error": "Failed to generate flashcards. Please try again later."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class ArtifactBatchView(views.APIView):
+    """
+    Create or return artifacts for many documents in one request.
+    Existing artifacts are loaded with one query per kind and are free; every
+    artifact actually generated costs one AI request of the user's quota.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        document_ids = request.data.get('document_ids')
+        artifacts = request.data.get('artifacts') or list(ARTIFACT_GENERATORS)
+        max_documents = getattr(settings, 'ARTIFACT_BATCH_MAX_DOCUMENTS', 20)
+        max_generations = getattr(settings, 'ARTIFACT_BATCH_MAX_GENERATIONS', 10)
+        
+        if not isinstance(document_ids, list) or not document_ids:
+            return Response({"error": "document_ids must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(document_ids) > max_documents:
+            return Response({"error": f"At most {max_documents} documents per request."}, status=status.HTTP_400_BAD_REQUEST)
+        if (not isinstance(artifacts, list) or not all(isinstance(name, str) for name in artifacts)
+                or any(name not in ARTIFACT_GENERATORS for name in artifacts)):
+            return Response({"error": f"artifacts must be a list of: {', '.join(ARTIFACT_GENERATORS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        # bool is an int subclass, and int() would accept floats like 1.5; only integers and numeric strings are ids
+        if not all(isinstance(document_id, (int, str)) and not isinstance(document_id, bool) for document_id in document_ids):
+            return Response({"error": "document_ids must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            document_ids = list(dict.fromkeys(int(document_id) for document_id in document_ids))
+        except (TypeError, ValueError):
+            return Response({"error": "document_ids must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Content rows are needed for their hashes (stored summaries), not for the compressed text
+        documents = UploadedDocument.objects.filter(user=request.user, pk__in=document_ids).select_related('content').defer('content__data')
+        documents = {document.pk: document for document in documents}
+        results = {}
+        ready = []
+        for document_id in document_ids:
+            document = documents.get(document_id)
+            if document is None:
+                results[document_id] = {"error": "Document not found."}
+            elif document.extraction_failed:
+                results[document_id] = {"error": "Cannot generate artifacts. " + document.extraction_message}
+            elif not document.has_text:
+                results[document_id] = {"error": "Text not extracted from document."}
             else:
-                return Response({"error": "Failed to generate flashcards. Please try again later."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                ready.append(document)
+        
+        limiter = api_rate_limiter()
+        attempts = 0
+        generations = 0
+        
+        def allow_generation(document, name):
+            nonlocal attempts
+            if attempts >= max_generations:
+                return False  # Keep the request short; the client asks again for the rest
+            if limiter.remaining(request.user.id) <= 0:
+                return False
+            attempts += 1
+            return True
+        
+        def charge(document, name):
+            # Only artifacts actually generated and stored cost quota; failures and fallbacks are free
+            nonlocal generations
+            limiter.hit(request.user.id)
+            generations += 1
+        
+        for document_id, outcome in generate_artifacts(ready, artifacts, allow_generation, charge).items():
+            results[document_id] = {
+                name: {"status": artifact_status, "data": self._serialize(name, artifact)}
+                for name, (artifact_status, artifact) in outcome.items()
+            }
+        return Response({
+            "results": {str(document_id): results[document_id] for document_id in document_ids},
+            "generated": generations,
+        })
+    
+    @staticmethod
+    def _serialize(name, artifact):
+        if artifact is None:
+            return None
+        if name == 'quiz':
+            return QuizSerializer(artifact).data
+        if name == 'flashcards':
+            return FlashcardSetSerializer(artifact).data
+        return {"summary": artifact}
 
 class QnAView(views.APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request, pk):
         question = request.data.get('question')
-        if not question:
-            return Response({"error": "Question not provided."}, status=status.HTTP_400_BAD_REQUEST)
-            
-        # Validate question length to prevent abuse
-        if len(question) > 1000:
-            return Response({"error": "Question is too long. Please keep it under 1000 characters."}, status=status.HTTP_400_BAD_REQUEST)
+        error = self.validate_question(question)
+        if error:
+            return error
             
         try:
             doc = UploadedDocument.objects.get(pk=pk, user=request.user)
-            if not doc.extracted_text:
-                return Response({"error": "Text not extracted from document."}, status=status.HTTP_400_BAD_REQUEST)
-            
             # Check if text extraction failed
-            if doc.extracted_text.startswith("Text extraction failed:"):
-                return Response({"error": "Cannot answer questions. " + doc.extracted_text}, status=status.HTTP_400_BAD_REQUEST)
+            error = _text_unavailable(doc, "answer questions")
+            if error:
+                return error
             
             # Create question hash for caching to prevent duplicate API calls
-            question_normalized = question.strip().lower()
-            question_hash = hashlib.sha256(question_normalized.encode()).hexdigest()
+            question_hash = self.question_hash(question)
             
             # Check for cached answer first
             cached_qa = QuestionAnswer.objects.filter(document=doc, question_hash=question_hash).first()
@@ -400,14 +555,16 @@ class QnAView(views.APIView):
                 return Response({"question": question, "answer": cached_qa.answer})
             
             # Prevent concurrent API calls for same question
-            lock_key = f"qa_lock_{pk}_{question_hash[:16]}"
-            if cache.get(lock_key):
-                return Response({"error": "This question is already being processed. Please wait a moment and try again."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
-            
-            # Set lock to prevent concurrent requests - reduced from 60 to 30 seconds
-            cache.set(lock_key, True, timeout=30)  # 30 second lock
+            # Lease lock shared by all workers, renewed while the generation runs
+            lock = LeaseLock(f"qa_lock_{pk}_{question_hash[:16]}")
+            if not lock.acquire():
+                return self.busy_response()
             
             try:
+                # Another worker may have answered between the cache check and acquiring the lock
+                cached_qa = QuestionAnswer.objects.filter(document=doc, question_hash=question_hash).first()
+                if cached_qa:
+                    return Response({"question": question, "answer": cached_qa.answer})
                 answer = get_gemini_answer(doc.extracted_text, question)
                 
                 # Cache the Q&A in database for future use
@@ -421,130 +578,232 @@ class QnAView(views.APIView):
                 return Response({"question": question, "answer": answer})
             finally:
                 # Always release the lock
-                cache.delete(lock_key)
+                lock.release()
                 
         except UploadedDocument.DoesNotExist:
             return Response({"error": "Document not found."}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            logging.error(f"Q&A failed for doc {pk}: {str(e)}")
-            # Check if it's a model overload error
-            if "503" in str(e) or "overloaded" in str(e).lower() or "unavailable" in str(e).lower():
-                return Response({
-                    "error": "AI Q&A is temporarily unavailable due to high demand.",
-                    "details": "We're using basic keyword matching instead. Please try again in a few minutes for AI-powered answers.",
-                    "fallback_mode": True
-                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
-            else:
-                return Response({"error": "Failed to process question. Please try again later."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return self.failure_response(pk, e)
+    
+    def validate_question(self, question):
+        if not question:
+            return Response({"error": "Question not provided."}, status=status.HTTP_400_BAD_REQUEST)
+        # Validate question length to prevent abuse
+        if len(question) > 1000:
+            return Response({"error": "Question is too long. Please keep it under 1000 characters."}, status=status.HTTP_400_BAD_REQUEST)
+        return None
+    
+    @staticmethod
+    def question_hash(question):
+        return hashlib.sha256(question.strip().lower().encode()).hexdigest()
+    
+    def busy_response(self):
+        return Response({"error": "This question is already being processed. Please wait a moment and try again."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    def failure_response(self, pk, e):
+        logging.error(f"Q&A failed for doc {pk}: {str(e)}")
+        # Check if it's a model overload error
+        if _is_overload_error(e):
+            return Response({
+                "error": "AI Q&A is temporarily unavailable due to high demand.",
+                "details": "We're using basic keyword matching instead. Please try again in a few minutes for AI-powered answers.",
+                "fallback_mode": True
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({"error": "Failed to process question. Please try again later."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class SmartSearchView(views.APIView):
+    """
+    Two-stage document search.
+
+    mode=local  - local semantic index only, no model call
+    mode=hybrid - local recall over the whole corpus, AI rerank of the top candidates (default)
+    mode=model  - legacy AI search over the first documents
+
+    The stages are separate methods so the async view can await the model stage.
+    """
     permission_classes = [IsAuthenticated]
+    search_modes = ('local', 'hybrid', 'model')
     
     def post(self, request):
-        search_query = request.data.get('query', '').strip()
-        
-        if not search_query:
-            return Response({"error": "Search query is required."}, status=status.HTTP_400_BAD_REQUEST)
-        
-        if len(search_query) < 3:
-            return Response({"error": "Search query must be at least 3 characters long."}, status=status.HTTP_400_BAD_REQUEST)
-            
-        # Validate query length to prevent abuse
-        if len(search_query) > 500:
-            return Response({"error": "Search query is too long. Please keep it under 500 characters."}, status=status.HTTP_400_BAD_REQUEST)
+        started = time.perf_counter()
+        search_query, mode, error = self.validate(request)
+        if error:
+            return error
         
         try:
-            # Create query hash for caching
-            query_normalized = search_query.lower()
-            query_hash = hashlib.sha256(query_normalized.encode()).hexdigest()
+            search = self.recall(request, search_query, mode, started)
+            if isinstance(search, Response):
+                return search
             
-            # Check for cached search results first
-            cached_search = SearchCache.objects.filter(user=request.user, query_hash=query_hash).first()
-            if cached_search and cached_search.is_fresh(max_age_hours=1):
-                search_results = cached_search.results
-                search_results['query'] = search_query  # Update with original casing
-                return Response(search_results, status=status.HTTP_200_OK)
+            if mode == 'local':
+                return self.finish(request, search, search_index.local_search_results(search['candidates']), started)
             
-            # Get all user documents with extracted text
-            user_documents = UploadedDocument.objects.filter(
-                user=request.user,
-                extracted_text__isnull=False
-            ).exclude(extracted_text='').exclude(extracted_text__startswith="Text extraction failed:")
-            
-            if not user_documents.exists():
-                return Response({
-                    "results": [],
-                    "total_found": 0,
-                    "search_summary": "No documents found to search through.",
-                    "query": search_query
-                })
-            
-            # Prevent concurrent API calls for same search query
-            lock_key = f"search_lock_{request.user.id}_{query_hash[:16]}"
-            if cache.get(lock_key):
-                return Response({"error": "This search is already being processed. Please wait a moment and try again."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
-            
-            # Set lock to prevent concurrent requests - reduced from 60 to 30 seconds
-            cache.set(lock_key, True, timeout=30)  # 30 second lock
+            # Stage 2 calls the model - prevent concurrent API calls for same search query
+            # Lease lock shared by all workers, renewed while the generation runs
+            lock = LeaseLock(f"search_lock_{request.user.id}_{search['query_hash'][:16]}")
+            if not lock.acquire():
+                return self.busy_response()
             
             try:
-                # Prepare document data for AI search - OPTIMIZE CONTEXT LENGTH
-                documents_data = []
-                for doc in user_documents[:10]:  # Limit to first 10 documents to manage context
-                    # Optimize text length to prevent token waste - use first 1000 chars instead of 2000
-                    truncated_content = doc.extracted_text[:1000] if len(doc.extracted_text) > 1000 else doc.extracted_text
-                    documents_data.append((doc.id, doc.title, truncated_content))
-                
-                # Perform smart search using AI
-                search_results = smart_search_documents(documents_data, search_query)
-                
-                # Add document URLs to results
-                for result in search_results.get('results', []):
-                    try:
-                        doc_id = int(result['document_id'])
-                        result['document_url'] = f"/documents/{doc_id}/"
-                    except (ValueError, KeyError):
-                        result['document_url'] = None
-                
-                # Add the original query to the response
-                search_results['query'] = search_query
-                
-                # Cache the search results for future use
-                SearchCache.objects.update_or_create(
-                    user=request.user,
-                    query_hash=query_hash,
-                    defaults={
-                        'query': search_query,
-                        'results': search_results
-                    }
-                )
-                
-                return Response(search_results, status=status.HTTP_200_OK)
+                stage_started = time.perf_counter()
+                if mode == 'hybrid' and search['candidates']:
+                    # Only the recalled chunks go to the model for reranking and snippets
+                    search_results = rerank_search_candidates(search['candidates'], search['corrected_query'])
+                    search['timings']['rerank_ms'] = _elapsed_ms(stage_started)
+                else:
+                    # Model-only mode, or nothing indexed yet for this user
+                    search_results = smart_search_documents(self.model_documents(request), search['corrected_query'])
+                    search['timings']['model_ms'] = _elapsed_ms(stage_started)
             finally:
                 # Always release the lock
-                cache.delete(lock_key)
+                lock.release()
+            
+            return self.finish(request, search, search_results, started)
             
         except Exception as e:
-            logging.error(f"Smart search failed for user {request.user.id}: {str(e)}")
+            return self.failure_response(request, e)
+    
+    def validate(self, request):
+        """(search_query, mode, error response or None)"""
+        search_query = request.data.get('query', '').strip()
+        mode = request.data.get('mode', 'hybrid')
+        
+        if not search_query:
+            return search_query, mode, Response({"error": "Search query is required."}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if len(search_query) < 3:
+            return search_query, mode, Response({"error": "Search query must be at least 3 characters long."}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Check if it's a model overload error
-            if "503" in str(e) or "overloaded" in str(e).lower() or "unavailable" in str(e).lower():
-                return Response({
-                    "error": "AI search is temporarily unavailable due to high demand.",
-                    "details": "We're using basic text search instead. Please try again in a few minutes for AI-powered search.",
-                    "fallback_mode": True
-                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
-            else:
-                return Response({
-                    "error": "Search failed. Please try again later.",
-                    "details": "An unexpected error occurred during search."
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        # Validate query length to prevent abuse
+        if len(search_query) > 500:
+            return search_query, mode, Response({"error": "Search query is too long. Please keep it under 500 characters."}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if mode not in self.search_modes:
+            return search_query, mode, Response({"error": f"Invalid search mode. Use one of: {', '.join(self.search_modes)}."}, status=status.HTTP_400_BAD_REQUEST)
+        return search_query, mode, None
+    
+    def recall(self, request, search_query, mode, started):
+        """
+        Everything before the model stage: the cached results or an empty answer as a
+        Response, otherwise the state the remaining stages need.
+        """
+        # Create query hash for caching - results differ per mode
+        query_normalized = search_query.lower()
+        query_hash = hashlib.sha256(f"{mode}:{query_normalized}".encode()).hexdigest()
+        
+        # Check for cached search results of the current corpus version first
+        corpus_version = CorpusVersion.current(request.user.id)
+        cached_search = SearchCache.objects.lookup(request.user, query_hash, corpus_version)
+        if cached_search:
+            search_results = cached_search.results
+            search_results['query'] = search_query  # Update with original casing
+            search_results['timings'] = {"cache_ms": _elapsed_ms(started), "total_ms": _elapsed_ms(started)}
+            return Response(search_results, status=status.HTTP_200_OK)
+        
+        # Get all user documents with extracted text
+        if not UploadedDocument.objects.filter(user=request.user).with_text().exists():
+            return Response({
+                "results": [],
+                "total_found": 0,
+                "search_summary": "No documents found to search through.",
+                "query": search_query,
+                "mode": mode
+            })
+        
+        timings = {}
+        # Fix misspelled terms against the user's vocabulary before any ranking
+        stage_started = time.perf_counter()
+        corrected_query = vocabulary.correct_query(request.user.id, search_query)
+        timings['correction_ms'] = _elapsed_ms(stage_started)
+        # correct_query collapses whitespace too, so compare against the same normal form
+        if corrected_query == vocabulary.normalize_query(search_query):
+            corrected_query = search_query
+        
+        candidates = []
+        if mode != 'model':
+            # Stage 1: recall from the whole corpus with the local semantic index
+            stage_started = time.perf_counter()
+            candidates = search_index.recall_candidates(
+                request.user.id, corrected_query, max_documents=settings.SEARCH_RERANK_CANDIDATES
+            )
+            timings['recall_ms'] = _elapsed_ms(stage_started)
+        
+        return {
+            'query': search_query, 'mode': mode, 'query_hash': query_hash, 'corpus_version': corpus_version,
+            'corrected_query': corrected_query, 'candidates': candidates, 'timings': timings,
+        }
+    
+    def model_documents(self, request):
+        """Document data for the model-only search"""
+        # Prepare document data for AI search - OPTIMIZE CONTEXT LENGTH
+        documents_data = []
+        user_documents = UploadedDocument.objects.filter(user=request.user).with_text()
+        for doc in user_documents.with_content()[:10]:  # Limit to first 10 documents to manage context
+            # Optimize text length to prevent token waste - use first 1000 chars instead of 2000
+            truncated_content = doc.extracted_text[:1000] if len(doc.extracted_text) > 1000 else doc.extracted_text
+            documents_data.append((doc.id, doc.title, truncated_content))
+        return documents_data
+    
+    def finish(self, request, search, search_results, started):
+        # Add document URLs to results
+        for result in search_results.get('results', []):
+            try:
+                doc_id = int(result['document_id'])
+                result['document_url'] = f"/documents/{doc_id}/"
+            except (ValueError, KeyError):
+                result['document_url'] = None
+        
+        # Add the original query to the response
+        search_results['query'] = search['query']
+        search_results['mode'] = search['mode']
+        if search['corrected_query'] != search['query']:
+            search_results['corrected_query'] = search['corrected_query']
+        
+        # Cache the search results for future use
+        SearchCache.objects.store(request.user, search['query_hash'], search['query'], search_results, search['corpus_version'])
+        
+        timings = search['timings']
+        timings['total_ms'] = _elapsed_ms(started)
+        search_results['timings'] = timings
+        return Response(search_results, status=status.HTTP_200_OK)
+    
+    def busy_response(self):
+        return Response({"error": "This search is already being processed. Please wait a moment and try again."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    def failure_response(self, request, e):
+        logging.error(f"Smart search failed for user {request.user.id}: {str(e)}")
+        
+        # Check if it's a model overload error
+        if _is_overload_error(e):
+            return Response({
+                "error": "AI search is temporarily unavailable due to high demand.",
+                "details": "We're using basic text search instead. Please try again in a few minutes for AI-powered search.",
+                "fallback_mode": True
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({
+            "error": "Search failed. Please try again later.",
+            "details": "An unexpected error occurred during search."
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class SearchSuggestionsView(views.APIView):
+    """
+    Autocomplete served from the user's local phrase vocabulary.
+    Pass "enrich": true to top up short local lists with AI suggestions.
+    """
     permission_classes = [IsAuthenticated]
+    max_suggestions = 6
+    
+    @staticmethod
+    def wants_enrichment(request):
+        """JSON booleans as well as form-style strings; bool("false") would be True"""
+        enrich = request.data.get('enrich', False)
+        if isinstance(enrich, bool):
+            return enrich
+        return str(enrich).strip().lower() in ('1', 'true', 'yes')
     
     def post(self, request):
         partial_query = request.data.get('query', '').strip()
+        enrich = self.wants_enrichment(request)
         
         if not partial_query or len(partial_query) < 2:
             return Response({"suggestions": []})
@@ -554,51 +813,62 @@ class SearchSuggestionsView(views.APIView):
             return Response({"suggestions": []})
         
         try:
-            # Create cache key for suggestions
-            suggestions_cache_key = f"suggestions_{request.user.id}_{hashlib.sha256(partial_query.lower().encode()).hexdigest()[:16]}"
-            cached_suggestions = cache.get(suggestions_cache_key)
-            if cached_suggestions:
-                return Response({"suggestions": cached_suggestions})
-            
-            # Get all user documents with extracted text
-            user_documents = UploadedDocument.objects.filter(
-                user=request.user,
-                extracted_text__isnull=False
-            ).exclude(extracted_text='').exclude(extracted_text__startswith="Text extraction failed:")
-            
-            if not user_documents.exists():
-                return Response({"suggestions": []})
+            prepared = self.local_suggestions(request, partial_query, enrich)
+            if isinstance(prepared, Response):
+                return prepared
+            suggestions, suggestions_cache_key, documents_data = prepared
             
             # Prevent concurrent API calls for same user
-            lock_key = f"suggestions_lock_{request.user.id}"
-            if cache.get(lock_key):
-                return Response({"suggestions": []})  # Return empty if already processing
-            
-            # Set lock to prevent concurrent requests
-            cache.set(lock_key, True, timeout=30)  # 30 second lock
+            # Lease lock shared by all workers, renewed while the generation runs
+            lock = LeaseLock(f"suggestions_lock_{request.user.id}")
+            if not lock.acquire():
+                return Response({"suggestions": suggestions})  # Local suggestions only while enrichment runs
             
             try:
-                # Prepare document data for generating suggestions - OPTIMIZE CONTEXT
-                documents_data = []
-                for doc in user_documents[:5]:  # Limit to first 5 documents for suggestions
-                    # Use only title and first 300 chars for suggestions to save tokens
-                    truncated_content = doc.extracted_text[:300] if len(doc.extracted_text) > 300 else doc.extracted_text
-                    documents_data.append((doc.id, doc.title, truncated_content))
-                
                 # Generate suggestions using AI
-                suggestions = generate_search_suggestions(documents_data, partial_query)
+                ai_suggestions = generate_search_suggestions(documents_data, partial_query)
                 
                 # Cache suggestions for 10 minutes
-                cache.set(suggestions_cache_key, suggestions, timeout=600)
+                cache.set(suggestions_cache_key, ai_suggestions, timeout=600)
                 
-                return Response({"suggestions": suggestions})
+                return Response({"suggestions": _merge_suggestions(suggestions, ai_suggestions, self.max_suggestions)})
             finally:
                 # Always release the lock
-                cache.delete(lock_key)
+                lock.release()
             
         except Exception as e:
             logging.error(f"Search suggestions failed for user {request.user.id}: {str(e)}")
             return Response({"suggestions": []})
+    
+    def local_suggestions(self, request, partial_query, enrich):
+        """
+        The answer as a Response when no model call is needed, otherwise
+        (local suggestions, cache key, document data) for the AI enrichment.
+        """
+        # Local prefix lookup - no model call and no database query
+        suggestions = vocabulary.suggest_with_typos(request.user.id, partial_query, limit=self.max_suggestions)
+        if not enrich or len(suggestions) >= self.max_suggestions:
+            return Response({"suggestions": suggestions})
+        
+        # Optional AI enrichment - create cache key for suggestions
+        corpus_version = CorpusVersion.current(request.user.id)
+        suggestions_cache_key = f"suggestions_{request.user.id}_v{corpus_version}_{hashlib.sha256(partial_query.lower().encode()).hexdigest()[:16]}"
+        cached_suggestions = cache.get(suggestions_cache_key)
+        if cached_suggestions:
+            return Response({"suggestions": _merge_suggestions(suggestions, cached_suggestions, self.max_suggestions)})
+        
+        # Get all user documents with extracted text
+        user_documents = UploadedDocument.objects.filter(user=request.user).with_text()
+        
+        # Prepare document data for generating suggestions - OPTIMIZE CONTEXT
+        documents_data = []
+        for doc in user_documents[:5]:  # Limit to first 5 documents for suggestions
+            # Use only title and first 300 chars for suggestions to save tokens
+            truncated_content = doc.text_preview  # First 300 characters, no need to load the text
+            documents_data.append((doc.id, doc.title, truncated_content))
+        if not documents_data:
+            return Response({"suggestions": suggestions})
+        return suggestions, suggestions_cache_key, documents_data
 
 class RetryTextExtractionView(views.APIView):
     permission_classes = [IsAuthenticated]
@@ -608,31 +878,33 @@ class RetryTextExtractionView(views.APIView):
             doc = UploadedDocument.objects.get(pk=pk, user=request.user)
             
             # Check if document actually needs retry
-            if doc.extracted_text and not doc.extracted_text.startswith("Text extraction failed:"):
+            if doc.has_text:
                 return Response({
                     "message": "Text extraction already successful",
-                    "extracted_text_length": len(doc.extracted_text)
+                    "extracted_text_length": doc.text_length
                 }, status=status.HTTP_200_OK)
             
             print(f"Retrying text extraction for document: {doc.title}")
             
             # Attempt text extraction again
             try:
-                extracted_text = extract_text_from_file(doc.file.path)
-                doc.extracted_text = extracted_text
-                doc.save()
+                extracted = extract_document_text(doc.file.path)
+                doc.extracted_text = extracted.text
+                doc.page_count = extracted.page_count
+                retry_on_locked(doc.save)()
+                refresh_document_indexes(doc)
+                schedule_warmup(doc)
                 
                 return Response({
                     "message": "Text extraction successful! AI features are now available.",
-                    "extracted_text_length": len(extracted_text),
+                    "extracted_text_length": doc.text_length,
                     "success": True
                 }, status=status.HTTP_200_OK)
                 
             except Exception as extraction_error:
                 # Save the new error message
-                error_message = f"Text extraction failed: {str(extraction_error)}"
-                doc.extracted_text = error_message
-                doc.save()
+                doc.mark_extraction_failed(extraction_error)
+                retry_on_locked(doc.save)()
                 
                 return Response({
                     "message": "Text extraction failed again. The file might be corrupted or unsupported.",
@@ -0,0 +1,385 @@
+"""
+Per-user phrase vocabulary used for search autocomplete and typo tolerance.
+
+Phrases (titles, frequent terms and stop-word delimited 2-3 word phrases) are
+collected when a document's text is extracted. Each document's phrase counts
+are kept in their own file so they can be subtracted again on re-extraction or
+delete, and the merged vocabulary is stored as a sorted phrase array with
+parallel weights. A suggestion is a binary search for the prefix range plus a
+top-N pick by weight - no model call and no database query.
+
+Single-word terms are additionally indexed by character trigrams, so misspelled
+query terms can be mapped to the closest known term within a small edit
+distance before ranking.
+"""
+
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+from . import deletions
+from .models import UploadedDocument
+from .search_index import STOP_WORDS, UserIndexLock, has_indexable_text, user_index_dir
+
+logger = logging.getLogger(__name__)
+
+VOCABULARY_FILENAME = 'vocabulary.json'
+DOCUMENT_PHRASES_DIR = 'phrases'
+
+MAX_TERMS_PER_DOCUMENT = 300
+MAX_PHRASES_PER_DOCUMENT = 200
+TITLE_WEIGHT = 3.0
+
+WORD_RE = re.compile(r"[A-Za-z][A-Za-z0-9'-]*|[^\sA-Za-z]+")
+TERM_RE = re.compile(r"[a-z][a-z0-9'-]*[a-z0-9]$")
+
+
+def normalize_query(text):
+    return ' '.join(text.lower().split())
+
+
+def _title_phrase(title):
+    title = os.path.splitext(title)[0] if re.search(r"\.[A-Za-z0-9]{2,4}$", title) else title
+    return normalize_query(re.sub(r"[_\-]+", ' ', title))
+
+
+def extract_phrases(title, text):
+    """
+    Count candidate phrases in a document: single terms plus 2-3 word phrases that
+    do not cross stop words or punctuation (a cheap stand-in for noun phrases).
+    """
+    terms = Counter()
+    phrases = Counter()
+    run = []
+
+    def flush():
+        for size in (2, 3):
+            for i in range(len(run) - size + 1):
+                phrases[' '.join(run[i:i + size])] += 1
+        run.clear()
+
+    for word in WORD_RE.findall(text):
+        word = word.lower().strip("'-")
+        if not TERM_RE.match(word) or word in STOP_WORDS:
+            flush()
+            continue
+        if len(word) > 2:
+            terms[word] += 1
+        run.append(word)
+    flush()
+
+    counts = dict(terms.most_common(MAX_TERMS_PER_DOCUMENT))
+    repeated = [(phrase, count) for phrase, count in phrases.most_common(MAX_PHRASES_PER_DOCUMENT) if count > 1]
+    counts.update(repeated)
+
+    title_phrase = _title_phrase(title)
+    if title_phrase:
+        counts[title_phrase] = counts.get(title_phrase, 0) + TITLE_WEIGHT
+    return counts
+
+
+def _contribution(count):
+    """Weight a phrase adds to the user vocabulary for one document"""
+    return 1.0 + math.log(count) if count >= 1 else count
+
+
+# --- Storage ---
+
+_loaded = {}
+_loaded_guard = threading.Lock()
+
+
+def _vocabulary_path(user_id):
+    return os.path.join(user_index_dir(user_id), VOCABULARY_FILENAME)
+
+
+def _document_phrases_path(user_id, document_id):
+    return os.path.join(user_index_dir(user_id), DOCUMENT_PHRASES_DIR, f"{document_id}.json")
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as handle:
+        json.dump(data, handle, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+def load_vocabulary(user_id):
+    """Return (phrases, weights) sorted by phrase, cached per process until the file changes"""
+    path = _vocabulary_path(user_id)
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return [], []
+
+    with _loaded_guard:
+        cached = _loaded.get(user_id)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+    data = _read_json(path) or {}
+    vocabulary = (data.get('phrases', []), data.get('weights', []))
+    with _loaded_guard:
+        _loaded[user_id] = (stamp, vocabulary)
+    return vocabulary
+
+
+def _merged_counts(user_id):
+    phrases, weights = load_vocabulary(user_id)
+    return dict(zip(phrases, weights))
+
+
+def _apply(merged, phrase_counts, sign):
+    for phrase, count in phrase_counts.items():
+        weight = merged.get(phrase, 0.0) + sign * _contribution(count)
+        if weight > 1e-6:
+            merged[phrase] = weight
+        else:
+            merged.pop(phrase, None)
+
+
+def _write_vocabulary(user_id, merged):
+    phrases = sorted(merged)
+    _write_json(_vocabulary_path(user_id), {
+        'phrases': phrases,
+        'weights': [round(merged[phrase], 4) for phrase in phrases],
+    })
+
+
+def index_document(document):
+    """Replace a document's contribution to its owner's vocabulary"""
+    text = document.extracted_text
+    new_counts = extract_phrases(document.title, text) if has_indexable_text(text) else {}
+    doc_path = _document_phrases_path(document.user_id, document.pk)
+    with UserIndexLock(document.user_id):
+        merged = _merged_counts(document.user_id)
+        _apply(merged, _read_json(doc_path) or {}, -1)
+        _apply(merged, new_counts, 1)
+        if new_counts:
+            _write_json(doc_path, new_counts)
+        elif os.path.exists(doc_path):
+            os.remove(doc_path)
+        _write_vocabulary(document.user_id, merged)
+
+
+def remove_documents(user_id, document_ids):
+    """Subtract the phrases of deleted documents, rewriting the user's vocabulary once"""
+    doc_paths = [path for path in (_document_phrases_path(user_id, pk) for pk in document_ids) if os.path.exists(path)]
+    if not doc_paths:
+        return
+    with UserIndexLock(user_id):
+        merged = _merged_counts(user_id)
+        for doc_path in doc_paths:
+            counts = _read_json(doc_path)
+            if counts is None:
+                continue  # Removed by a concurrent cleanup of the same documents
+            _apply(merged, counts, -1)
+            os.remove(doc_path)
+        if not _has_document_phrases(user_id):
+            merged = {}  # Drop weights left over from rounding once no document contributes
+        _write_vocabulary(user_id, merged)
+
+
+def _has_document_phrases(user_id):
+    try:
+        with os.scandir(os.path.join(user_index_dir(user_id), DOCUMENT_PHRASES_DIR)) as entries:
+            return next(entries, None) is not None
+    except FileNotFoundError:
+        return False
+
+
+def rebuild_user_vocabulary(user_id):
+    """Rebuild a user's vocabulary from scratch; returns the number of phrases"""
+    merged = {}
+    phrases_dir = os.path.join(user_index_dir(user_id), DOCUMENT_PHRASES_DIR)
+    with UserIndexLock(user_id):
+        if os.path.isdir(phrases_dir):
+            for name in os.listdir(phrases_dir):
+                os.remove(os.path.join(phrases_dir, name))
+        documents = UploadedDocument.objects.filter(user_id=user_id).with_text().with_content()
+        for document in documents.iterator(chunk_size=50):
+            if not has_indexable_text(document.extracted_text):
+                continue
+            counts = extract_phrases(document.title, document.extracted_text)
+            _write_json(_document_phrases_path(user_id, document.pk), counts)
+            _apply(merged, counts, 1)
+        _write_vocabulary(user_id, merged)
+    return len(merged)
+
+
+# --- Querying ---
+
+def suggest(user_id, partial_query, limit=6):
+    """Highest weighted phrases starting with the partial query"""
+    prefix = normalize_query(partial_query)
+    if not prefix:
+        return []
+    phrases, weights = load_vocabulary(user_id)
+    start = bisect_left(phrases, prefix)
+    end = bisect_left(phrases, prefix + '\uffff', lo=start)
+    if start == end:
+        return []
+    best = heapq.nlargest(limit, range(start, end), key=weights.__getitem__)
+    return [phrases[i] for i in best]
+
+
+# --- Typo tolerance ---
+
+_term_indexes = {}
+
+
+def _trigrams(term, prefix=False):
+    # A prefix has no known end, so it is only padded at the start
+    padded = f"${term}" if prefix else f"${term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _allowed_distance(term):
+    """Edit distance tolerated for a term: none for short words, then 1, then 2"""
+    if len(term) < 5:
+        return 0
+    return 1 if len(term) < 9 else 2
+
+
+def edit_distance(a, b, max_distance):
+    """
+    Optimal string alignment distance (adjacent transpositions count once),
+    returning max_distance + 1 as soon as the bound can no longer be met.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+class TermIndex:
+    """Character trigram postings over the single-word terms of a vocabulary"""
+
+    def __init__(self, phrases, weights):
+        self.weights = {}
+        self.terms = []
+        self.postings = {}
+        for phrase, weight in zip(phrases, weights):
+            if ' ' in phrase:
+                continue
+            term_id = len(self.terms)
+            self.terms.append(phrase)
+            self.weights[phrase] = weight
+            for trigram in _trigrams(phrase):
+                self.postings.setdefault(trigram, []).append(term_id)
+
+    def candidates(self, token, max_distance, prefix=False):
+        """Term ids sharing enough trigrams with token to be within max_distance edits"""
+        trigrams = _trigrams(token, prefix)
+        # Every edit destroys at most three trigrams
+        required = max(1, len(trigrams) - 3 * max_distance)
+        shared = Counter()
+        for trigram in trigrams:
+            shared.update(self.postings.get(trigram, ()))
+        return [term_id for term_id, count in shared.items() if count >= required]
+
+    def correct(self, token, prefix=False):
+        """Closest known term (or term prefix) for a token, or None when nothing is close enough"""
+        if token in self.weights and not prefix:
+            return token
+        max_distance = _allowed_distance(token)
+        if not max_distance:
+            return None
+        best = None
+        for term_id in self.candidates(token, max_distance, prefix):
+            term = self.terms[term_id]
+            # A typo can shift the prefix length, so compare against nearby prefix lengths too
+            lengths = range(len(token) - max_distance, len(token) + max_distance + 1) if prefix else [len(term)]
+            for length in lengths:
+                target = term[:length]
+                distance = edit_distance(token, target, max_distance)
+                if distance > max_distance:
+                    continue
+                rank = (distance, -self.weights[term])
+                if best is None or rank < best[0]:
+                    best = (rank, target)
+        return best[1] if best else None
+
+
+def load_term_index(user_id):
+    phrases, weights = load_vocabulary(user_id)
+    with _loaded_guard:
+        cached = _term_indexes.get(user_id)
+        if cached and cached[0] is phrases:
+            return cached[1]
+    term_index = TermIndex(phrases, weights)
+    with _loaded_guard:
+        _term_indexes[user_id] = (phrases, term_index)
+    return term_index
+
+
+def correct_query(user_id, query):
+    """
+    Replace misspelled query terms with the closest vocabulary term and join split
+    compounds ("eigen vector" -> "eigenvector"). Returns the corrected query, which
+    equals the normalised input when nothing needed fixing.
+    """
+    tokens = normalize_query(query).split()
+    term_index = load_term_index(user_id)
+    if not tokens or not term_index.terms:
+        return ' '.join(tokens)
+
+    corrected = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if i + 1 < len(tokens) and token + tokens[i + 1] in term_index.weights and token not in term_index.weights:
+            corrected.append(token + tokens[i + 1])
+            i += 2
+            continue
+        if token in STOP_WORDS or not TERM_RE.match(token):
+            corrected.append(token)
+        else:
+            corrected.append(term_index.correct(token) or token)
+        i += 1
+    return ' '.join(corrected)
+
+
+def suggest_with_typos(user_id, partial_query, limit=6):
+    """suggest(), retrying with a fuzzy-corrected last word when the prefix matches nothing"""
+    suggestions = suggest(user_id, partial_query, limit=limit)
+    if suggestions:
+        return suggestions
+    tokens = normalize_query(partial_query).split()
+    if not tokens:
+        return []
+    head = correct_query(user_id, ' '.join(tokens[:-1])) if len(tokens) > 1 else ''
+    last = load_term_index(user_id).correct(tokens[-1], prefix=True)
+    if not last:
+        return []
+    return suggest(user_id, f"{head} {last}".strip(), limit=limit)
+
+
+# Deleted documents leave the vocabulary once their delete commits (see core.deletions)
+deletions.register_cleanup(remove_documents)
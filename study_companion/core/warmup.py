@@ -0,0 +1,124 @@
+"""
+Post-extraction warm-up: generate chosen AI artifacts in the background right
+after a document's text is extracted, so the first open is usually a hit.
+
+Jobs are queued after the extraction commits and handled by one low-priority
+daemon thread per process. Each generation first takes one of
+WARMUP_CONCURRENCY lease-locked slots shared by all workers, so warm-ups never
+crowd out user-initiated generations, and is skipped when the model is not
+configured or the user's remaining AI quota is low. Every artifact generated
+costs the user one request of the AI endpoints' rate limit, exactly as
+generating it on demand would, and warming stops before it would take the
+user below WARMUP_MIN_REMAINING_QUOTA requests. Fallback artifacts (model
+unavailable) are neither stored nor charged, and end the warm-up.
+"""
+
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from . import services
+from .artifacts import ARTIFACT_GENERATORS, ArtifactBusy, ArtifactUnavailable
+from .locks import LeaseLock
+from .middleware import api_rate_limiter
+from .models import UploadedDocument
+from .tiered_cache import CacheBusy
+
+logger = logging.getLogger(__name__)
+
+SLOT_POLL_INTERVAL = 2  # seconds between attempts to get a warm-up slot
+
+_queue = queue.Queue(maxsize=getattr(settings, 'WARMUP_QUEUE_SIZE', 100))
+_worker = None
+_worker_guard = threading.Lock()
+
+
+def schedule_warmup(document):
+    """Queue warm-up of the configured artifacts once the current transaction commits"""
+    artifacts = [name for name in getattr(settings, 'WARMUP_ARTIFACTS', []) if name in ARTIFACT_GENERATORS]
+    if not artifacts or services.client is None or not document.has_text:
+        return False
+    transaction.on_commit(lambda: _enqueue(document.pk, document.user_id, artifacts))
+    return True
+
+
+def _enqueue(document_id, user_id, artifacts):
+    global _worker
+    with _worker_guard:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='artifact-warmup', daemon=True)
+            _worker.start()
+    try:
+        _queue.put_nowait((document_id, user_id, artifacts))
+    except queue.Full:
+        logger.warning(f"Warm-up queue is full, skipping document {document_id}")
+
+
+def _run():
+    while True:
+        document_id, user_id, artifacts = _queue.get()
+        try:
+            warm_document(document_id, user_id, artifacts)
+        except Exception as e:
+            logger.error(f"Warm-up of document {document_id} failed: {e}")
+        finally:
+            connections.close_all()
+            _queue.task_done()
+
+
+def _acquire_slot():
+    """Take one of the global warm-up slots, waiting up to WARMUP_SLOT_WAIT_SECONDS"""
+    concurrency = getattr(settings, 'WARMUP_CONCURRENCY', 2)
+    deadline = time.monotonic() + getattr(settings, 'WARMUP_SLOT_WAIT_SECONDS', 300)
+    while True:
+        for slot in range(concurrency):
+            lock = LeaseLock(f"warmup_lock_slot{slot}")
+            if lock.acquire():
+                return lock
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(SLOT_POLL_INTERVAL)
+
+
+def warm_document(document_id, user_id, artifacts):
+    """Generate the missing artifacts of one document; returns the names actually generated"""
+    limiter = api_rate_limiter()
+    min_remaining = getattr(settings, 'WARMUP_MIN_REMAINING_QUOTA', 10)
+    generated = []
+    for name in artifacts:
+        if limiter.remaining(user_id) <= min_remaining:  # One more generation would eat into the reserve
+            logger.info(f"Skipping warm-up of document {document_id}: user {user_id} is low on AI quota")
+            break
+
+        slot = _acquire_slot()
+        if slot is None:
+            logger.info(f"Skipping warm-up of document {document_id}: no warm-up slot became free")
+            break
+        try:
+            # Re-read every time: the document may have been deleted or re-extracted meanwhile
+            document = UploadedDocument.objects.filter(pk=document_id).first()
+            if document is None or not document.has_text:
+                break
+            # Generators raise ArtifactUnavailable instead of returning a fallback, so created
+            # is only True for an artifact the model produced and that was stored
+            _, created = ARTIFACT_GENERATORS[name](document)
+            if created:
+                # Same per-user key as the AI endpoints, so warm-ups and requests share one quota
+                limiter.hit(user_id)
+                generated.append(name)
+        except (ArtifactBusy, CacheBusy):
+            pass  # Being generated on demand right now
+        except ArtifactUnavailable:
+            # The model is failing; the other artifacts would only come back as fallbacks too
+            logger.info(f"Model gave no {name} for document {document_id}, nothing was stored or charged")
+            break
+        finally:
+            slot.release()
+
+    if generated:
+        logger.info(f"Warmed up {', '.join(generated)} for document {document_id}")
+    return generated
@@ -2,6 +2,9 @@
 ASGI config for study_companion project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Served this way (e.g. ``uvicorn study_companion.asgi:application``), the AI
+endpoints under /api/async/ (core.async_views) await the model instead of
+blocking a thread per request.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -14,3 +17,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'study_companion.settings')
 
 application = get_asgi_application()
+
+# Periodic maintenance in server processes only, when MAINTENANCE_SCHEDULER_ENABLED (see core.maintenance)
+from core.maintenance import start_scheduler  # noqa: E402
+
+start_scheduler()
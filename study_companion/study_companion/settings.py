@@ -45,8 +45,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',  # Compresses the final response - keep before middleware that edits it
     'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.cache.UpdateCacheMiddleware',  # Add cache middleware
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -55,32 +55,87 @@ MIDDLEWARE = [
     'core.middleware.ComponentStabilityMiddleware',  # Error handling
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'django.middleware.cache.FetchFromCacheMiddleware',  # Add cache middleware
 ]
 
 # Caching configuration to reduce API calls
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'study-companion-cache',
+        # Shared by every worker process on the host, with atomic add/incr
+        'BACKEND': 'core.cache_backend.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
         'TIMEOUT': 3600,  # 1 hour default timeout
         'OPTIONS': {
-            'MAX_ENTRIES': 1000,
+            'MAX_SIZE': 64 * 1024 * 1024,  # bytes; least recently used entries are culled beyond this
+            'MAX_ENTRIES': 100000,
         }
     }
 }
 
 # Cache middleware settings
-CACHE_MIDDLEWARE_ALIAS = 'default'
-CACHE_MIDDLEWARE_SECONDS = 900  # 15 minutes
-CACHE_MIDDLEWARE_KEY_PREFIX = 'study_companion'
+# Lease of the cache locks that stop duplicate AI generations; renewed every third of it while work runs
+GENERATION_LOCK_LEASE_SECONDS = 30
+
+# Tiered summary cache: in-process LRU in front of the shared cache
+SUMMARY_CACHE_TTL = 86400  # seconds a summary is fresh
+SUMMARY_CACHE_STALE_TTL = 6 * 3600  # served stale for this long while one worker regenerates it
+SUMMARY_CACHE_LOCAL_ENTRIES = 256
+SUMMARY_CACHE_LOCAL_TTL = 60  # bounds how long a worker can miss another worker's refresh
+SUMMARY_CACHE_WAIT_SECONDS = 10  # cold misses wait this long for the generating worker before a 429
+
+# Artifacts generated in the background right after a successful text extraction
+WARMUP_ARTIFACTS = ['summary', 'quiz', 'flashcards']  # empty list disables warm-up
+WARMUP_CONCURRENCY = 2  # warm-up generations running at once across all workers
+WARMUP_MIN_REMAINING_QUOTA = 10  # AI quota warm-ups always leave the user; each warm-up generation costs one request
+WARMUP_QUEUE_SIZE = 100  # per worker process; further jobs are dropped
+WARMUP_SLOT_WAIT_SECONDS = 300
 
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",      
     "http://127.0.0.1:3000",
 ]
+# Let the frontend read the rate-limit headers of cross-origin responses
+CORS_EXPOSE_HEADERS = ['X-RateLimit-Limit', 'X-RateLimit-Remaining', 'X-RateLimit-Reset', 'Retry-After']
+
+# Per-user sliding-window limit on AI-backed endpoints, matched by URL name
+API_RATE_LIMIT = 50
+API_RATE_LIMIT_WINDOW = 3600  # seconds
+API_RATE_LIMITED_ROUTES = [
+    'document-summarize',
+    'generate-quiz',
+    'generate-flashcards',
+    'document-qna',
+    'smart-search',
+    'async-document-summarize',
+    'async-generate-quiz',
+    'async-generate-flashcards',
+    'async-document-qna',
+    'async-smart-search',
+]
+
+# POST /api/documents/artifacts/ charges one request of the limit per artifact it generates
+ARTIFACT_BATCH_MAX_DOCUMENTS = 20
+ARTIFACT_BATCH_MAX_GENERATIONS = 10  # per request; the remaining artifacts come back as 'skipped'
+
+# POST /api/documents/upload/batch/ creates the documents at once and extracts their text on a shared thread pool
+UPLOAD_BATCH_MAX_FILES = 50  # Django's DATA_UPLOAD_MAX_NUMBER_FILES (default 100) still applies on top
+UPLOAD_EXTRACTION_WORKERS = 4  # extractions running at once per worker process, across all batches
+
+# gzip/brotli compression of /api/ responses (core.middleware.CompressionMiddleware); brotli needs the brotli package
+API_COMPRESSION_MIN_SIZE = 1024  # bytes; smaller bodies are not worth compressing
+API_COMPRESSION_GZIP_LEVEL = 6
+API_COMPRESSION_BROTLI_QUALITY = 5  # 0-11; higher is smaller but much slower
 
 REST_FRAMEWORK = {
+    # orjson-backed JSON when orjson is installed (core.renderers)
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
@@ -166,10 +221,28 @@ WSGI_APPLICATION = 'study_companion.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite profile for several concurrent workers (see core.sqlite), applied to every new connection
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # Readers never wait for the writer
+    'synchronous': 'NORMAL',  # fsync at checkpoints only; with WAL a crash can lose the last commits, never corrupt
+    'busy_timeout': 20000,  # ms a writer waits for the write lock before "database is locked"
+    'mmap_size': 256 * 1024 * 1024,  # Bytes of the file read through memory mapping
+    'cache_size': -64000,  # Page cache per connection; negative values are KiB
+    'temp_store': 'MEMORY',
+    # No foreign_keys: Django's SQLite backend turns it on for every connection already
+}
+SQLITE_WRITE_ATTEMPTS = 5  # Tries of hot writers (core.sqlite.retry_on_locked) that still find the database locked
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock at BEGIN, so transactions queue for it instead of failing on upgrade
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+            'init_command': '; '.join(f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()),
+        },
     }
 }
 
@@ -212,6 +285,40 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Local semantic search index (one memory-mapped vector file per user)
+SEARCH_INDEX_ROOT = os.path.join(BASE_DIR, 'search_index')
+SEARCH_INDEX_DIM = 512
+SEARCH_RERANK_CANDIDATES = 8  # documents whose best chunk is sent to the model in hybrid mode
+
+# Extracted text is stored compressed and deduplicated in DocumentContent (see core.text_codecs)
+DOCUMENT_CONTENT_CODEC = None  # 'zstd' or 'zlib'; None picks zstd when the optional zstandard package is installed
+DOCUMENT_CONTENT_LEVEL = None  # None uses the codec's default level
+
+# Search result cache rows are keyed on the user's corpus version, so age only bounds model drift
+SEARCH_CACHE_MAX_AGE_HOURS = 24
+SEARCH_CACHE_MAX_ENTRIES_PER_USER = 200
+
+# Maintenance tasks (core.maintenance): `manage.py run_maintenance` from cron, or the in-process scheduler
+MAINTENANCE_BATCH_SIZE = 1000  # rows deleted per write transaction, files checked per query
+MAINTENANCE_BATCH_PAUSE_SECONDS = 0.05  # between batches, so request writers get the write lock
+MAINTENANCE_SCHEDULER_ENABLED = False  # run MAINTENANCE_SCHEDULE from a thread in each server process
+MAINTENANCE_SCHEDULE = {  # seconds between runs; each task runs once per interval across all workers
+    'search_cache': 3600,
+    'qa_cache': 24 * 3600,
+    'temporary_users': 3600,
+    'media': 24 * 3600,
+    'deletions': 300,
+}
+QA_CACHE_MAX_AGE_DAYS = 90
+QA_CACHE_MAX_ENTRIES_PER_DOCUMENT = 200
+TEMPORARY_USER_RETENTION_HOURS = 24  # signups are deleted this long after their OTP expired
+MEDIA_ORPHAN_GRACE_HOURS = 24  # younger unreferenced files may belong to an upload still in progress
+
+# Files and index entries of deleted documents are removed after the delete commits (core.deletions)
+DELETION_BATCH_SIZE = 200  # queued documents cleaned up per round
+DELETION_RETRY_BASE_SECONDS = 30  # first retry delay of a failed cleanup, doubled per attempt
+DELETION_RETRY_MAX_SECONDS = 3600
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
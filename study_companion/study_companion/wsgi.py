@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'study_companion.settings')
 
 application = get_wsgi_application()
+
+# Periodic maintenance in server processes only, when MAINTENANCE_SCHEDULER_ENABLED (see core.maintenance)
+from core.maintenance import start_scheduler  # noqa: E402
+
+start_scheduler()